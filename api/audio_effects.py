@@ -2,29 +2,37 @@
 Audio effects module for TTS processing with rumble effects.
 
 This module provides advanced audio processing capabilities including:
-- Pitch shifting
+- Pitch shifting (in-process phase vocoder, FFmpeg rubberband/asetrate fallbacks)
 - Low-frequency rumble generation
 - Multi-band filtering and crossover
 - Dynamic envelope following
-- FFmpeg-based effects chain
+- Echo/EQ/compressor/limiter chain (in-process, or FFmpeg-based)
 
 Based on: https://github.com/obake2ai/BI_M5_QwenSoftPrefix
 """
 
+import functools
+import io
 import math
 import shlex
 import subprocess
-from pathlib import Path
-from typing import Optional, Sequence, Union
+from fractions import Fraction
+from typing import List, Optional, Sequence, Union
 
 import numpy as np
 import soundfile as sf
 from loguru import logger
-from scipy import signal
+from scipy import ndimage, signal
 
-# Working directory for temporary files
-WORKDIR = Path("./tmp/audio_work")
-WORKDIR.mkdir(exist_ok=True, parents=True)
+# Post-processing chain applied after the rumble layers: reverb + EQ + compression + limiter
+POST_FX_FILTER = ",".join(
+    [
+        "aecho=0.8:0.85:120|240:0.25|0.18",
+        "equalizer=f=140:t=q:w=1.1:g=3",
+        "acompressor=threshold=0.18:ratio=4:attack=15:release=260:makeup=1.5",
+        "alimiter=limit=0.97",
+    ]
+)
 
 
 # ========== Command Execution Helpers ==========
@@ -69,47 +77,41 @@ def sh(cmd: Union[str, Sequence[str]], check: bool = True) -> subprocess.Complet
 # ========== Audio Conversion & I/O ==========
 
 
-def to_wav_16k_mono(in_path: str, out_path: str) -> None:
-    """Convert audio to 16kHz mono WAV format."""
-    sh(
-        [
-            "ffmpeg",
-            "-y",
-            "-hide_banner",
-            "-loglevel",
-            "error",
-            "-i",
-            str(in_path),
-            "-ac",
-            "1",
-            "-ar",
-            "16000",
-            "-vn",
-            str(out_path),
-        ]
-    )
+def ffmpeg_pipe(input_args: Sequence[str], output_args: Sequence[str], data: bytes) -> bytes:
+    """
+    Run FFmpeg from stdin to stdout, without temporary files.
 
+    Args:
+        input_args: Options describing the input (e.g. ["-f", "f32le", "-ar", "16000", "-ac", "1"])
+        output_args: Filters and output options, including the output format (e.g. ["-f", "f32le"])
+        data: Input bytes
+
+    Returns:
+        Output bytes
 
-def ffmpeg_apply_filter(in_wav: str, out_wav: str, afilter: str) -> None:
-    """Apply FFmpeg audio filter to WAV file."""
-    sh(
-        [
-            "ffmpeg",
-            "-y",
-            "-hide_banner",
-            "-loglevel",
-            "error",
-            "-i",
-            str(in_wav),
-            "-ac",
-            "1",
-            "-ar",
-            "16000",
-            "-af",
-            afilter,
-            str(out_wav),
-        ]
+    Raises:
+        subprocess.CalledProcessError: FFmpeg failed
+    """
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", *input_args, "-i", "pipe:0", *output_args, "pipe:1"]
+    printable = " ".join(shlex.quote(str(x)) for x in cmd)
+    logger.debug(f"$ {printable} (<{len(data)} bytes)")
+    p = subprocess.run(cmd, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    if p.returncode != 0:
+        err = p.stderr.decode("utf-8", errors="replace")
+        logger.error(err)
+        raise subprocess.CalledProcessError(p.returncode, printable, output=p.stdout, stderr=err)
+    return p.stdout
+
+
+def ffmpeg_filter_array(y: np.ndarray, afilter: str, sr: int = 16000) -> np.ndarray:
+    """Apply an FFmpeg audio filter to a mono float32 array (through pipes)."""
+    y = np.ascontiguousarray(y, dtype=np.float32)
+    out = ffmpeg_pipe(
+        ["-f", "f32le", "-ar", str(sr), "-ac", "1"],
+        ["-af", afilter, "-ac", "1", "-ar", str(sr), "-f", "f32le"],
+        y.tobytes(),
     )
+    return np.frombuffer(out, dtype=np.float32).copy()
 
 
 def list_ffmpeg_filters() -> str:
@@ -117,13 +119,22 @@ def list_ffmpeg_filters() -> str:
     return sh(["ffmpeg", "-hide_banner", "-filters"]).stdout
 
 
-# Cache FFmpeg filters list
-FFMPEG_FILTERS_TEXT = list_ffmpeg_filters()
+@functools.lru_cache(maxsize=1)
+def ffmpeg_filters_text() -> str:
+    """FFmpeg filters list, queried on first use (not at import) and cached."""
+    text = list_ffmpeg_filters()
+    logger.info(f"FFmpeg has rubberband: {_has_filter(text, 'rubberband')}")
+    logger.info(f"FFmpeg has asubboost: {_has_filter(text, 'asubboost')}")
+    return text
+
+
+def _has_filter(filters_text: str, filter_name: str) -> bool:
+    return (f" {filter_name} " in filters_text) or (f"\t{filter_name} " in filters_text)
 
 
 def ffmpeg_has_filter(filter_name: str) -> bool:
     """Check if FFmpeg has a specific filter available."""
-    return (f" {filter_name} " in FFMPEG_FILTERS_TEXT) or (f"\t{filter_name} " in FFMPEG_FILTERS_TEXT)
+    return _has_filter(ffmpeg_filters_text(), filter_name)
 
 
 def load16k(path: str) -> np.ndarray:
@@ -136,19 +147,26 @@ def load16k(path: str) -> np.ndarray:
     Returns:
         Audio data as float32 numpy array
     """
-    y, sr = sf.read(path)
+    y, sr = sf.read(path, dtype="float32")
+    return _to_16k_mono(y, sr)
+
+
+def decode16k(data: bytes) -> np.ndarray:
+    """
+    Decode an in-memory WAV as a 16kHz mono array with DC offset removal.
+
+    Same result as load16k(), without touching the filesystem.
+    """
+    y, sr = sf.read(io.BytesIO(data), dtype="float32")
+    return _to_16k_mono(y, sr)
+
+
+def _to_16k_mono(y: np.ndarray, sr: int) -> np.ndarray:
     if y.ndim > 1:
-        y = y.mean(axis=1)
-    if sr != 16000:
-        tmp = str(WORKDIR / "_tmp_16k.wav")
-        to_wav_16k_mono(path, tmp)
-        y, sr = sf.read(tmp)
-        if y.ndim > 1:
-            y = y.mean(axis=1)
-    y = y.astype(np.float32)
+        y = y.mean(axis=1, dtype=np.float32)
+    y = resample_array(y, sr, 16000)
     # Remove DC offset
-    y = y - float(np.mean(y))
-    return y
+    return y - np.float32(np.mean(y))
 
 
 def write16k(path: str, y: np.ndarray) -> None:
@@ -157,6 +175,66 @@ def write16k(path: str, y: np.ndarray) -> None:
     sf.write(str(path), y, 16000)
 
 
+# ========== Output Conversion ==========
+
+# Full-scale value per PCM sample width (bytes)
+PCM_SCALE = {2: 32768.0, 4: 2147483648.0}
+
+
+def resample_array(y: np.ndarray, sr: int, target_sr: int) -> np.ndarray:
+    """
+    Resample a float32 array (samples on the first axis) with a polyphase filter.
+
+    In-process replacement for FFmpeg's aresample; stays in float32.
+    """
+    y = np.asarray(y, dtype=np.float32)
+    if sr == target_sr or len(y) == 0:
+        return y
+    ratio = Fraction(int(target_sr), int(sr))
+    return signal.resample_poly(y, ratio.numerator, ratio.denominator, axis=0).astype(np.float32, copy=False)
+
+
+def encode_pcm(y: np.ndarray, sr: int, sample_rate: int = 48000, channels: int = 2, sample_width: int = 2) -> bytes:
+    """
+    Resample a float32 array and encode it as interleaved little-endian PCM.
+
+    Matches FFmpeg's output conversion: mono is upmixed to stereo at -3dB
+    per channel, stereo is downmixed by averaging, and samples are rounded
+    to the nearest integer and clipped.
+
+    Args:
+        y: Mono (n,) or stereo (n, 2) float32 array in [-1, 1]
+        sr: Sample rate of y (Hz)
+        sample_rate: Target sample rate (Hz)
+        channels: Target channel count (1: mono, 2: stereo)
+        sample_width: Bytes per sample (2: s16, 4: s32)
+
+    Returns:
+        Raw PCM frames (no header)
+
+    Raises:
+        ValueError: Unsupported channel count or sample width
+    """
+    if sample_width not in PCM_SCALE:
+        raise ValueError(f"Unsupported sample width: {sample_width}")
+    y = np.nan_to_num(np.asarray(y, dtype=np.float32), nan=0.0, posinf=0.0, neginf=0.0)
+    in_channels = 1 if y.ndim == 1 else y.shape[1]
+    if in_channels not in (1, 2) or channels not in (1, 2):
+        raise ValueError(f"Unsupported channel conversion: {in_channels} -> {channels}")
+
+    y = resample_array(y, sr, sample_rate)
+    if in_channels == 2 and channels == 1:
+        y = y.mean(axis=1, dtype=np.float32)
+    elif in_channels == 1 and channels == 2:
+        y = np.repeat((y * np.float32(math.sqrt(0.5)))[:, None], 2, axis=1)
+
+    scale = PCM_SCALE[sample_width]
+    dtype = np.dtype("<i2") if sample_width == 2 else np.dtype("<i4")
+    # float64 only for s32, where float32 cannot hold every sample value
+    scaled = np.rint(y * (np.float32(scale) if sample_width == 2 else scale))
+    return np.clip(scaled, -scale, scale - 1).astype(dtype).tobytes()
+
+
 # ========== Audio Processing Utilities ==========
 
 
@@ -174,6 +252,15 @@ def rms(y: np.ndarray) -> float:
     return float(np.sqrt(np.mean(y * y) + 1e-12))
 
 
+def speech_like(seconds: float = 2.0, sr: int = 16000) -> np.ndarray:
+    """Speech-like test signal: 140Hz voiced tone with syllable-rate (3Hz) amplitude modulation and some noise."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sr)) / sr
+    syllables = (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)) ** 2
+    voice = np.sin(2 * np.pi * 140 * t) * syllables + 0.05 * rng.standard_normal(len(t))
+    return voice.astype(np.float32)
+
+
 def atempo_chain(rate: float) -> str:
     """
     Generate FFmpeg atempo filter chain for arbitrary rates.
@@ -201,24 +288,8 @@ def atempo_chain(rate: float) -> str:
 # ========== Pitch Shifting ==========
 
 
-def pitch_shift_ffmpeg_16k(
-    in_wav_16k: str,
-    out_wav_16k: str,
-    semitone_steps: float,
-    method: str = "auto",
-) -> None:
-    """
-    Pitch shift 16kHz mono WAV while maintaining tempo.
-
-    Args:
-        in_wav_16k: Input 16kHz mono WAV path
-        out_wav_16k: Output 16kHz mono WAV path
-        semitone_steps: Pitch shift in semitones (e.g., -12 = down 1 octave)
-        method: "auto", "rubberband", or "asetrate"
-
-    Raises:
-        RuntimeError: All methods failed
-    """
+def _pitch_shift_filters(semitone_steps: float, method: str = "auto") -> Sequence[tuple]:
+    """(method, FFmpeg filter) candidates for a tempo-preserving 16kHz pitch shift, best first"""
     sr = 16000
     ratio = 2 ** (semitone_steps / 12.0)  # pitch scale
 
@@ -230,7 +301,7 @@ def pitch_shift_ffmpeg_16k(
     else:
         methods = [method]
 
-    last_err = None
+    filters = []
     for m in methods:
         if m == "rubberband":
             af = f"rubberband=pitch={ratio:.6f}:tempo=1"
@@ -246,27 +317,22 @@ def pitch_shift_ffmpeg_16k(
             )
         else:
             raise ValueError(f"Unknown method: {m}")
+        filters.append((m, af))
+    return filters
+
 
+def pitch_shift_16k(y: np.ndarray, semitone_steps: float, method: str = "auto") -> np.ndarray:
+    """
+    Pitch shift a 16kHz mono array with FFmpeg while maintaining tempo.
+
+    Returns:
+        Shifted signal with DC offset removed
+    """
+    last_err = None
+    for m, af in _pitch_shift_filters(semitone_steps, method):
         try:
-            sh(
-                [
-                    "ffmpeg",
-                    "-y",
-                    "-hide_banner",
-                    "-loglevel",
-                    "error",
-                    "-i",
-                    str(in_wav_16k),
-                    "-ac",
-                    "1",
-                    "-ar",
-                    "16000",
-                    "-af",
-                    af,
-                    str(out_wav_16k),
-                ]
-            )
-            return
+            shifted = ffmpeg_filter_array(y, af, sr=16000)
+            return shifted - float(np.mean(shifted)) if len(shifted) else shifted
         except subprocess.CalledProcessError as e:
             last_err = e
             logger.warning(f"[pitch_shift] method '{m}' failed -> trying fallback ...")
@@ -275,12 +341,218 @@ def pitch_shift_ffmpeg_16k(
     # All methods failed
     if last_err is not None:
         raise last_err
-    raise RuntimeError("pitch_shift_ffmpeg_16k failed unexpectedly")
+    raise RuntimeError("pitch_shift_16k failed unexpectedly")
+
+
+# STFT settings of the phase vocoder (32 ms window, 75% overlap at 16kHz)
+VOCODER_N_FFT = 512
+VOCODER_HOP = 128
+
+
+def _phase_vocoder(mag: np.ndarray, phase: np.ndarray, rate: float, hop: int) -> np.ndarray:
+    """
+    Time-stretch an STFT by `rate` (>1 shortens) without changing pitch.
+
+    Vectorized over frames: magnitudes are interpolated between analysis
+    frames and the synthesis phase is the running sum of the measured
+    per-bin phase advance.
+    """
+    n_bins, n_frames = mag.shape
+    steps = np.arange(0, n_frames, rate)
+    idx = steps.astype(np.int64)
+    alpha = (steps - idx)[np.newaxis, :]
+
+    # Two trailing zero frames so idx + 1 is always valid
+    mag = np.pad(mag, [(0, 0), (0, 2)])
+    phase = np.pad(phase, [(0, 0), (0, 2)])
+
+    out_mag = (1.0 - alpha) * mag[:, idx] + alpha * mag[:, idx + 1]
+
+    # Expected phase advance per hop for each bin, plus the wrapped deviation
+    phi_advance = np.linspace(0, np.pi * hop, n_bins)[:, np.newaxis]
+    dphase = phase[:, idx + 1] - phase[:, idx] - phi_advance
+    dphase -= 2.0 * np.pi * np.round(dphase / (2.0 * np.pi))
+
+    out_phase = np.empty_like(out_mag)
+    out_phase[:, 0] = phase[:, 0]
+    out_phase[:, 1:] = phase[:, :1] + np.cumsum((phi_advance + dphase)[:, :-1], axis=1)
+    return out_mag * np.exp(1j * out_phase)
+
+
+def pitch_shift_vocoder(
+    y: np.ndarray, semitone_steps: Sequence[float], sr: int = 16000, n_fft: int = VOCODER_N_FFT, hop: int = VOCODER_HOP
+) -> List[np.ndarray]:
+    """
+    Pitch shift a mono array by several amounts, keeping its length and tempo.
+
+    The STFT is analysed once; each shift is a phase-vocoder time stretch
+    by 2**(-steps/12) followed by polyphase resampling back to the
+    original length.
+
+    Args:
+        y: Input mono signal
+        semitone_steps: Pitch shifts in semitones (e.g., [-6, -18])
+        sr: Sample rate
+        n_fft: STFT window length
+        hop: STFT hop length
+
+    Returns:
+        One float32 signal per shift, same length as y, DC offset removed
+    """
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64), nan=0.0, posinf=0.0, neginf=0.0)
+    n = len(y)
+    stft_args = {"fs": sr, "window": "hann", "nperseg": n_fft, "noverlap": n_fft - hop}
+    _, _, spec = signal.stft(np.pad(y, (0, max(0, n_fft - n))), **stft_args)
+    mag = np.abs(spec)
+    phase = np.angle(spec)
+
+    shifted = []
+    for steps in semitone_steps:
+        rate = 2.0 ** (-float(steps) / 12.0)
+        if abs(rate - 1.0) < 1e-6:
+            out = y.copy()
+        else:
+            _, stretched = signal.istft(_phase_vocoder(mag, phase, rate, hop), **stft_args)
+            # Play the stretched signal back at 1/rate speed: original length, shifted pitch
+            ratio = Fraction(rate).limit_denominator(200)
+            out = signal.resample_poly(stretched, ratio.numerator, ratio.denominator)
+        out = out[:n] if len(out) >= n else np.pad(out, (0, n - len(out)))
+        out = out - float(np.mean(out)) if n else out
+        shifted.append(out.astype(np.float32))
+    return shifted
 
 
 # ========== Signal Processing ==========
 
 
+def _attack_release_coefs(sr: int, attack_ms: float, release_ms: float) -> tuple:
+    a_a = math.exp(-1.0 / (max(1.0, attack_ms) * 0.001 * sr))
+    a_r = math.exp(-1.0 / (max(1.0, release_ms) * 0.001 * sr))
+    return a_a, a_r
+
+
+def _attack_release_loop(x: np.ndarray, a_a: float, a_r: float) -> np.ndarray:
+    """Per-sample attack/release one-pole (reference for _attack_release)."""
+    env = np.zeros_like(x, dtype=np.float32)
+    prev = 0.0
+    for i, v in enumerate(x):
+        a = a_a if v > prev else a_r
+        prev = a * prev + (1.0 - a) * float(v)
+        env[i] = prev
+    return env
+
+
+def _smooth_envelope_loop(x: np.ndarray, sr: int, attack_ms: float, release_ms: float) -> np.ndarray:
+    """Per-sample attack/release smoothing (reference for _smooth_envelope)."""
+    return _attack_release_loop(x, *_attack_release_coefs(sr, attack_ms, release_ms))
+
+
+def _one_pole_varying(x: np.ndarray, a: np.ndarray, block: int) -> np.ndarray:
+    """
+    y[n] = a[n] * y[n-1] + (1 - a[n]) * x[n] with y[-1] = 0, vectorized.
+
+    Each block is solved in closed form with cumulative products/sums
+    (the block length keeps the products well away from underflow), and
+    only the block start states are carried in Python.
+    """
+    n = len(x)
+    n_blocks = -(-n // block)
+    pad = n_blocks * block - n
+    if pad:
+        a = np.concatenate((a, np.ones(pad)))
+        x = np.concatenate((x, np.zeros(pad)))
+    a = a.reshape(n_blocks, block)
+    gain = np.cumprod(a, axis=1)
+    y = np.cumsum((1.0 - a) * x.reshape(n_blocks, block) / gain, axis=1)
+    y *= gain
+
+    starts = np.empty(n_blocks)
+    state = 0.0
+    for j, (g, end) in enumerate(zip(gain[:, -1].tolist(), y[:, -1].tolist())):
+        starts[j] = state
+        state = g * state + end
+    y += gain * starts[:, None]
+    return y.reshape(-1)[:n]
+
+
+def _instant_attack(x: np.ndarray, a_r: float, block: int) -> np.ndarray:
+    """
+    _attack_release() with a_a == 0: y[n] = max(x[n], a_r * y[n-1] + (1 - a_r) * x[n]).
+
+    The output is the highest of the release curves restarted at each
+    sample, so within a block it is a running maximum (in gain-normalized
+    units) on top of the release-only cumulative sum; only the block start
+    states are carried in Python.
+    """
+    n = len(x)
+    n_blocks = -(-n // block)
+    pad = n_blocks * block - n
+    if pad:
+        x = np.concatenate((x, np.zeros(pad)))
+    x = x.reshape(n_blocks, block)
+    gain = a_r ** np.arange(block, dtype=np.float64)
+    total = np.cumsum((1.0 - a_r) * x / gain, axis=1)
+    peak = np.maximum.accumulate(x / gain - total, axis=1)
+
+    starts = np.empty(n_blocks)
+    state = 0.0
+    for j, (t, p) in enumerate(zip(total[:, -1].tolist(), peak[:, -1].tolist())):
+        starts[j] = a_r * state
+        state = gain[-1] * (t + max(starts[j], p))
+    y = gain * (total + np.maximum(peak, starts[:, None]))
+    return y.reshape(-1)[:n]
+
+
+def _attack_release(x: np.ndarray, a_a: float, a_r: float, max_iter: int = 32) -> np.ndarray:
+    """
+    y[n] = a * y[n-1] + (1 - a) * x[n], with a = a_a where x[n] > y[n-1]
+    and a_r otherwise, without a per-sample loop.
+
+    Which coefficient applies at a sample depends on the previous output,
+    so the attack/release mask is solved as a fixed point: start from the
+    release-only output (scipy lfilter), compute the time-varying one-pole
+    filter for the current mask, re-derive the mask from that output, and
+    stop once it no longer changes. A consistent mask reproduces
+    _attack_release_loop() exactly; this takes a handful of passes on
+    speech, with the loop as a fallback. A zero coefficient (instant
+    attack or release) has no time constant and is solved directly.
+    """
+    n = len(x)
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    x64 = x.astype(np.float64)
+    if a_a <= 0.0 and a_r <= 0.0:
+        return x64.astype(np.float32)
+    if a_a <= 0.0 or a_r <= 0.0:
+        # Instant release is an instant attack on the negated signal
+        sign = 1.0 if a_a <= 0.0 else -1.0
+        a = max(a_a, a_r)
+        block = int(min(1024, max(16, -8.0 / math.log(a))))
+        return (sign * _instant_attack(sign * x64, a, block)).astype(np.float32)
+
+    # Blocks of ~8 time constants of the faster coefficient
+    tau = -1.0 / math.log(min(a_a, a_r))
+    block = int(min(1024, max(16, 8 * tau)))
+
+    y = signal.lfilter([1.0 - a_r], [1.0, -a_r], x64)
+    attack = np.empty(n, dtype=bool)
+    attack[0] = x64[0] > 0.0
+    for i in range(max_iter):
+        mask = x64[1:] > y[:-1]
+        if i and np.array_equal(mask, attack[1:]):
+            return y.astype(np.float32)
+        attack[1:] = mask
+        y = _one_pole_varying(x64, np.where(attack, a_a, a_r), block)
+
+    logger.debug("[attack/release] mask did not settle, using the per-sample loop")
+    return _attack_release_loop(x, a_a, a_r)
+
+
+def _smooth_envelope(x: np.ndarray, sr: int, attack_ms: float, release_ms: float) -> np.ndarray:
+    """Attack/release smoothing of a rectified signal (vectorized _smooth_envelope_loop)."""
+    return _attack_release(x, *_attack_release_coefs(sr, attack_ms, release_ms))
+
+
 def envelope_follower(
     x: np.ndarray,
     sr: int = 16000,
@@ -303,14 +575,7 @@ def envelope_follower(
     """
     x = np.abs(np.nan_to_num(x.astype(np.float32), nan=0.0, posinf=0.0, neginf=0.0))
     # 1-pole smoothing (attack/release)
-    a_a = math.exp(-1.0 / (max(1.0, attack_ms) * 0.001 * sr))
-    a_r = math.exp(-1.0 / (max(1.0, release_ms) * 0.001 * sr))
-    env = np.zeros_like(x, dtype=np.float32)
-    prev = 0.0
-    for i, v in enumerate(x):
-        a = a_a if v > prev else a_r
-        prev = a * prev + (1.0 - a) * float(v)
-        env[i] = prev
+    env = _smooth_envelope(x, sr, attack_ms, release_ms)
 
     # Normalize (0..1) -> clip -> power curve
     env = env / (float(np.max(env)) + 1e-9)
@@ -345,8 +610,171 @@ def tanh_drive(y: np.ndarray, drive: float) -> np.ndarray:
     return np.tanh(k * y).astype(np.float32)
 
 
+# ========== Post-FX Chain (native POST_FX_FILTER) ==========
+
+
+def echo(
+    y: np.ndarray,
+    sr: int = 16000,
+    in_gain: float = 0.8,
+    out_gain: float = 0.85,
+    delays_ms: Sequence[float] = (120.0, 240.0),
+    decays: Sequence[float] = (0.25, 0.18),
+) -> np.ndarray:
+    """
+    Multi-tap echo like FFmpeg aecho: out = out_gain * (in_gain * x + sum(decay * x delayed)).
+
+    As with aecho, the output is extended by the longest delay so the
+    echo tail is not cut off.
+    """
+    delays = [int(round(d * 0.001 * sr)) for d in delays_ms]
+    out = np.zeros(len(y) + max(delays), dtype=np.float32)
+    out[: len(y)] += in_gain * y
+    for delay, decay in zip(delays, decays):
+        out[delay : delay + len(y)] += decay * y
+    return (out * out_gain).astype(np.float32)
+
+
+def peaking_eq(y: np.ndarray, sr: int = 16000, freq: float = 140.0, q: float = 1.1, gain_db: float = 3.0) -> np.ndarray:
+    """Peaking biquad (RBJ cookbook), as FFmpeg equalizer with width_type q."""
+    w0 = 2.0 * math.pi * freq / sr
+    alpha = math.sin(w0) / (2.0 * q)
+    amp = 10.0 ** (gain_db / 40.0)
+    b = [1.0 + alpha * amp, -2.0 * math.cos(w0), 1.0 - alpha * amp]
+    a = [1.0 + alpha / amp, -2.0 * math.cos(w0), 1.0 - alpha / amp]
+    return signal.lfilter(b, a, y).astype(np.float32)
+
+
+def _hermite(x: np.ndarray, x0: float, x1: float, p0: float, p1: float, m0: float, m1: float) -> np.ndarray:
+    width = x1 - x0
+    t = (x - x0) / width
+    m0 *= width
+    m1 *= width
+    c2 = -3 * p0 - 2 * m0 + 3 * p1 - m1
+    c3 = 2 * p0 + m0 - 2 * p1 + m1
+    return ((c3 * t + c2) * t + m0) * t + p0
+
+
+def compressor(
+    y: np.ndarray,
+    sr: int = 16000,
+    threshold: float = 0.18,
+    ratio: float = 4.0,
+    attack_ms: float = 15.0,
+    release_ms: float = 260.0,
+    makeup: float = 1.5,
+    knee: float = 2.82843,
+) -> np.ndarray:
+    """
+    Feed-forward downward compressor following FFmpeg acompressor (RMS detection, soft knee).
+
+    The detector is the attack/release one-pole on the squared signal and
+    the gain curve is evaluated for all samples at once.
+    """
+    attack = min(1.0, 1.0 / (attack_ms * sr / 4000.0))
+    release = min(1.0, 1.0 / (release_ms * sr / 4000.0))
+    level = _attack_release(np.square(y, dtype=np.float32), 1.0 - attack, 1.0 - release).astype(np.float64)
+
+    thres = math.log(threshold)
+    knee_start = math.log(threshold / math.sqrt(knee))
+    knee_stop = math.log(threshold * math.sqrt(knee))
+    compressed_knee_stop = (knee_stop - thres) / ratio + thres
+    adj_knee_start = (threshold / math.sqrt(knee)) ** 2
+
+    gain = np.ones(len(y))
+    active = level > adj_knee_start
+    if np.any(active):
+        slope = 0.5 * np.log(level[active])
+        out = (slope - thres) / ratio + thres
+        in_knee = slope < knee_stop
+        out[in_knee] = _hermite(
+            slope[in_knee], knee_start, knee_stop, knee_start, compressed_knee_stop, 1.0, 1.0 / ratio
+        )
+        gain[active] = np.exp(out - slope)
+    return (y * gain * makeup).astype(np.float32)
+
+
+def limiter(
+    y: np.ndarray,
+    sr: int = 16000,
+    limit: float = 0.97,
+    attack_ms: float = 5.0,
+    release_ms: float = 50.0,
+    auto_level: bool = True,
+) -> np.ndarray:
+    """
+    Look-ahead peak limiter (the role of FFmpeg alimiter).
+
+    The whole signal is available, so the look-ahead needs no delay: the
+    gain reduction each peak requires is spread over the attack window
+    before it (sliding maximum, then moving average) and released with an
+    exponential decay. Peaks never exceed `limit`; with auto_level the
+    output is scaled by 1/limit like alimiter's default.
+    """
+    peak = np.abs(y).astype(np.float64)
+    reduction = np.clip(1.0 - limit / np.maximum(peak, 1e-12), 0.0, None)
+
+    window = max(1, int(round(attack_ms * 0.001 * sr)))
+    # Reduction needed anywhere in the next `window` samples
+    ahead = ndimage.maximum_filter1d(reduction, window, mode="constant", origin=-(window // 2))
+
+    # Hold with exponential release: max over k <= n of ahead[k] * decay^(n - k), in log domain
+    decay_per_sample = 1.0 / (max(1.0, release_ms) * 0.001 * sr)
+    t = np.arange(len(y)) * decay_per_sample
+    with np.errstate(divide="ignore"):
+        held = np.exp(np.maximum.accumulate(np.log(ahead) + t) - t)
+
+    # Moving average over the attack window turns steps into ramps (still covering each peak);
+    # the signal start is padded with its first value, so early peaks are covered too
+    padded = np.concatenate((np.full(window, held[0] if len(held) else 0.0), held))
+    csum = np.cumsum(padded)
+    smoothed = (csum[window:] - csum[:-window]) / window
+
+    out = y * (1.0 - smoothed)
+    if auto_level:
+        out = out / limit
+    return out.astype(np.float32)
+
+
+def post_fx(y: np.ndarray, sr: int = 16000) -> np.ndarray:
+    """In-process POST_FX_FILTER: echo -> peaking EQ at 140Hz -> compressor -> limiter."""
+    y = echo(y, sr, 0.8, 0.85, (120.0, 240.0), (0.25, 0.18))
+    y = peaking_eq(y, sr, freq=140.0, q=1.1, gain_db=3.0)
+    y = compressor(y, sr, threshold=0.18, ratio=4.0, attack_ms=15.0, release_ms=260.0, makeup=1.5)
+    return limiter(y, sr, limit=0.97)
+
+
 # ========== Rumble Generation ==========
 
+# Rumble noise level relative to the voice RMS, times the rumble amount
+RUMBLE_NOISE_LEVEL = 0.9
+
+# Slow LFO on the rumble noise: gain (1 - depth) + depth * sin, rate drawn from [low, low + span) Hz
+RUMBLE_LFO_DEPTH = 0.35
+RUMBLE_LFO_HZ = (0.25, 0.35)
+
+
+def _rumble_noise_source(n: int, seed: int) -> tuple:
+    """Brown noise, LFO rate and LFO phase, in the order make_rumble_noise() draws them"""
+    rng = np.random.default_rng(seed)
+    white = rng.standard_normal(n).astype(np.float32)
+    brown = np.cumsum(white).astype(np.float32)
+    brown = brown / (np.max(np.abs(brown)) + 1e-9)
+    lfo_hz = RUMBLE_LFO_HZ[0] + RUMBLE_LFO_HZ[1] * rng.random()
+    return brown, lfo_hz, 2 * np.pi * rng.random()
+
+
+def _rumble_bands(brown: np.ndarray, sr: int, base_hz: float) -> np.ndarray:
+    """Mix of three low bands of the brown noise (several bands avoid a "hum")"""
+
+    def band(low, high):
+        return butter_filter(brown, sr, "bandpass", [low, high], order=4)
+
+    b1 = band(max(20.0, base_hz * 0.45), min(650.0, base_hz * 2.2))
+    b2 = band(max(20.0, base_hz * 0.90), min(650.0, base_hz * 3.6))
+    low_wide = butter_filter(brown, sr, "lowpass", min(220.0, base_hz * 3.0), order=4)
+    return (0.55 * low_wide + 0.30 * b1 + 0.15 * b2).astype(np.float32)
+
 
 def make_rumble_noise(
     voice: np.ndarray,
@@ -371,45 +799,44 @@ def make_rumble_noise(
     if amount <= 0:
         return np.zeros_like(voice, dtype=np.float32)
 
-    rng = np.random.default_rng(seed)
     n = len(voice)
     t = np.arange(n) / sr
 
     env = envelope_follower(voice, sr=sr, attack_ms=8, release_ms=220, power=1.35)
 
-    # Brown-like noise (natural low-frequency content)
-    white = rng.standard_normal(n).astype(np.float32)
-    brown = np.cumsum(white).astype(np.float32)
-    brown = brown / (np.max(np.abs(brown)) + 1e-9)
-
-    # Synthesize multiple bands to avoid "hum" artifacts
-    def band(low, high):
-        return butter_filter(brown, sr, "bandpass", [low, high], order=4)
-
-    b1 = band(max(20.0, base_hz * 0.45), min(650.0, base_hz * 2.2))
-    b2 = band(max(20.0, base_hz * 0.90), min(650.0, base_hz * 3.6))
-    low_wide = butter_filter(brown, sr, "lowpass", min(220.0, base_hz * 3.0), order=4)
-
-    rum = (0.55 * low_wide + 0.30 * b1 + 0.15 * b2).astype(np.float32)
+    # Brown-like noise (natural low-frequency content) in several bands
+    brown, lfo_f, lfo_phase = _rumble_noise_source(n, seed)
+    rum = _rumble_bands(brown, sr, base_hz)
 
     # Add slow LFO modulation
-    lfo_f = 0.25 + 0.35 * rng.random()
-    lfo = (0.65 + 0.35 * np.sin(2 * np.pi * lfo_f * t + 2 * np.pi * rng.random())).astype(np.float32)
+    lfo = ((1.0 - RUMBLE_LFO_DEPTH) + RUMBLE_LFO_DEPTH * np.sin(2 * np.pi * lfo_f * t + lfo_phase)).astype(np.float32)
 
     rum = rum * env * lfo
 
     # Adjust level: relative to voice RMS
-    target = rms(voice) * (0.9 * amount)
+    target = rms(voice) * (RUMBLE_NOISE_LEVEL * amount)
     rum = rum * (target / (rms(rum) + 1e-9))
     return rum.astype(np.float32)
 
 
+def _rumble_noise_profile(n: int, sr: int, base_hz: float, seed: int) -> tuple:
+    """
+    LFO rate and audible share of the noise make_rumble_noise() makes for n samples.
+
+    The brown noise drifts: most of its energy lies below 20Hz, a share that
+    depends on the seed and the length. The share is the RMS above 20Hz over
+    the full RMS, before the envelope and LFO.
+    """
+    brown, lfo_hz, _ = _rumble_noise_source(n, seed)
+    rum = _rumble_bands(brown, sr, base_hz)
+    return lfo_hz, rms(butter_filter(rum, sr, "highpass", 20.0)) / (rms(rum) + 1e-9)
+
+
 # ========== Main Rumble Effect Functions ==========
 
 
-def rumble_layered(
-    in_wav_16k: str,
-    out_wav_16k: str,
+def rumble_layered_array(
+    dry: np.ndarray,
     pitch_steps: float = -6.0,
     sub_oct_mix: float = 0.55,
     rumble_mix: float = 0.25,
@@ -417,7 +844,8 @@ def rumble_layered(
     drive: float = 0.55,
     xover_hz: float = 280.0,
     seed: int = 42,
-) -> None:
+    pitch_method: str = "auto",
+) -> np.ndarray:
     """
     Apply layered rumble effect with pitch shifting and crossover filtering.
 
@@ -429,8 +857,7 @@ def rumble_layered(
     5. Applies drive and normalization
 
     Args:
-        in_wav_16k: Input 16kHz mono WAV path
-        out_wav_16k: Output 16kHz mono WAV path
+        dry: Input 16kHz mono signal (float32, DC removed, e.g. from load16k/decode16k)
         pitch_steps: Main pitch shift in semitones (e.g., -6 = down 6 semitones)
         sub_oct_mix: Sub-octave layer mix amount (0..1)
         rumble_mix: Synthetic rumble noise mix amount (0..1)
@@ -438,18 +865,21 @@ def rumble_layered(
         drive: Distortion drive amount (0..1)
         xover_hz: Crossover frequency for high/low split
         seed: Random seed for rumble generation
+        pitch_method: "auto"/"vocoder" (in-process, both layers from one analysis),
+            "ffmpeg" (rubberband if available, else asetrate), "rubberband" or "asetrate"
+
+    Returns:
+        Processed 16kHz mono signal
     """
     sr = 16000
-    dry = load16k(in_wav_16k)
-
-    # Pitch shift (main/sub) with FFmpeg, then mix in Python
-    main_ps = str(WORKDIR / "_r2_main.wav")
-    sub_ps = str(WORKDIR / "_r2_sub.wav")
-    pitch_shift_ffmpeg_16k(in_wav_16k, main_ps, pitch_steps, method="auto")
-    pitch_shift_ffmpeg_16k(in_wav_16k, sub_ps, pitch_steps - 12.0, method="auto")
 
-    main = load16k(main_ps)
-    sub = load16k(sub_ps)
+    # Pitch shift (main/sub), then mix in Python
+    if pitch_method in ("auto", "vocoder"):
+        main, sub = pitch_shift_vocoder(dry, [pitch_steps, pitch_steps - 12.0], sr=sr)
+    else:
+        ffmpeg_method = "auto" if pitch_method == "ffmpeg" else pitch_method
+        main = pitch_shift_16k(dry, pitch_steps, method=ffmpeg_method)
+        sub = pitch_shift_16k(dry, pitch_steps - 12.0, method=ffmpeg_method)
 
     n = min(len(dry), len(main), len(sub))
     if n < sr * 0.2:
@@ -476,44 +906,267 @@ def rumble_layered(
 
     mix = high_voice + low_rumble
     mix = mix - float(np.mean(mix))
-    mix = peak_norm(mix, 0.95)
-
-    write16k(out_wav_16k, mix)
+    return peak_norm(mix, 0.95)
 
 
-def rumble_layered_with_fx(in_wav_16k: str, out_wav_16k: str, **kwargs) -> None:
+def rumble_layered_with_fx_array(dry: np.ndarray, post_fx_method: str = "native", **kwargs) -> np.ndarray:
     """
     Apply layered rumble effect with additional reverb, EQ, compression, and limiting.
 
     This is the top-level rumble effect function that:
-    1. Calls rumble_layered() for core processing
-    2. Applies post-processing effects chain:
+    1. Calls rumble_layered_array() for core processing
+    2. Applies the post-processing chain, in-process (post_fx(), "native")
+       or as POST_FX_FILTER through an FFmpeg pipe ("ffmpeg"):
        - Echo/reverb
        - EQ boost at 140Hz
        - Dynamic compression
        - Limiter
 
+    Args:
+        dry: Input 16kHz mono signal
+        post_fx_method: "native" or "ffmpeg"
+        **kwargs: Additional arguments passed to rumble_layered_array()
+
+    Returns:
+        Processed 16kHz mono signal
+    """
+    base = rumble_layered_array(dry, **kwargs)
+    if post_fx_method == "ffmpeg":
+        return ffmpeg_filter_array(base, POST_FX_FILTER, sr=16000)
+    if post_fx_method != "native":
+        raise ValueError(f"Unknown post_fx_method: {post_fx_method}")
+    return post_fx(base, sr=16000)
+
+
+def rumble_layered(in_wav_16k: str, out_wav_16k: str, **kwargs) -> None:
+    """
+    File-based rumble_layered_array().
+
     Args:
         in_wav_16k: Input 16kHz mono WAV path
         out_wav_16k: Output 16kHz mono WAV path
-        **kwargs: Additional arguments passed to rumble_layered()
-    """
-    tmp = str(WORKDIR / "_tmp_r3_base.wav")
-    rumble_layered(in_wav_16k, tmp, **kwargs)
-
-    # Post-processing: reverb + EQ + compression + limiter
-    af = ",".join(
-        [
-            "aecho=0.8:0.85:120|240:0.25|0.18",
-            "equalizer=f=140:t=q:w=1.1:g=3",
-            "acompressor=threshold=0.18:ratio=4:attack=15:release=260:makeup=1.5",
-            "alimiter=limit=0.97",
-        ]
-    )
-    ffmpeg_apply_filter(tmp, out_wav_16k, af)
+        **kwargs: Additional arguments passed to rumble_layered_array()
+    """
+    write16k(out_wav_16k, rumble_layered_array(load16k(in_wav_16k), **kwargs))
+
+
+def rumble_layered_with_fx(in_wav_16k: str, out_wav_16k: str, **kwargs) -> None:
+    """
+    File-based rumble_layered_with_fx_array().
+
+    Args:
+        in_wav_16k: Input 16kHz mono WAV path
+        out_wav_16k: Output 16kHz mono WAV path
+        **kwargs: Additional arguments passed to rumble_layered_with_fx_array()
+    """
+    write16k(out_wav_16k, rumble_layered_with_fx_array(load16k(in_wav_16k), **kwargs))
+
+
+# ========== Fused FFmpeg Backend ==========
+
+# Q of the two biquads of a 4th-order Butterworth section (matches butter_filter(order=4))
+BUTTER4_Q = (0.54119610, 1.30656296)
+
+# Level below which the sidechain gates close the sub and noise layers
+FUSED_GATE_THRESHOLD = 0.02
+
+# RMS of the fused graph's LFO gain (1 - depth) + depth * sin, which scales the noise RMS
+FUSED_LFO_RMS = math.sqrt((1.0 - RUMBLE_LFO_DEPTH) ** 2 + RUMBLE_LFO_DEPTH**2 / 2.0)
+
+# Mix peak estimate for the normalization gain. The 420Hz-lowpassed main layer
+# keeps 0.83-0.96 of the voice peak on speech; the high band's peaks rarely
+# coincide with the low bus peaks, so it adds a fraction of the voice peak.
+# Both are empirical: the estimate lands within -2..+3 dB of the numpy chain's
+# mix peak, and the 4:1 post-FX compressor cuts that error to under 1 dB.
+FUSED_LOW_PEAK_RATIO = 0.9
+FUSED_HIGH_PEAK_SHARE = 0.35
+
+
+def _butter4(kind: str, freq: float) -> str:
+    """4th-order Butterworth low/highpass as two FFmpeg biquads"""
+    return ",".join(f"{kind}=f={freq:.3f}:t=q:w={q}" for q in BUTTER4_Q)
+
+
+@functools.lru_cache(maxsize=16)
+def _fused_noise_rms(rumble_base_hz: float, sr: int = 16000) -> float:
+    """RMS above 20Hz of the fused graph's noise bands for unit uniform white noise, by simulation"""
+    rng = np.random.default_rng(0)
+    white = rng.uniform(-1.0, 1.0, sr * 2)
+    # lowpass=f=20:p=1 (one pole)
+    pole = math.exp(-2.0 * math.pi * 20.0 / sr)
+    brown = signal.lfilter([1.0 - pole], [1.0, -pole], white)
+
+    def band(low, high):
+        return butter_filter(butter_filter(brown, sr, "highpass", low), sr, "lowpass", high)
+
+    b1 = band(max(20.0, rumble_base_hz * 0.45), min(650.0, rumble_base_hz * 2.2))
+    b2 = band(max(20.0, rumble_base_hz * 0.90), min(650.0, rumble_base_hz * 3.6))
+    low_wide = butter_filter(brown, sr, "lowpass", min(220.0, rumble_base_hz * 3.0))
+    mix = 0.55 * low_wide + 0.30 * b1 + 0.15 * b2
+    return rms(butter_filter(mix, sr, "highpass", 20.0)[sr // 2 :])
+
+
+def rumble_filter_complex(
+    main_pitch: str,
+    sub_pitch: str,
+    voice_peak: float,
+    voice_rms: float,
+    sub_oct_mix: float = 0.55,
+    rumble_mix: float = 0.25,
+    rumble_base_hz: float = 55.0,
+    drive: float = 0.55,
+    xover_hz: float = 280.0,
+    lfo_hz: float = RUMBLE_LFO_HZ[0] + RUMBLE_LFO_HZ[1] / 2.0,
+    noise_share: float = 1.0,
+    sample_rate: int = 48000,
+) -> str:
+    """
+    FFmpeg filter_complex equivalent of rumble_layered_with_fx_array() plus output resampling.
+
+    Same topology as the numpy chain, with FFmpeg approximations where no
+    filter matches exactly: the envelope gating of the sub and noise layers
+    is a sidechain gate keyed by the main layer, the rumble noise is
+    one-pole-filtered white noise (aeval, so it ends with the voice) at a
+    level set from the input RMS and the audible share of the numpy noise
+    (see _rumble_noise_profile()), and the peak normalization before the
+    post-FX is a fixed gain from an estimate of the mix peak (a single pass
+    cannot measure it).
 
+    Args:
+        main_pitch: FFmpeg pitch-shift filter for the main layer (see _pitch_shift_filters)
+        sub_pitch: FFmpeg pitch-shift filter for the sub-octave layer
+        voice_peak: Peak of the input (sets the normalization gain)
+        voice_rms: RMS of the input (sets the noise level)
+        sub_oct_mix, rumble_mix, rumble_base_hz, drive, xover_hz: As in rumble_layered_array()
+        lfo_hz: Rate of the noise LFO (Hz)
+        noise_share: Share of the noise RMS to keep, the audible share of the numpy noise
+        sample_rate: Output sample rate
+
+    Returns:
+        Filter graph reading [0:a] and writing [out]
+    """
+    sub_lp_hz = float(min(700.0, max(220.0, rumble_base_hz * 6.0)))
+    # Noise level relative to the voice, compensating the noise bands and the LFO
+    noise_rms = RUMBLE_NOISE_LEVEL * rumble_mix * voice_rms * noise_share
+    noise_gain = noise_rms / (FUSED_LFO_RMS * _fused_noise_rms(float(rumble_base_hz)))
+    drive_k = 1.0 + float(drive) * 5.0
+    drive_filter = f"volume={drive_k:.4f},asoftclip=type=tanh," if drive > 0 else ""
+    # Mix peak estimate: driven low bus (main + sub) plus the high voice band
+    low_peak = voice_peak * (1.0 + float(sub_oct_mix)) * FUSED_LOW_PEAK_RATIO
+    mix_peak = (math.tanh(drive_k * low_peak) if drive > 0 else low_peak) + FUSED_HIGH_PEAK_SHARE * voice_peak
+    mix_gain = 0.95 / mix_peak if mix_peak > 1e-9 else 1.0
+    gate = f"sidechaingate=threshold={FUSED_GATE_THRESHOLD}:range=0"
+
+    def band(low, high):
+        return f"{_butter4('highpass', low)},{_butter4('lowpass', high)}"
+
+    graph = [
+        # 16kHz mono, DC blocked
+        "[0:a]aformat=channel_layouts=mono,aresample=16000,highpass=f=10:p=1,asplit=2[dry_main][dry_sub]",
+        # Main layer: bass, crossover high band, sidechains and noise source
+        f"[dry_main]{main_pitch},asplit=5[main_low][main_high][main_sc1][main_sc2][main_noise]",
+        f"[main_low]{_butter4('lowpass', 420.0)}[low_main]",
+        # Sub-octave layer gated by the main layer
+        f"[dry_sub]{sub_pitch},{_butter4('lowpass', sub_lp_hz)}[sub_lp]",
+        f"[sub_lp][main_sc1]{gate}:attack=6:release=180[low_sub]",
+        # Rumble noise: brown-ish noise in three bands, slow LFO, gated by the main layer
+        f"[main_noise]aeval=exprs=random(0)*2-1:c=same,lowpass=f=20:p=1,volume={noise_gain:.6f},"
+        "asplit=3[noise_w][noise_b1][noise_b2]",
+        f"[noise_w]{_butter4('lowpass', min(220.0, rumble_base_hz * 3.0))}[noise_low]",
+        f"[noise_b1]{band(max(20.0, rumble_base_hz * 0.45), min(650.0, rumble_base_hz * 2.2))}[noise_band1]",
+        f"[noise_b2]{band(max(20.0, rumble_base_hz * 0.90), min(650.0, rumble_base_hz * 3.6))}[noise_band2]",
+        "[noise_low][noise_band1][noise_band2]amix=inputs=3:weights=0.55 0.30 0.15:normalize=0,"
+        # tremolo's gain is (1 - d/2) + d/2 * sin, so d is twice the LFO depth
+        f"tremolo=f={lfo_hz:.3f}:d={2.0 * RUMBLE_LFO_DEPTH:.2f}[noise_mod]",
+        f"[noise_mod][main_sc2]{gate}:attack=8:release=220[noise]",
+        # Low bus with drive, crossover and final mix
+        f"[low_main][low_sub][noise]amix=inputs=3:weights=1 {float(sub_oct_mix):.4f} 1:normalize=0:duration=first,"
+        f"{drive_filter}{_butter4('lowpass', xover_hz)}[low_rumble]",
+        f"[main_high]{_butter4('highpass', xover_hz)}[high_voice]",
+        f"[high_voice][low_rumble]amix=inputs=2:normalize=0:duration=first,volume={mix_gain:.6f},"
+        f"{POST_FX_FILTER},aresample={sample_rate}[out]",
+    ]
+    return ";".join(graph)
+
+
+def rumble_layered_with_fx_ffmpeg(
+    data: bytes,
+    sample_rate: int = 48000,
+    channels: int = 2,
+    output_format: str = "s16le",
+    pitch_steps: float = -6.0,
+    sub_oct_mix: float = 0.55,
+    rumble_mix: float = 0.25,
+    rumble_base_hz: float = 55.0,
+    drive: float = 0.55,
+    xover_hz: float = 280.0,
+    seed: int = 42,
+    pitch_method: str = "auto",
+    post_fx_method: str = "ffmpeg",
+) -> bytes:
+    """
+    Rumble effect and output conversion in a single FFmpeg invocation (stdin to stdout).
+
+    Alternative to the numpy chain for when FFmpeg is fast and Python is
+    not: one process instead of one per stage. The pitch shift uses
+    rubberband when available (pitch_method "auto"/"ffmpeg"/"vocoder"),
+    falling back to asetrate. `seed` sets the noise LFO rate and level as
+    in the numpy chain, not the noise itself; `post_fx_method` is accepted
+    for signature compatibility and ignored.
 
-# ========== Logging ==========
+    Args:
+        data: Input WAV bytes (any rate/channels)
+        sample_rate: Output sample rate
+        channels: Output channel count
+        output_format: FFmpeg raw output format (e.g. "s16le")
+        pitch_steps, sub_oct_mix, rumble_mix, rumble_base_hz, drive, xover_hz, seed: As in rumble_layered_array()
+        pitch_method: "auto", "rubberband" or "asetrate"
+
+    Returns:
+        Raw PCM in output_format
+
+    Raises:
+        subprocess.CalledProcessError: FFmpeg failed with every pitch method
+    """
+    y, sr = sf.read(io.BytesIO(data), dtype="float32")
+    if y.ndim > 1:
+        y = y.mean(axis=1)
+    voice_peak = float(np.max(np.abs(y))) if len(y) else 0.0
+    voice_rms = rms(y) if len(y) else 0.0
+    # LFO rate and noise level the numpy chain would draw for the 16kHz length
+    n = math.ceil(len(y) * 16000 / sr)
+    lfo_hz, noise_share = RUMBLE_LFO_HZ[0] + RUMBLE_LFO_HZ[1] / 2.0, 0.0
+    if rumble_mix > 0 and n:
+        lfo_hz, noise_share = _rumble_noise_profile(n, 16000, rumble_base_hz, seed)
+
+    method = "auto" if pitch_method in ("auto", "vocoder", "ffmpeg") else pitch_method
+    main_filters = _pitch_shift_filters(pitch_steps, method)
+    sub_filters = _pitch_shift_filters(pitch_steps - 12.0, method)
 
-logger.info(f"FFmpeg has rubberband: {ffmpeg_has_filter('rubberband')}")
-logger.info(f"FFmpeg has asubboost: {ffmpeg_has_filter('asubboost')}")
+    last_err = None
+    for (m, main_pitch), (_, sub_pitch) in zip(main_filters, sub_filters):
+        graph = rumble_filter_complex(
+            main_pitch,
+            sub_pitch,
+            voice_peak,
+            voice_rms,
+            sub_oct_mix=sub_oct_mix,
+            rumble_mix=rumble_mix,
+            rumble_base_hz=rumble_base_hz,
+            drive=drive,
+            xover_hz=xover_hz,
+            lfo_hz=lfo_hz,
+            noise_share=noise_share,
+            sample_rate=sample_rate,
+        )
+        try:
+            return ffmpeg_pipe(
+                [], ["-filter_complex", graph, "-map", "[out]", "-ac", str(channels), "-f", output_format], data
+            )
+        except subprocess.CalledProcessError as e:
+            last_err = e
+            logger.warning(f"[rumble_fused] method '{m}' failed -> trying fallback ...")
+
+    if last_err is not None:
+        raise last_err
+    raise RuntimeError("rumble_layered_with_fx_ffmpeg failed unexpectedly")
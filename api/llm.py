@@ -1,40 +1,129 @@
-import json
+import asyncio
+import functools
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import List, Optional
 
 import argostranslate.translate
 from loguru import logger
 
-from api.utils import LLM_SETTINGS
-from stackflow.utils import (
-    close_tcp_connection,
-    create_tcp_connection,
-    exit_session,
-    parse_setup_response,
-    receive_response,
-    send_json,
-)
+from api.utils import LLM_SETTINGS, WARMUP_TEXT
+from stackflow.client import StackFlowConnection
+from stackflow.session import UnitSession
+from stackflow.utils import UnitLostError, check_unit_lost, parse_setup_response
+
+
+# Characters that end a poetic phrase (for StopPolicy.stop_at_punctuation).
+# "." ends one only before whitespace (not in "3.5" or "e.g."), and a line
+# break ends the phrase before it.
+PUNCTUATION_BOUNDARIES = "。！？!?"
+
+
+@dataclass
+class StopPolicy:
+    """
+    Client-side stop conditions for a streamed generation.
+
+    A limit of 0 disables it. Limits apply to the postprocessed text.
+    """
+
+    max_tokens: int = 0  # number of streamed deltas
+    max_chars: int = 0
+    stop_strings: List[str] = field(default_factory=list)
+    stop_at_punctuation: bool = False
+
+    @classmethod
+    def from_config(cls, config: dict) -> "StopPolicy":
+        stop_config = config.get("stack_flow_llm", {}).get("stop", {})
+        return cls(
+            max_tokens=int(stop_config.get("max_tokens", 0)),
+            max_chars=int(stop_config.get("max_chars", 0)),
+            stop_strings=list(stop_config.get("stop_strings", [])),
+            stop_at_punctuation=bool(stop_config.get("stop_at_punctuation", False)),
+        )
+
+    def cut(self, text: str, num_tokens: int) -> Optional[str]:
+        """
+        Check the text generated so far
+
+        Returns:
+            The text to keep if generation should stop now, otherwise None
+        """
+        for stop in self.stop_strings:
+            idx = text.find(stop)
+            if idx >= 0:
+                return text[:idx]
+
+        if self.stop_at_punctuation:
+            for i, ch in enumerate(text):
+                if not text[:i].strip():
+                    # Leading punctuation does not end an empty phrase
+                    continue
+                if ch == "\n":
+                    return text[:i]
+                # A "." at the end may continue ("3." then "5"): wait for the next delta
+                if ch in PUNCTUATION_BOUNDARIES or (ch == "." and text[i + 1 : i + 2].isspace()):
+                    return text[: i + 1]
+
+        if self.max_chars and len(text) >= self.max_chars:
+            return text[: self.max_chars]
+
+        if self.max_tokens and num_tokens >= self.max_tokens:
+            return text
+
+        return None
 
 
 class StackFlowLLMClient:
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, connection: StackFlowConnection | None = None):
         self.config = config
         self.set_params(config)
 
-        self.sock = create_tcp_connection("localhost", 10001)
-        self.llm_work_id = self._init()
+        # Connected and set up by init(). A shared connection is owned
+        # (and closed) by whoever passed it in.
+        self.connection = connection or StackFlowConnection()
+        self._owns_connection = connection is None
+        self.llm_work_id = None
+        # Persisted work_id, for reattaching to a still-loaded model after a restart
+        self.session = UnitSession.from_config(config)
+
+    async def init(self):
+        """Connect to StackFlow and set up the LLM unit"""
+        await self.connection.connect()
+        self.llm_work_id = await self._init()
+        # After a reconnect, reuse the unit if StackFlow kept it loaded, or set it up again
+        self.connection.add_reconnect_hook(self._resetup)
 
-    def __del__(self):
-        deinit_data = self._create_deinit_data()
-        exit_session(self.sock, deinit_data)
-        close_tcp_connection(self.sock)
+    async def close(self):
+        """
+        Release the LLM unit (unless it is kept for reattaching) and close
+        the connection if it is our own
+        """
+        if self.session.enabled:
+            logger.info(f"Keeping LLM unit {self.llm_work_id} loaded for reattach")
+        elif self.llm_work_id is not None and self.connection.healthy:
+            try:
+                response_data = await self.connection.request(
+                    self._create_deinit_data(), timeout=self.timeout, retries=0
+                )
+                logger.info(f"Exit Response: {response_data}")
+            except Exception as e:
+                logger.error(f"Error exiting LLM unit: {e}")
+        self.llm_work_id = None
+        if self._owns_connection:
+            await self.connection.close()
 
     def set_params(self, config: dict):
         lang = config.get("common").get("lang")
         self.lang = lang
         self.model = LLM_SETTINGS.get(lang).get("model")
         self.max_tokens = config.get("stack_flow_llm").get("max_tokens")
+        self.timeout = config.get("stack_flow_llm").get("timeout", 30.0)
+        self.setup_timeout = config.get("stack_flow_llm").get("setup_timeout", 120.0)
         self.system_prompt = LLM_SETTINGS.get(lang).get("system_prompt")
         self.translation_prompt = LLM_SETTINGS.get(lang).get("translation_prompt")
         self.instruction_prompt = LLM_SETTINGS.get(lang).get("instruction_prompt")
+        self.stop_policy = StopPolicy.from_config(config)
 
         logger.info("[LLM info]")
         logger.info(f"lang: {lang}")
@@ -43,11 +132,25 @@ class StackFlowLLMClient:
         logger.info(f"system_prompt: {self.system_prompt}")
         logger.info(f"translation_prompt: {self.translation_prompt}")
         logger.info(f"instruction_prompt: {self.instruction_prompt}")
+        logger.info(f"stop_policy: {self.stop_policy}")
         logger.info("")
 
     async def generate_text(
-        self, query: str, lang: str, soft_prefix_b64: str | None = None, soft_prefix_len: int = 0
+        self,
+        query: str,
+        lang: str,
+        soft_prefix_b64: str | None = None,
+        soft_prefix_len: int = 0,
+        stop_policy: StopPolicy | None = None,
     ) -> str:
+        """
+        Generate a continuation of query.
+
+        Streaming stops as soon as stop_policy (default: the configured one)
+        is satisfied; the running inference is then aborted on StackFlow.
+        The event loop keeps running while the NPU is busy.
+        """
+        stop_policy = stop_policy or self.stop_policy
         logger.info(f"query: {query}")
         translated_query = await self._translate(query, lang)
         logger.info(f"translated_query: {translated_query}")
@@ -56,42 +159,103 @@ class StackFlowLLMClient:
         if soft_prefix_b64 is not None:
             logger.info(f"soft_prefix_b64: {soft_prefix_b64[:30]}... len: {soft_prefix_len}")
 
-        send_data = self._create_send_data(prompt, soft_prefix_b64, soft_prefix_len)
-        send_json(self.sock, send_data)
+        # Built per attempt, so a retry uses the current work_id and a fresh request_id
+        build_send_data = functools.partial(self._create_send_data, prompt, soft_prefix_b64, soft_prefix_len)
+        try:
+            return await self._run_inference(build_send_data, stop_policy)
+        except UnitLostError as e:
+            logger.warning(f"LLM unit lost ({e}), setting it up again")
+            await self._resetup(reattach=False)
+            return await self._run_inference(build_send_data, stop_policy)
+
+    async def warmup(self):
+        """
+        Run a one-token generation, so the first real cycle does not pay the
+        cold-start costs of the first inference and of loading the
+        translation model.
+        """
+        await self.generate_text(WARMUP_TEXT.get(self.lang, "Hello"), self.lang, stop_policy=StopPolicy(max_tokens=1))
 
+    async def _run_inference(self, build_send_data, stop_policy: StopPolicy) -> str:
+        """Stream one inference, stopping early per stop_policy"""
         output = ""
-        while True:
-            response = receive_response(self.sock)
-            response_data = json.loads(response)
+        num_tokens = 0
+        kept = None
+        finish = False
+        # aclosing() releases the stream's route on early exit
+        async with aclosing(self.connection.stream(build_send_data, timeout=self.timeout)) as frames:
+            async for response_data in frames:
+                if num_tokens == 0:
+                    check_unit_lost(response_data)
+                data = self._parse_inference_response(response_data)
+                if data is None:
+                    break
+
+                delta = data.get("delta")
+                finish = data.get("finish")
+                output += delta
+                num_tokens += 1
+                logger.debug(delta)
 
-            data = self._parse_inference_response(response_data)
-            if data is None:
-                break
+                # The last frame may carry text too: it is held to the same limits
+                kept = stop_policy.cut(self._postprocess(output), num_tokens)
+                if kept is not None:
+                    if not finish:
+                        logger.info(f"Early stop after {num_tokens} tokens")
+                    break
 
-            delta = data.get("delta")
-            finish = data.get("finish")
-            output += delta
-            logger.debug(delta)
+                if finish:
+                    break
 
-            if finish:
-                break
+        if kept is not None:
+            if not finish:
+                # Trailing frames of the stopped stream are dropped by the connection
+                await self._abort_inference()
+            return kept
 
         output = self._postprocess(output)
         return output
 
-    def _init(self) -> str:
-        logger.info("Setup LLM...")
+    async def _abort_inference(self, timeout: float = 1.0):
+        """Stop the inference running on the LLM unit and wait for the acknowledgement"""
+        try:
+            response_data = await self.connection.request(self._create_pause_data(), timeout=timeout, retries=0)
+            logger.debug(f"pause response: {response_data}")
+        except asyncio.TimeoutError:
+            logger.warning("Timed out waiting for the inference to pause")
+        except ConnectionError as e:
+            # The text generated so far is still returned
+            logger.warning(f"Could not pause the inference: {e}")
+
+    async def _resetup(self, reattach: bool = True):
+        """Set the LLM unit up again (after a reconnect or a lost unit)"""
+        self.llm_work_id = None
+        llm_work_id = await self._init(reattach)
+        if llm_work_id is None:
+            raise ConnectionError("LLM setup failed")
+        self.llm_work_id = llm_work_id
+
+    async def _init(self, reattach: bool = True) -> str:
         init_data = self._create_init_data()
-        llm_work_id = self._setup(self.sock, init_data)
+        if reattach:
+            # The unit from before a reconnect, then one kept loaded by an earlier run
+            llm_work_id = await self.session.reclaim(self.connection, "llm", init_data)
+            if llm_work_id is None:
+                llm_work_id = await self.session.attach(self.connection, "llm", init_data)
+            if llm_work_id is not None:
+                return llm_work_id
+        self.session.forget("llm")
+
+        logger.info("Setup LLM...")
+        llm_work_id = await self._setup(init_data)
+        self.session.record("llm", init_data, llm_work_id)
         logger.debug(f"llm_work_id: {llm_work_id}")
         logger.info("Setup LLM finished.")
         return llm_work_id
 
-    def _setup(self, sock, init_data) -> str:
+    async def _setup(self, init_data) -> str:
         sent_request_id = init_data["request_id"]
-        send_json(sock, init_data)
-        response = receive_response(sock)
-        response_data = json.loads(response)
+        response_data = await self.connection.request(init_data, timeout=self.setup_timeout)
         logger.debug(f"llm response: {response_data}")
         return parse_setup_response(response_data, sent_request_id)
 
@@ -105,7 +269,7 @@ class StackFlowLLMClient:
 
     def _create_init_data(self) -> dict:
         return {
-            "request_id": "llm_001",
+            "request_id": self.connection.new_request_id("llm_setup"),
             "work_id": "llm",
             "action": "setup",
             "object": "llm.setup",
@@ -119,8 +283,16 @@ class StackFlowLLMClient:
             },
         }
 
+    def _create_pause_data(self) -> dict:
+        # "pause" stops the inference currently running on the work_id
+        return {
+            "request_id": self.connection.new_request_id("llm_pause"),
+            "work_id": self.llm_work_id,
+            "action": "pause",
+        }
+
     def _create_deinit_data(self) -> dict:
-        return {"request_id": "llm_exit", "work_id": self.llm_work_id, "action": "exit"}
+        return {"request_id": self.connection.new_request_id("llm_exit"), "work_id": self.llm_work_id, "action": "exit"}
 
     def _create_send_data(self, prompt: str, soft_prefix_b64: str | None = None, soft_prefix_len: int = 0) -> dict:
         data_obj = {"delta": prompt, "index": 0, "finish": True}
@@ -128,7 +300,7 @@ class StackFlowLLMClient:
             data_obj["soft_prefix"] = {"len": int(soft_prefix_len), "data_b64": soft_prefix_b64}
 
         return {
-            "request_id": "llm_001",
+            "request_id": self.connection.new_request_id("llm_inference"),
             "work_id": self.llm_work_id,
             "action": "inference",
             "object": "llm.utf-8.stream",
@@ -137,7 +309,8 @@ class StackFlowLLMClient:
 
     async def _translate(self, query: str, lang: str) -> str:
         try:
-            result = argostranslate.translate.translate(query, from_code=lang, to_code=self.lang)
+            # argostranslate is CPU-bound: keep it off the event loop
+            result = await asyncio.to_thread(argostranslate.translate.translate, query, lang, self.lang)
             return result
         except Exception as e:
             logger.error(f"Error: {e}")
@@ -23,8 +23,8 @@ class OscServer:
     def __del__(self):
         self.transport.close()
 
-    def register_handler(self, address, func):
-        self.dispatcher.map(address, func)
+    def register_handler(self, address, func, needs_reply_address: bool = False):
+        self.dispatcher.map(address, func, needs_reply_address=needs_reply_address)
 
     async def start_server(self):
         server = AsyncIOOSCUDPServer((self.ip_address, self.port), self.dispatcher, asyncio.get_event_loop())
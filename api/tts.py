@@ -1,246 +1,222 @@
-import json
+import asyncio
+import base64
+import functools
+import io
 import os
 import random
 import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
 from pathlib import Path
+from typing import AsyncIterator, Callable
 
 from loguru import logger
-from openai import OpenAI
+from openai import AsyncOpenAI
 
-from api.utils import TTS_SETTINGS
-from stackflow.utils import (
-    close_tcp_connection,
-    create_tcp_connection,
-    parse_setup_response,
-    receive_response,
-    send_json,
-)
+from api.utils import TTS_SETTINGS, WARMUP_TEXT
+from stackflow.client import StackFlowConnection
+from stackflow.session import UnitSession
+from stackflow.utils import UnitLostError, check_unit_lost, parse_setup_response
+from utils.memory import mem_available_mb
 
-# ========== Utility Functions for WAV File Generation & Playback ==========
+# Timeout for StackFlow unit setup (model loading can take a while)
+SETUP_TIMEOUT = 120.0
 
+DEFAULT_TTS_API_URL = "http://127.0.0.1:8000/v1"
 
-def tts_generate_wav(text: str, model: str, output_path: str, api_url: str = "http://127.0.0.1:8000/v1") -> None:
+# ========== Speech Synthesis (HTTP API) ==========
+
+
+async def tts_stream_speech(
+    client: AsyncOpenAI,
+    text: str,
+    model: str,
+    on_chunk: Callable[[bytes], None],
+    chunk_size: int = 16384,
+) -> int:
     """
-    Generate WAV file from text using OpenAI-compatible TTS API.
+    Stream speech from the OpenAI-compatible TTS API to a callback.
+
+    Reuses the caller's long-lived client (and its keep-alive connection
+    pool, timeout and retry settings) and hands the WAV bytes to on_chunk
+    as they arrive, e.g. a file's write method or a bytearray's extend.
 
     Args:
+        client: Async OpenAI client pointing at the StackFlow API
         text: Text to synthesize
         model: TTS model name (e.g., "melotts-ja-jp")
-        output_path: Output WAV file path
-        api_url: StackFlow OpenAI-compatible API URL
+        on_chunk: Called with each received chunk of the WAV response
+        chunk_size: Read size for the response body
+
+    Returns:
+        Number of bytes received
 
     Raises:
-        Exception: API request failed or file write failed
+        openai.APIError: API request failed (after the client's retries)
     """
-    logger.debug(f"TTS API request to: {api_url}")
     logger.debug(f"Model: {model}, Input: {text[:50]}...")
 
-    # Create OpenAI client with custom base_url
-    client = OpenAI(api_key="sk-", base_url=api_url)
-
-    # Generate speech using streaming response
-    with client.audio.speech.with_streaming_response.create(
+    received = 0
+    async with client.audio.speech.with_streaming_response.create(
         model=model,
         response_format="wav",
         voice="",
         input=text,
     ) as response:
-        response.stream_to_file(output_path)
+        async for chunk in response.iter_bytes(chunk_size):
+            if received == 0 and not chunk.startswith(b"RIFF"):
+                logger.warning("TTS response does not start with a RIFF header - may not be a valid WAV file")
+            on_chunk(chunk)
+            received += len(chunk)
 
-    # Verify the generated file
-    import os
+    logger.debug(f"TTS response size: {received} bytes")
+    return received
 
-    if os.path.exists(output_path):
-        file_size = os.path.getsize(output_path)
-        logger.debug(f"Generated file size: {file_size} bytes")
 
-        # Read first few bytes to check file format
-        with open(output_path, "rb") as f:
-            header = f.read(16)
-            logger.debug(f"File header (first 16 bytes): {header.hex()}")
+# ========== In-memory conversion & playback (no temporary files) ==========
 
-            # Check if it's a valid WAV file (should start with "RIFF")
-            if not header.startswith(b"RIFF"):
-                logger.warning("Generated file does not have RIFF header - may not be a valid WAV file")
-    else:
-        logger.error(f"Output file not created: {output_path}")
+# FFmpeg raw output format and sample width for each tinyplay sample_format
+PCM_FORMATS = {"s16": ("s16le", 2), "s32": ("s32le", 4)}
 
-    logger.info(f"WAV file generated: {output_path}")
 
+def _pcm_format(sample_format: str) -> tuple:
+    try:
+        return PCM_FORMATS[sample_format]
+    except KeyError:
+        raise ValueError(f"Unsupported sample_format for in-memory conversion: {sample_format}")
 
-def ffmpeg_convert_for_tinyplay(
-    input_path: str,
-    output_path: str,
-    sample_rate: int = 32000,
-    channels: int = 2,
-    sample_format: str = "s16",
-    quiet: bool = True,
-) -> None:
+
+def pcm_to_wav(pcm: bytes, sample_rate: int, channels: int = 1, sample_width: int = 2) -> bytes:
+    """Wrap raw little-endian PCM in an in-memory WAV (fmt and data chunks only)"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def convert_array(
+    y, source_sample_rate: int, sample_rate: int = 48000, channels: int = 2, sample_format: str = "s16"
+) -> bytes:
     """
-    Convert WAV file for tinyplay compatibility using FFmpeg.
+    Encode a float32 array (e.g. straight from the effects chain) as a
+    tinyplay WAV in-process: polyphase resampling, channel mapping and
+    quantization, no FFmpeg.
+
+    Returns:
+        WAV bytes
+    """
+    from api.audio_effects import encode_pcm
+
+    _, sample_width = _pcm_format(sample_format)
+    pcm = encode_pcm(y, source_sample_rate, sample_rate, channels, sample_width)
+    return pcm_to_wav(pcm, sample_rate, channels, sample_width)
 
-    Args:
-        input_path: Input WAV file path
-        output_path: Output WAV file path
-        sample_rate: Target sample rate (Hz)
-        channels: Target channel count (1: mono, 2: stereo)
-        sample_format: Target sample format (s16, s32, etc.)
-        quiet: Suppress FFmpeg output (default: True)
+
+def convert_wav(
+    wav: bytes, sample_rate: int = 32000, channels: int = 2, sample_format: str = "s16", method: str = "native"
+) -> bytes:
+    """
+    Convert an in-memory WAV for tinyplay (sample rate, channels, sample format).
+
+    With method "native" the WAV is decoded as float32 and converted by
+    convert_array(); with "ffmpeg", FFmpeg reads the WAV from stdin and
+    writes raw PCM to stdout, which gets a fresh WAV header.
 
     Raises:
-        RuntimeError: FFmpeg conversion failed
+        RuntimeError: Conversion failed
     """
     import subprocess
 
-    cmd = ["ffmpeg", "-y"]
-    if quiet:
-        cmd += ["-hide_banner", "-loglevel", "error"]
-    cmd += [
-        "-i",
-        str(input_path),
-        "-ar",
-        str(sample_rate),
-        "-ac",
-        str(channels),
-        "-sample_fmt",
-        sample_format,
-        str(output_path),
-    ]
+    from api.audio_effects import ffmpeg_pipe
 
-    logger.debug(f"FFmpeg command: {' '.join(cmd)}")
+    raw_format, sample_width = _pcm_format(sample_format)
+    if method == "native":
+        import soundfile as sf
 
+        try:
+            y, source_sample_rate = sf.read(io.BytesIO(wav), dtype="float32")
+            return convert_array(y, source_sample_rate, sample_rate, channels, sample_format)
+        except Exception as e:
+            raise RuntimeError(f"WAV conversion failed: {e}")
+    if method != "ffmpeg":
+        raise ValueError(f"Unknown resample method: {method}")
     try:
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
-        logger.info(f"FFmpeg conversion completed: {output_path}")
+        pcm = ffmpeg_pipe([], ["-ar", str(sample_rate), "-ac", str(channels), "-f", raw_format], wav)
     except subprocess.CalledProcessError as e:
-        logger.error(f"FFmpeg conversion failed: {e.stderr}")
         raise RuntimeError(f"FFmpeg conversion failed: {e.stderr}")
+    return pcm_to_wav(pcm, sample_rate, channels, sample_width)
 
 
-def ffmpeg_convert_for_tinyplay_with_rumble(
-    input_path: str,
-    output_path: str,
+def convert_wav_with_rumble(
+    wav: bytes,
     sample_rate: int = 48000,
     channels: int = 2,
     sample_format: str = "s16",
-    pitch_steps: float = -16.0,
-    sub_oct_mix: float = 0.55,
-    rumble_mix: float = 0.25,
-    rumble_base_hz: float = 55.0,
-    drive: float = 0.55,
-    xover_hz: float = 280.0,
-    quiet: bool = True,
-) -> None:
+    backend: str = "native",
+    resample_method: str = "native",
+    **rumble_params,
+) -> bytes:
     """
-    Convert WAV file with advanced rumble effect using audio_effects module.
+    Apply the rumble effect to an in-memory WAV and convert it for tinyplay.
+
+    With the "native" backend:
+    1. Decode to a 16kHz mono array
+    2. Apply rumble_layered_with_fx_array (pitch shift, bass layers, noise, reverb, EQ, compression)
+    3. Convert to the final tinyplay format, in-process (convert_array) or
+       through an FFmpeg pipe (resample_method "ffmpeg")
 
-    This function follows a multi-step process:
-    1. Convert to 16kHz mono as intermediate format
-    2. Apply rumble_layered_with_fx effect (pitch shift, bass layers, noise, reverb, EQ, compression)
-    3. Convert to final tinyplay format
+    With the "ffmpeg" backend, all of it runs as one FFmpeg filter graph
+    (rumble_layered_with_fx_ffmpeg).
 
     Args:
-        input_path: Input WAV file path
-        output_path: Output WAV file path
+        wav: Input WAV bytes
         sample_rate: Target sample rate (Hz)
         channels: Target channel count (1: mono, 2: stereo)
-        sample_format: Target sample format (s16, s32, etc.)
-        pitch_steps: Pitch shift in semitones (default: -16 = down ~1.3 octaves)
-        sub_oct_mix: Sub-octave layer mix amount (0..1)
-        rumble_mix: Synthetic rumble noise mix amount (0..1)
-        rumble_base_hz: Base frequency for rumble generation
-        drive: Distortion drive amount (0..1)
-        xover_hz: Crossover frequency for high/low split
-        quiet: Suppress FFmpeg output (default: True)
+        sample_format: Target sample format (s16, s32)
+        backend: "native" or "ffmpeg"
+        resample_method: Final conversion of the "native" backend, "native" or "ffmpeg"
+        **rumble_params: Arguments for rumble_layered_array() (pitch_steps, sub_oct_mix, ...)
 
     Raises:
         RuntimeError: Audio processing or conversion failed
     """
-    import subprocess
-    from pathlib import Path
-
-    from api.audio_effects import rumble_layered_with_fx
+    import numpy as np
 
-    # Create temporary file paths
-    tmp_path = Path(output_path)
-    tmp16 = tmp_path.with_suffix(".tmp16k_mono.wav")
-    tmpfx16 = tmp_path.with_suffix(".tmp16k_mono_fx.wav")
+    from api.audio_effects import decode16k, ffmpeg_pipe, rumble_layered_with_fx_array, rumble_layered_with_fx_ffmpeg
 
+    raw_format, sample_width = _pcm_format(sample_format)
     try:
-        # Step 1: Convert to 16kHz mono intermediate format
-        cmd = ["ffmpeg", "-y"]
-        if quiet:
-            cmd += ["-hide_banner", "-loglevel", "error"]
-        cmd += [
-            "-i",
-            str(input_path),
-            "-ac",
-            "1",
-            "-ar",
-            "16000",
-            "-sample_fmt",
-            "s16",
-            str(tmp16),
-        ]
-
-        logger.debug(f"FFmpeg command (step 1): {' '.join(cmd)}")
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
-
-        # Step 2: Apply rumble + fx (16k mono -> 16k mono with effects)
-        logger.info("Applying rumble_layered_with_fx...")
-        rumble_layered_with_fx(
-            str(tmp16),
-            str(tmpfx16),
-            pitch_steps=pitch_steps,
-            sub_oct_mix=sub_oct_mix,
-            rumble_mix=rumble_mix,
-            rumble_base_hz=rumble_base_hz,
-            drive=drive,
-            xover_hz=xover_hz,
-        )
-
-        # Step 3: Convert to final tinyplay format
-        cmd = ["ffmpeg", "-y"]
-        if quiet:
-            cmd += ["-hide_banner", "-loglevel", "error"]
-        cmd += [
-            "-i",
-            str(tmpfx16),
-            "-ar",
-            str(sample_rate),
-            "-ac",
-            str(channels),
-            "-sample_fmt",
-            sample_format,
-            str(output_path),
-        ]
-
-        logger.debug(f"FFmpeg command (step 3): {' '.join(cmd)}")
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
-
-        logger.info(f"FFmpeg conversion with rumble completed: {output_path}")
-
-    except subprocess.CalledProcessError as e:
-        logger.error(f"FFmpeg conversion with rumble failed: {e.stderr}")
-        raise RuntimeError(f"FFmpeg conversion with rumble failed: {e.stderr}")
+        logger.info(f"Applying rumble_layered_with_fx ({backend})...")
+        if backend == "ffmpeg":
+            pcm = rumble_layered_with_fx_ffmpeg(wav, sample_rate, channels, raw_format, **rumble_params)
+        elif backend == "native":
+            fx = rumble_layered_with_fx_array(decode16k(wav), **rumble_params)
+            if resample_method == "native":
+                return convert_array(fx, 16000, sample_rate, channels, sample_format)
+            fx = np.nan_to_num(fx.astype(np.float32), nan=0.0, posinf=0.0, neginf=0.0)
+            pcm = ffmpeg_pipe(
+                ["-f", "f32le", "-ar", "16000", "-ac", "1"],
+                ["-ar", str(sample_rate), "-ac", str(channels), "-f", raw_format],
+                fx.tobytes(),
+            )
+        else:
+            raise ValueError(f"Unknown rumble backend: {backend}")
     except Exception as e:
         logger.error(f"Rumble effect processing failed: {e}")
         raise RuntimeError(f"Rumble effect processing failed: {e}")
-
-    finally:
-        # Cleanup temporary files
-        for tmp_file in [tmp16, tmpfx16]:
-            if tmp_file.exists():
-                try:
-                    tmp_file.unlink()
-                    logger.debug(f"Removed temporary file: {tmp_file}")
-                except Exception as e:
-                    logger.warning(f"Failed to remove temporary file {tmp_file}: {e}")
+    return pcm_to_wav(pcm, sample_rate, channels, sample_width)
 
 
-def tinyplay_play(wav_path: str, card: int = 0, device: int = 1) -> None:
+async def tinyplay_play_async(wav_path: str, card: int = 0, device: int = 1) -> None:
     """
-    Play WAV file using tinyplay command.
+    Play WAV file using tinyplay as an asyncio subprocess.
+
+    Does not block the event loop while the utterance is playing. If the
+    awaiting task is cancelled, tinyplay is killed.
 
     Args:
         wav_path: WAV file path to play
@@ -250,48 +226,271 @@ def tinyplay_play(wav_path: str, card: int = 0, device: int = 1) -> None:
     Raises:
         RuntimeError: tinyplay playback failed
     """
-    import subprocess
-
     cmd = ["tinyplay", f"-D{card}", f"-d{device}", str(wav_path)]
 
     logger.debug(f"tinyplay command: {' '.join(cmd)}")
 
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
     try:
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
-        logger.info(f"tinyplay playback completed: {wav_path}")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"tinyplay playback failed: {e.stderr}")
-        raise RuntimeError(f"tinyplay playback failed: {e.stderr}")
+        _, stderr = await proc.communicate()
+    except asyncio.CancelledError:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+
+    if proc.returncode != 0:
+        err = stderr.decode("utf-8", errors="replace")
+        logger.error(f"tinyplay playback failed: {err}")
+        raise RuntimeError(f"tinyplay playback failed: {err}")
+    logger.info(f"tinyplay playback completed: {wav_path}")
+
+
+def pcm_from_chunk(data_b64: str) -> bytes:
+    """
+    Decode one base64 audio chunk streamed by MeloTTS into raw s16le PCM.
+
+    Chunks that carry their own WAV header have it stripped.
+    """
+    data = base64.b64decode(data_b64)
+    if data[:4] != b"RIFF":
+        return data
+    # Walk the RIFF chunks to the "data" chunk
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = data[pos : pos + 4]
+        chunk_size = int.from_bytes(data[pos + 4 : pos + 8], "little")
+        if chunk_id == b"data":
+            return data[pos + 8 : pos + 8 + chunk_size]
+        pos += 8 + chunk_size + (chunk_size & 1)
+    return b""
+
+
+async def ffmpeg_convert_pcm_stream(
+    chunks: AsyncIterator[bytes],
+    input_sample_rate: int,
+    sample_rate: int = 48000,
+    channels: int = 2,
+    sample_format: str = "s16",
+    quiet: bool = True,
+) -> bytes:
+    """
+    Convert a stream of raw mono s16le PCM chunks for tinyplay.
+
+    FFmpeg runs as an asyncio subprocess and each chunk is written to its
+    stdin as it arrives, so conversion overlaps synthesis; the converted
+    PCM is read back from its stdout. If the awaiting task is cancelled,
+    FFmpeg is killed.
+
+    Args:
+        chunks: PCM chunks (mono, s16le, input_sample_rate)
+        input_sample_rate: Sample rate of the PCM chunks (Hz)
+        sample_rate: Target sample rate (Hz)
+        channels: Target channel count (1: mono, 2: stereo)
+        sample_format: Target sample format (s16, s32)
+        quiet: Suppress FFmpeg output (default: True)
+
+    Returns:
+        Converted WAV bytes
+
+    Raises:
+        RuntimeError: FFmpeg conversion failed
+    """
+    raw_format, sample_width = _pcm_format(sample_format)
+    cmd = ["ffmpeg", "-y"]
+    if quiet:
+        cmd += ["-hide_banner", "-loglevel", "error"]
+    cmd += [
+        "-f",
+        "s16le",
+        "-ar",
+        str(input_sample_rate),
+        "-ac",
+        "1",
+        "-i",
+        "pipe:0",
+        "-ar",
+        str(sample_rate),
+        "-ac",
+        str(channels),
+        "-f",
+        raw_format,
+        "pipe:1",
+    ]
+
+    logger.debug(f"FFmpeg command: {' '.join(cmd)}")
+
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    # Drain stdout/stderr concurrently so FFmpeg never blocks on a full pipe
+    stdout_task = asyncio.create_task(proc.stdout.read())
+    stderr_task = asyncio.create_task(proc.stderr.read())
+    try:
+        try:
+            async for chunk in chunks:
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+        finally:
+            proc.stdin.close()
+        pcm, stderr = await asyncio.gather(stdout_task, stderr_task)
+        await proc.wait()
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        stdout_task.cancel()
+        stderr_task.cancel()
+        raise
+
+    if proc.returncode != 0:
+        err = stderr.decode("utf-8", errors="replace")
+        logger.error(f"FFmpeg PCM conversion failed: {err}")
+        raise RuntimeError(f"FFmpeg PCM conversion failed: {err}")
+    logger.info(f"FFmpeg PCM conversion completed: {len(pcm)} bytes")
+    return pcm_to_wav(pcm, sample_rate, channels, sample_width)
+
+
+async def tinyplay_play_bytes(wav: bytes, card: int = 0, device: int = 1, path: str = "/dev/stdin") -> None:
+    """
+    Play an in-memory WAV by piping it into tinyplay.
+
+    tinyplay opens `path` (by default its own stdin, a pipe) and reads the
+    WAV sequentially; the fmt/data-only header written by pcm_to_wav()
+    needs no seeking. The path has no .wav extension to infer the type
+    from, so it is given with `-i wav` (tinyalsa 2.x tinyplay). If the
+    awaiting task is cancelled, tinyplay is killed.
+
+    Args:
+        wav: WAV bytes to play
+        card: ALSA card number
+        device: ALSA device number
+        path: File name tinyplay reads the piped WAV from
+
+    Raises:
+        RuntimeError: tinyplay playback failed
+    """
+    cmd = ["tinyplay", f"-D{card}", f"-d{device}", "-i", "wav", path]
+
+    logger.debug(f"tinyplay command: {' '.join(cmd)} (<{len(wav)} bytes)")
+
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await proc.communicate(wav)
+    except asyncio.CancelledError:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+
+    if proc.returncode != 0:
+        err = stderr.decode("utf-8", errors="replace")
+        logger.error(f"tinyplay playback failed: {err}")
+        raise RuntimeError(f"tinyplay playback failed: {err}")
+    logger.info("tinyplay playback completed")
 
 
 # ==========================================================================
 
 
 class StackFlowTTSClient:
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, connection: StackFlowConnection | None = None):
         self.config = config
         self.set_params(config)
 
-        self.sock = create_tcp_connection("localhost", 10001)
-        self._init()
-
-    def __del__(self):
-        reset_date = self._create_reset_data()
-        send_json(self.sock, reset_date)
-        response = receive_response(self.sock)
-        logger.debug(f"reset response: {response}")
+        # Dedicated worker for blocking TTS/FFmpeg work so the event loop
+        # (and the OSC server on it) keeps running during synthesis
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+
+        # Connected and set up by init(). A shared connection is owned
+        # (and closed) by whoever passed it in.
+        self.connection = connection or StackFlowConnection()
+        self._owns_connection = connection is None
+        self.audio_work_id = None
+        self.tts_work_id = None
+        self._units_lock = asyncio.Lock()
+        self._reconnect_hook_added = False
+        # Persisted work_ids, for reattaching to still-loaded units after a restart
+        self.session = UnitSession.from_config(config)
+
+        # Long-lived HTTP client: reuses keep-alive connections across utterances
+        self.http_client = AsyncOpenAI(
+            api_key="sk-",
+            base_url=self.api_url,
+            timeout=self.http_timeout,
+            max_retries=self.http_max_retries,
+        )
 
-        close_tcp_connection(self.sock)
+    async def init(self):
+        """
+        Connect to StackFlow and, with stack_flow_tts.unit_setup "eager",
+        set up the audio and MeloTTS units.
+
+        In "http" mode speak_to_file() synthesises through the HTTP API and
+        does not need these units, so by default ("lazy") they are only set
+        up by the first legacy speak() call and no second MeloTTS model is
+        resident. In "pcm" mode the first utterance sets up MeloTTS (or
+        reattaches to the unit kept loaded by an earlier run).
+        """
+        await self.connection.connect()
+        if self.unit_setup == "eager":
+            await self._ensure_units()
+        else:
+            # Release recorded units this mode will not use; pcm mode needs MeloTTS
+            unused = ("audio",) if self.mode == "pcm" else ("melotts", "audio")
+            for name in unused:
+                await self.session.release(self.connection, name)
+
+    async def close(self):
+        """
+        Reset StackFlow units (unless they are kept for reattaching) and
+        close the connection if it is our own
+        """
+        self._executor.shutdown(wait=False)
+        await self.http_client.close()
+        if self.session.enabled:
+            logger.info("Keeping StackFlow units loaded for reattach")
+        elif self.connection.healthy:
+            try:
+                response_data = await self.connection.request(self._create_reset_data(), timeout=10.0, retries=0)
+                logger.debug(f"reset response: {response_data}")
+            except Exception as e:
+                logger.error(f"Error resetting StackFlow: {e}")
+        if self._owns_connection:
+            await self.connection.close()
 
     def set_params(self, config: dict):
         lang = config.get("common").get("lang")
+        self.lang = lang
         self.model = TTS_SETTINGS.get(lang).get("model")
+        tts_config = config.get("stack_flow_tts", {})
+        self.unit_setup = tts_config.get("unit_setup", "lazy")
+        # "http": OpenAI-compatible HTTP API, "pcm": PCM stream from the MeloTTS unit
+        self.mode = tts_config.get("mode", "http")
+        self.pcm_sample_rate = tts_config.get("pcm_sample_rate", 44100)
+        self.timeout = tts_config.get("timeout", 30.0)
+        self.api_url = tts_config.get("api_url", DEFAULT_TTS_API_URL)
+        self.http_timeout = tts_config.get("http_timeout", 30.0)
+        self.http_max_retries = tts_config.get("http_max_retries", 2)
 
         logger.info("[TTS info]")
         logger.info(f"lang: {lang}")
         logger.info(f"model: {self.model}")
+        logger.info(f"mode: {self.mode}")
 
-    def speak(self, text: str) -> str:
+    async def speak(self, text: str) -> dict:
         """
         Speak text directly through speaker (legacy method).
 
@@ -299,19 +498,35 @@ class StackFlowTTSClient:
             text: Text to synthesize
 
         Returns:
-            str: Response from StackFlow
+            dict: Response from StackFlow
         """
-        inference_date = self._create_inference_data(text)
-        send_json(self.sock, inference_date)
-        response = receive_response(self.sock, timeout=10.0)
-        logger.debug(f"tts response: {response}")
+        if self.mode == "pcm":
+            raise RuntimeError("speak() plays through the audio unit and needs stack_flow_tts.mode 'http'")
+        await self._ensure_units()
+
+        # Built per attempt, so a retry uses the current work_id and a fresh request_id
+        build_inference_data = functools.partial(self._create_inference_data, text)
+        response_data = await self.connection.request(build_inference_data, timeout=10.0)
+        try:
+            check_unit_lost(response_data)
+        except UnitLostError as e:
+            logger.warning(f"TTS unit lost ({e}), setting it up again")
+            await self._resetup(reattach=False)
+            response_data = await self.connection.request(build_inference_data, timeout=10.0)
+        logger.debug(f"tts response: {response_data}")
+        return response_data
 
     async def speak_to_file(self, text: str, on_start_callback=None, on_end_callback=None) -> None:
         """
-        Generate WAV file from text and play it using tinyplay.
+        Synthesize text, optionally convert it with FFmpeg, and play it using tinyplay.
 
-        This method uses OpenAI-compatible TTS API to generate WAV file,
-        optionally converts it with FFmpeg, and plays it using tinyplay command.
+        This method uses OpenAI-compatible TTS API to generate the WAV (or,
+        with stack_flow_tts.mode "pcm", streams PCM from the MeloTTS unit).
+        The audio stays in memory from synthesis to playback: FFmpeg and
+        tinyplay are fed through pipes, and effects run on numpy arrays on a
+        dedicated worker thread, so neither the event loop nor the storage
+        is touched. With audio.debug_keep_files the raw and final WAVs are
+        also written to audio.temp_wav_dir.
 
         Args:
             text: Text to synthesize
@@ -319,74 +534,18 @@ class StackFlowTTSClient:
             on_end_callback: Optional callback to call after tinyplay ends (args: text, error)
 
         Raises:
-            Exception: WAV generation, conversion, or playback failed
+            Exception: Synthesis, conversion, or playback failed
         """
         audio_config = self.config.get("audio", {})
-
-        # Get configuration
-        temp_wav_dir = audio_config.get("temp_wav_dir", "/tmp")
-        enable_ffmpeg = audio_config.get("enable_ffmpeg_convert", True)
-        enable_rumble = audio_config.get("enable_rumble_effect", False)
-        sample_rate = audio_config.get("sample_rate", 48000)
-        channels = audio_config.get("channels", 2)
-        sample_format = audio_config.get("sample_format", "s16")
         tinyplay_card = audio_config.get("tinyplay_card", 0)
         tinyplay_device = audio_config.get("tinyplay_device", 1)
 
-        # Ensure temp directory exists
-        os.makedirs(temp_wav_dir, exist_ok=True)
-        logger.debug(f"Using temp directory: {temp_wav_dir}")
-
-        # Generate temporary file paths
-        timestamp = time.time()
-        raw_wav_path = os.path.join(temp_wav_dir, f"tts_raw_{timestamp}.wav")
-        final_wav_path = os.path.join(temp_wav_dir, f"tts_final_{timestamp}.wav")
-
         try:
-            # Step 1: Generate WAV file from TTS API
-            logger.info(f"Generating WAV file: {text[:50]}...")
-            tts_generate_wav(text, self.model, raw_wav_path)
-
-            # Step 2: Convert WAV file (optional)
-            if enable_ffmpeg:
-                logger.info("Converting WAV file with FFmpeg...")
-                if enable_rumble:
-                    # Get advanced rumble parameters from config
-                    pitch_range = audio_config.get("rumble_pitch_steps_range", {"min": -16.0, "max": -3.0})
-                    pitch_steps = random.uniform(pitch_range["min"], pitch_range["max"])
-                    sub_oct_mix = audio_config.get("rumble_sub_oct_mix", 0.55)
-                    rumble_mix = audio_config.get("rumble_mix", 0.25)
-                    rumble_base_hz = audio_config.get("rumble_base_hz", 55.0)
-                    drive = audio_config.get("rumble_drive", 0.55)
-                    xover_hz = audio_config.get("rumble_xover_hz", 280.0)
-
-                    ffmpeg_convert_for_tinyplay_with_rumble(
-                        raw_wav_path,
-                        final_wav_path,
-                        sample_rate,
-                        channels,
-                        sample_format,
-                        pitch_steps,
-                        sub_oct_mix,
-                        rumble_mix,
-                        rumble_base_hz,
-                        drive,
-                        xover_hz,
-                    )
-                else:
-                    ffmpeg_convert_for_tinyplay(
-                        raw_wav_path,
-                        final_wav_path,
-                        32000,
-                        channels,
-                        sample_format,
-                    )
-                playback_path = final_wav_path
-            else:
-                playback_path = raw_wav_path
+            # Steps 1-2: Synthesize and convert
+            wav = await self._render_wav(text)
 
-            # Step 3: Play WAV file using tinyplay
-            logger.info("Playing WAV file with tinyplay...")
+            # Step 3: Play using tinyplay
+            logger.info("Playing WAV with tinyplay...")
 
             # Call on_start_callback before tinyplay starts
             if on_start_callback:
@@ -396,7 +555,7 @@ class StackFlowTTSClient:
                     logger.error(f"on_start_callback failed: {e}")
 
             # Execute tinyplay
-            tinyplay_play(playback_path, tinyplay_card, tinyplay_device)
+            await self._play(wav, tinyplay_card, tinyplay_device)
 
             # Call on_end_callback after tinyplay ends successfully
             if on_end_callback:
@@ -419,41 +578,221 @@ class StackFlowTTSClient:
 
             raise
 
+    async def warmup(self, effects: bool = True):
+        """
+        Synthesize (and optionally convert) a short text without playing it,
+        so the first real utterance does not pay the cold-start costs of the
+        TTS API, FFmpeg and the effects chain.
+        """
+        await self._render_wav(WARMUP_TEXT.get(self.lang, "Hello"), convert=effects)
+
+    async def _render_wav(self, text: str, convert: bool = True) -> bytes:
+        """
+        Synthesize text and convert it for tinyplay (if enabled), in memory
+
+        Returns:
+            WAV bytes to play
+        """
+        audio_config = self.config.get("audio", {})
+        enable_ffmpeg = audio_config.get("enable_ffmpeg_convert", True) and convert
+        enable_rumble = audio_config.get("enable_rumble_effect", False)
+        sample_rate = audio_config.get("sample_rate", 48000)
+        channels = audio_config.get("channels", 2)
+        sample_format = audio_config.get("sample_format", "s16")
+        resample_method = audio_config.get("resample_method", "native")
+        stamp = time.time()
+
+        # Step 1: Synthesize through the TTS API, or stream PCM from the MeloTTS unit
+        if self.mode == "pcm":
+            logger.info(f"Streaming PCM: {text[:50]}...")
+            async with aclosing(self._stream_pcm(text)) as pcm_chunks:
+                if enable_ffmpeg and not enable_rumble and resample_method == "ffmpeg":
+                    # Convert while the audio is still being synthesised
+                    wav = await ffmpeg_convert_pcm_stream(
+                        pcm_chunks, self.pcm_sample_rate, 32000, channels, sample_format
+                    )
+                    self._dump_debug_wav(stamp, "final", wav)
+                    return wav
+                # The rumble chain and the in-process conversion work on the whole utterance
+                pcm = b"".join([chunk async for chunk in pcm_chunks])
+            wav = pcm_to_wav(pcm, self.pcm_sample_rate)
+        else:
+            logger.info(f"Synthesizing: {text[:50]}...")
+            wav = await self.synthesize(text)
+        self._dump_debug_wav(stamp, "raw", wav)
+
+        # Step 2: Convert (optional)
+        if not enable_ffmpeg:
+            return wav
+
+        logger.info(f"Converting for tinyplay ({resample_method})...")
+        if enable_rumble:
+            # Get advanced rumble parameters from config
+            pitch_range = audio_config.get("rumble_pitch_steps_range", {"min": -16.0, "max": -3.0})
+            rumble_params = {
+                "pitch_steps": random.uniform(pitch_range["min"], pitch_range["max"]),
+                "sub_oct_mix": audio_config.get("rumble_sub_oct_mix", 0.55),
+                "rumble_mix": audio_config.get("rumble_mix", 0.25),
+                "rumble_base_hz": audio_config.get("rumble_base_hz", 55.0),
+                "drive": audio_config.get("rumble_drive", 0.55),
+                "xover_hz": audio_config.get("rumble_xover_hz", 280.0),
+                "pitch_method": audio_config.get("rumble_pitch_method", "auto"),
+                "post_fx_method": audio_config.get("rumble_post_fx", "native"),
+            }
+            backend = audio_config.get("rumble_backend", "native")
+            convert_func = functools.partial(
+                convert_wav_with_rumble, backend=backend, resample_method=resample_method, **rumble_params
+            )
+            wav = await self._run_blocking(convert_func, wav, sample_rate, channels, sample_format)
+        else:
+            wav = await self._run_blocking(convert_wav, wav, 32000, channels, sample_format, resample_method)
+        self._dump_debug_wav(stamp, "final", wav)
+        return wav
+
+    async def _play(self, wav: bytes, card: int, device: int):
+        """Play WAV bytes from a temporary file, or through tinyplay's stdin with audio.tinyplay_stdin on"""
+        audio_config = self.config.get("audio", {})
+        if audio_config.get("tinyplay_stdin", False):
+            await tinyplay_play_bytes(wav, card, device)
+            return
+
+        # tinyplay infers the file type from the .wav extension
+        temp_wav_dir = audio_config.get("temp_wav_dir", "/tmp")
+        os.makedirs(temp_wav_dir, exist_ok=True)
+        wav_path = os.path.join(temp_wav_dir, f"tts_play_{time.time()}.wav")
+        try:
+            await self._run_blocking(Path(wav_path).write_bytes, wav)
+            await tinyplay_play_async(wav_path, card, device)
         finally:
-            # Step 4: Cleanup temporary files
-            for path in [raw_wav_path, final_wav_path]:
-                if os.path.exists(path):
-                    try:
-                        os.remove(path)
-                        logger.debug(f"Removed temporary file: {path}")
-                    except Exception as e:
-                        logger.warning(f"Failed to remove temporary file {path}: {e}")
-
-    def _init(self):
-        logger.info("Setup TTS...")
+            try:
+                os.remove(wav_path)
+            except OSError as e:
+                logger.warning(f"Failed to remove temporary file {wav_path}: {e}")
 
-        audio_setup_data = self._create_audio_setup_data()
-        sent_request_id = audio_setup_data["request_id"]
-        send_json(self.sock, audio_setup_data)
-        response = receive_response(self.sock)
-        response_data = json.loads(response)
-        self.audio_work_id = parse_setup_response(response_data, sent_request_id)
-        logger.debug(f"audio setup response: {response_data}")
-
-        tts_setup_data = self._create_tts_setup_data()
-        sent_request_id = tts_setup_data["request_id"]
-        send_json(self.sock, tts_setup_data)
-        response = receive_response(self.sock)
-        response_data = json.loads(response)
-        self.tts_work_id = parse_setup_response(response_data, sent_request_id)
-        logger.debug(f"tts setup response: {response}")
+    def _dump_debug_wav(self, stamp: float, stage: str, wav: bytes):
+        """Keep an intermediate WAV in audio.temp_wav_dir when audio.debug_keep_files is on"""
+        audio_config = self.config.get("audio", {})
+        if not audio_config.get("debug_keep_files", False):
+            return
+        temp_wav_dir = audio_config.get("temp_wav_dir", "/tmp")
+        os.makedirs(temp_wav_dir, exist_ok=True)
+        path = os.path.join(temp_wav_dir, f"tts_{stage}_{stamp}.wav")
+        with open(path, "wb") as f:
+            f.write(wav)
+        logger.debug(f"Kept {stage} WAV: {path}")
+
+    async def synthesize(self, text: str) -> bytes:
+        """Synthesize text through the HTTP API into an in-memory WAV"""
+        buffer = bytearray()
+        await tts_stream_speech(self.http_client, text, self.model, buffer.extend)
+        return bytes(buffer)
+
+    async def _stream_pcm(self, text: str) -> AsyncIterator[bytes]:
+        """Synthesise text on the MeloTTS unit and yield raw PCM chunks as they arrive"""
+        await self._ensure_units()
+
+        # Built per attempt, so a retry uses the current work_id and a fresh request_id
+        build_inference_data = functools.partial(self._create_inference_data, text)
+        for attempt in range(2):
+            received = False
+            audio_bytes = 0
+            try:
+                async with aclosing(self.connection.stream(build_inference_data, timeout=self.timeout)) as frames:
+                    async for response_data in frames:
+                        if not received:
+                            check_unit_lost(response_data)
+                        received = True
+                        error = response_data.get("error")
+                        if error and error.get("code") != 0:
+                            raise RuntimeError(f"TTS inference failed: {error.get('message')} ({error.get('code')})")
+                        data = response_data.get("data")
+                        if isinstance(data, dict):
+                            chunk = data.get("delta")
+                        elif isinstance(data, str) or data is None:
+                            # Non-stream response format: the whole utterance in one payload
+                            chunk = data
+                        else:
+                            raise RuntimeError(f"Unexpected TTS response payload: {str(data)[:100]}")
+                        if chunk:
+                            pcm = pcm_from_chunk(chunk)
+                            audio_bytes += len(pcm)
+                            yield pcm
+                if not audio_bytes:
+                    raise RuntimeError("TTS inference returned no audio")
+                return
+            except UnitLostError as e:
+                if attempt:
+                    raise
+                logger.warning(f"TTS unit lost ({e}), setting it up again")
+                await self._resetup(reattach=False)
+
+    async def _run_blocking(self, func, *args):
+        """Run a blocking function on the TTS worker thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _ensure_units(self):
+        """Set up the TCP audio and MeloTTS units once, logging their memory cost"""
+        async with self._units_lock:
+            if self.tts_work_id is not None:
+                return
+            available_before = mem_available_mb()
+            await self._resetup()
+            available_after = mem_available_mb()
+            if available_before is not None and available_after is not None:
+                logger.info(
+                    f"TTS units set up: MemAvailable {available_before} -> {available_after} MB "
+                    f"({available_after - available_before:+.1f} MB)"
+                )
+            # After a reconnect, reuse the units if StackFlow kept them loaded, or set them up again
+            if not self._reconnect_hook_added:
+                self.connection.add_reconnect_hook(self._resetup)
+                self._reconnect_hook_added = True
+
+    async def _resetup(self, reattach: bool = True):
+        """Set the audio and MeloTTS units up again (after a reconnect or a lost unit)"""
+        self.audio_work_id = None
+        self.tts_work_id = None
+        await self._init(reattach)
+        if self.tts_work_id is None or (self.mode != "pcm" and self.audio_work_id is None):
+            raise ConnectionError("TTS setup failed")
+
+    async def _init(self, reattach: bool = True):
+        logger.info("Setup TTS...")
+        if self.mode == "pcm":
+            # PCM is streamed back to us: the audio unit is not needed
+            self.tts_work_id = await self._setup_unit("melotts", self._create_tts_setup_data(), reattach)
+            logger.info("Setup TTS finished.")
+            return
+
+        # The audio and MeloTTS units are independent: set them up concurrently
+        self.audio_work_id, self.tts_work_id = await asyncio.gather(
+            self._setup_unit("audio", self._create_audio_setup_data(), reattach),
+            self._setup_unit("melotts", self._create_tts_setup_data(), reattach),
+        )
         logger.debug(f"tts_work_id: {self.tts_work_id}")
-
         logger.info("Setup TTS finished.")
 
+    async def _setup_unit(self, name: str, setup_data: dict, reattach: bool) -> str:
+        """Reuse the unit from before a reconnect, reattach to a recorded one with the same setup, or set it up"""
+        if reattach:
+            work_id = await self.session.reclaim(self.connection, name, setup_data)
+            if work_id is None:
+                work_id = await self.session.attach(self.connection, name, setup_data)
+            if work_id is not None:
+                return work_id
+        self.session.forget(name)
+
+        sent_request_id = setup_data["request_id"]
+        response_data = await self.connection.request(setup_data, timeout=SETUP_TIMEOUT)
+        logger.debug(f"{name} setup response: {response_data}")
+        work_id = parse_setup_response(response_data, sent_request_id)
+        self.session.record(name, setup_data, work_id)
+        return work_id
+
     def _create_audio_setup_data(self) -> dict:
         return {
-            "request_id": "audio_setup",
+            "request_id": self.connection.new_request_id("audio_setup"),
             "work_id": "audio",
             "action": "setup",
             "object": "audio.setup",
@@ -468,23 +807,27 @@ class StackFlowTTSClient:
         }
 
     def _create_tts_setup_data(self) -> dict:
+        # "pcm" mode streams base64 audio back over the connection, one
+        # {"delta": ...} frame per synthesized chunk, instead of playing it
+        # through the audio unit
+        pcm = self.mode == "pcm"
         return {
-            "request_id": "melotts_setup",
+            "request_id": self.connection.new_request_id("melotts_setup"),
             "work_id": "melotts",
             "action": "setup",
             "object": "melotts.setup",
             "data": {
                 "model": self.model,
-                "response_format": "sys.pcm",
+                "response_format": "tts.base64.wav.stream" if pcm else "sys.pcm",
                 "input": ["tts.utf-8.stream"],
-                "enoutput": False,
-                "enaudio": True,
+                "enoutput": pcm,
+                "enaudio": not pcm,
             },
         }
 
     def _create_inference_data(self, text: str) -> dict:
         return {
-            "request_id": "tts_inference",
+            "request_id": self.connection.new_request_id("tts_inference"),
             "work_id": self.tts_work_id,
             "action": "inference",
             "object": "tts.utf-8.stream",
@@ -492,4 +835,4 @@ class StackFlowTTSClient:
         }
 
     def _create_reset_data(self) -> dict:
-        return {"request_id": "4", "work_id": "sys", "action": "reset"}
+        return {"request_id": self.connection.new_request_id("sys_reset"), "work_id": "sys", "action": "reset"}
@@ -46,3 +46,6 @@ TTS_SETTINGS["en"] = {"model": "melotts-en-us"}
 TTS_SETTINGS["ja"] = {"model": "melotts-ja-jp"}
 TTS_SETTINGS["zh"] = {"model": "melotts-zh-cn"}
 TTS_SETTINGS["fr"] = {"model": "melotts-en-us"}
+
+# Short text for the startup warmup pass (dummy generation and synthesis)
+WARMUP_TEXT = {"en": "Hello", "ja": "こんにちは", "zh": "你好", "fr": "Bonjour"}
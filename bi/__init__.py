@@ -1,5 +1,16 @@
+from .buffer import InputBuffer
 from .controller import BIController
-from .models import BIInputData
+from .ingress import IngressQueue
+from .models import BIInputData, BIUtterance
+from .seen_cache import SeenCache
 from .utils import make_random_soft_prefix_b64
 
-__all__ = ["BIController", "BIInputData", "make_random_soft_prefix_b64"]
+__all__ = [
+    "BIController",
+    "BIInputData",
+    "BIUtterance",
+    "IngressQueue",
+    "InputBuffer",
+    "SeenCache",
+    "make_random_soft_prefix_b64",
+]
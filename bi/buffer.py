@@ -0,0 +1,173 @@
+import heapq
+import itertools
+import time
+from collections import Counter
+from typing import Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+from .models import BIInputData
+
+# Overflow policies: which entry to drop when the intake buffer is full
+OVERFLOW_POLICIES = ("relay_count", "freshest", "round_robin")
+
+# How far (seconds) an origin time may lie ahead of the local clock before it is treated as clock skew
+CLOCK_SKEW_TOLERANCE = 1.0
+
+
+class InputBuffer:
+    """
+    Double-buffered, bounded, time-ordered input storage for the BI cycle.
+
+    Inputs are always added to the active intake buffer. At the start of
+    generation the controller calls swap(), which atomically hands the
+    current contents over as a frozen snapshot and starts a fresh intake
+    buffer, so data received during GENERATING/OUTPUT is kept for the next
+    cycle instead of being cleared with the finished one.
+
+    The intake buffer is a heap keyed by origin time (the time the relay
+    chain started, or the local receive time if the sender did not send
+    one), so insertion is O(log n) and snapshots come out in chronological
+    order. Entries received more than `max_age` seconds ago (0 = no limit)
+    are evicted on every append and swap.
+
+    The origin time comes from another device's clock, so it is only used
+    for ordering: it is clamped into [received_at - max_age, received_at]
+    and the age is measured on the local clock. An origin time outside that
+    range (a sender clock off by more than max_age, or ahead of ours) is
+    counted as clock skew.
+
+    The intake buffer holds at most `capacity` entries (0 = unbounded).
+    When it is full, the overflow policy picks the entry to drop:
+
+    - "relay_count": drop the entry with the highest relay_count, so inputs
+      closest to their source are kept (ties drop the oldest)
+    - "freshest": drop the oldest entry
+    - "round_robin": drop the oldest entry of the sender holding the most
+      entries, so one busy neighbour cannot crowd out the others
+    """
+
+    def __init__(self, capacity: int = 0, policy: str = "relay_count", max_age: float = 0.0):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy} (expected one of {OVERFLOW_POLICIES})")
+        self.capacity = max(0, int(capacity))
+        self.policy = policy
+        self.max_age = max(0.0, float(max_age))
+        self.dropped = 0
+        self.expired = 0
+        self.skewed = 0
+        self._skewed_sources = set()
+        # Heap entries: (origin time, arrival counter, data)
+        self._intake: List[Tuple[float, int, BIInputData]] = []
+        self._counter = itertools.count()
+
+    def append(self, data: BIInputData) -> Optional[BIInputData]:
+        """
+        Add input data to the active intake buffer
+
+        Returns:
+            The entry dropped by the overflow policy or for being stale
+            (possibly `data` itself), or None if nothing was dropped
+        """
+        now = time.time()
+        self.expire(now)
+
+        if self._is_stale(data, now):
+            self.expired += 1
+            return data
+
+        heapq.heappush(self._intake, (self._timestamp(data), next(self._counter), data))
+        if not self.capacity or len(self._intake) <= self.capacity:
+            return None
+
+        victim_index = self._select_victim()
+        self.dropped += 1
+        return self._remove(victim_index)
+
+    def swap(self) -> Tuple[BIInputData, ...]:
+        """Freeze the intake buffer as a chronological snapshot and start a new one"""
+        self.expire()
+        snapshot = tuple(entry[2] for entry in sorted(self._intake))
+        self._intake = []
+        return snapshot
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Evict entries received more than max_age ago, returns the number evicted"""
+        if not self.max_age:
+            return 0
+        now = time.time() if now is None else now
+        # The heap is ordered by origin time, not by receipt: filter and re-heapify
+        kept = [entry for entry in self._intake if not self._is_stale(entry[2], now)]
+        count = len(self._intake) - len(kept)
+        if count:
+            self._intake = kept
+            heapq.heapify(self._intake)
+        self.expired += count
+        return count
+
+    def total_text_length(self) -> int:
+        """Total number of characters currently buffered"""
+        return sum(len(data.text) for data in self)
+
+    def stats(self) -> dict:
+        """Capacity, policy and drop counters for status reporting"""
+        return {
+            "capacity": self.capacity,
+            "policy": self.policy,
+            "dropped_overflow": self.dropped,
+            "dropped_expired": self.expired,
+            "clock_skewed": self.skewed,
+        }
+
+    def _timestamp(self, data: BIInputData) -> float:
+        """Ordering key: origin time clamped to the local receive time, else the receive time"""
+        if data.origin_time is None:
+            return data.received_at
+        earliest = data.received_at - self.max_age if self.max_age else float("-inf")
+        timestamp = min(max(data.origin_time, earliest), data.received_at)
+        if data.origin_time < earliest or data.origin_time > data.received_at + CLOCK_SKEW_TOLERANCE:
+            self._note_skew(data)
+        return timestamp
+
+    def _note_skew(self, data: BIInputData):
+        """Count an origin time that looks like clock skew, warning once per sender"""
+        self.skewed += 1
+        if data.source not in self._skewed_sources:
+            self._skewed_sources.add(data.source)
+            offset = data.origin_time - data.received_at
+            logger.warning(
+                f"Origin time from {data.source or 'unknown sender'} is {offset:+.1f}s off the local receive time; "
+                "the device clocks may be out of sync (counted in clock_skewed)"
+            )
+
+    def _is_stale(self, data: BIInputData, now: float) -> bool:
+        return bool(self.max_age) and now - data.received_at > self.max_age
+
+    def _select_victim(self) -> int:
+        """Heap index of the entry to drop according to the overflow policy"""
+        if self.policy == "freshest":
+            return 0
+
+        if self.policy == "relay_count":
+            return max(range(len(self._intake)), key=lambda i: (self._intake[i][2].relay_count, -self._intake[i][0]))
+
+        # round_robin: the oldest entry of the sender with the most entries
+        counts = Counter(entry[2].source for entry in self._intake)
+        busiest = max(counts, key=counts.get)
+        candidates = [i for i, entry in enumerate(self._intake) if entry[2].source == busiest]
+        return min(candidates, key=lambda i: self._intake[i][:2])
+
+    def _remove(self, index: int) -> BIInputData:
+        """Remove a heap entry by index"""
+        entry = self._intake[index]
+        last = self._intake.pop()
+        if index < len(self._intake):
+            self._intake[index] = last
+            heapq.heapify(self._intake)
+        return entry[2]
+
+    def __len__(self) -> int:
+        return len(self._intake)
+
+    def __iter__(self) -> Iterator[BIInputData]:
+        return (entry[2] for entry in self._intake)
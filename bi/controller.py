@@ -1,15 +1,25 @@
 import asyncio
-from typing import List
+import time
+from typing import Optional, Sequence, Tuple
 
 from loguru import logger
 
 from api.llm import StackFlowLLMClient
 from api.osc import OscClient
 from api.tts import StackFlowTTSClient
-
-from .models import BIInputData
+from stackflow.client import StackFlowConnection
+from utils.memory import mem_available_mb
+
+from .buffer import InputBuffer
+from .ingress import IngressQueue
+from .models import BIInputData, BIUtterance
+from .prompt import PromptBudget
+from .seen_cache import SeenCache
 from .utils import P
 
+# Smoothing factor for the inter-arrival time estimate
+INTERARRIVAL_ALPHA = 0.3
+
 
 class BIController:
     """Controller for Botanical Intelligence cycle system"""
@@ -18,19 +28,125 @@ class BIController:
         logger.info("Initialize BI Controller...")
         self.config = config
         self.state = "STOPPED"
-        self.input_buffer: List[BIInputData] = []
+        cycle_config = config.get("cycle", {})
+        self.input_buffer = InputBuffer(
+            capacity=cycle_config.get("buffer_capacity", 8),
+            policy=cycle_config.get("buffer_overflow_policy", "relay_count"),
+            max_age=cycle_config.get("max_data_age", 60.0),
+        )
+        self.rejected_relay_limit = 0
+
+        # Message IDs: (origin_id, seq) pairs already received or sent
+        self.device_id = config.get("network", {}).get("device_id")
+        self.seen_cache = SeenCache(
+            max_size=cycle_config.get("seen_cache_size", 1024),
+            ttl=cycle_config.get("seen_cache_ttl", 120.0),
+        )
+        self.rejected_duplicate = 0
+        # Start from the clock so IDs stay unique across restarts (OSC int32)
+        self._next_seq = int(time.time() * 1000) & 0x7FFFFFFF
+        # Inputs frozen for the cycle currently being generated/output
+        self.cycle_inputs: Tuple[BIInputData, ...] = ()
         self.generated_text = ""
         self.tts_text = ""
+        self.current_utterance: Optional[BIUtterance] = None
+
+        # Pipelined mode: ready utterances waiting for output
+        self.ready_queue: Optional[asyncio.Queue] = None
+        self.output_state = "IDLE"
+
+        # Ingress: /bi/input messages queued per source before add_input
+        ingress_config = config.get("ingress", {})
+        self.ingress = IngressQueue(
+            capacity=ingress_config.get("capacity", 64),
+            rate=ingress_config.get("rate", 5.0),
+            burst=ingress_config.get("burst", 10.0),
+        )
+
+        # Receive window: woken by add_input, adapted to inter-arrival times
+        self._input_event = asyncio.Event()
+        self._last_input_at: Optional[float] = None
+        self._interarrival_ewma: Optional[float] = None
 
         # Initialize clients
-        self.llm_client = StackFlowLLMClient(config)
-        self.tts_client = StackFlowTTSClient(config)
+        # Seconds spent in each startup stage (see init())
+        self.startup_timings = {}
+        self.startup_memory = {}
+
+        # One multiplexed StackFlow connection shared by the LLM and TTS clients
+        self.connection = StackFlowConnection()
+        self.llm_client = StackFlowLLMClient(config, connection=self.connection)
+        self.tts_client = StackFlowTTSClient(config, connection=self.connection)
         self.osc_client = OscClient(config)
 
+        # Prefill budget for the query, after the fixed system/instruction prompts
+        self.prompt_budget = PromptBudget(config)
+        self._prompt_reserved_tokens = self.prompt_budget.count_tokens(
+            self.llm_client.system_prompt + self.llm_client.instruction_prompt
+        )
+
         logger.info("BI Controller initialized")
 
+    async def init(self):
+        """
+        Set up the LLM and TTS units concurrently, then run the warmup pass
+        (system.warmup) so the first cycle starts warm. Stage timings are
+        logged and kept in startup_timings, together with the system's
+        MemAvailable after each phase (startup_memory).
+        """
+        started_at = time.monotonic()
+        self.startup_memory["before"] = mem_available_mb()
+        await asyncio.gather(
+            self._timed("llm_setup", self.llm_client.init()),
+            self._timed("tts_setup", self.tts_client.init()),
+        )
+
+        warmup_config = self.config.get("system", {}).get("warmup", {})
+        warmups = []
+        if warmup_config.get("llm", False):
+            warmups.append(self._timed("llm_warmup", self.llm_client.warmup(), required=False))
+        if warmup_config.get("tts", False):
+            effects = warmup_config.get("effects", False)
+            warmups.append(self._timed("tts_warmup", self.tts_client.warmup(effects=effects), required=False))
+        self.startup_memory["after_setup"] = mem_available_mb()
+        await asyncio.gather(*warmups)
+        self.startup_memory["after_warmup"] = mem_available_mb()
+
+        self.startup_timings["total"] = round(time.monotonic() - started_at, 2)
+        logger.info(f"Startup timings (s): {self.startup_timings}")
+        logger.info(f"MemAvailable (MB): {self.startup_memory}")
+
+    async def _timed(self, name: str, coro, required: bool = True):
+        """Await a startup stage and record its duration; optional stages only log failures"""
+        started_at = time.monotonic()
+        try:
+            await coro
+        except Exception as e:
+            if required:
+                raise
+            logger.warning(f"Startup stage {name} failed: {e}")
+        finally:
+            self.startup_timings[name] = round(time.monotonic() - started_at, 2)
+
+    async def close(self):
+        """Release StackFlow units and close the shared connection"""
+        await self.llm_client.close()
+        await self.tts_client.close()
+        await self.connection.close()
+
     async def start_cycle(self):
         """Start the BI cycle loop"""
+        ingress_task = asyncio.create_task(self._ingress_loop())
+        try:
+            if self.config.get("cycle", {}).get("pipelined", False):
+                await self._run_pipelined()
+            else:
+                await self._run_serial()
+        finally:
+            ingress_task.cancel()
+
+    async def _run_serial(self):
+        """Run the BI cycle as a serial state machine"""
         logger.info("Starting BI cycle")
         self.state = "RECEIVING"
 
@@ -55,17 +171,164 @@ class BIController:
         logger.info("Stopping BI cycle")
         self.state = "STOPPED"
 
+    async def _run_pipelined(self):
+        """
+        Run the BI cycle as two concurrent stages.
+
+        The intake stage (RECEIVING -> GENERATING) produces utterances into a
+        bounded queue while the output stage (OUTPUT -> RESTING) plays them,
+        so the LLM works on cycle N+1 while cycle N is still being spoken.
+        When the queue is full the intake stage waits, which keeps generated
+        text from going stale behind a long playback backlog.
+        """
+        depth = max(1, int(self.config.get("cycle", {}).get("pipeline_depth", 1)))
+        logger.info(f"Starting BI cycle (pipelined, depth={depth})")
+        self.state = "PIPELINED"
+        self.ready_queue = asyncio.Queue(maxsize=depth)
+
+        await asyncio.gather(self._intake_stage(), self._output_stage())
+        self.ready_queue = None
+
+        logger.info("BI cycle stopped")
+
+    async def _intake_stage(self):
+        """Pipelined stage 1: receive inputs and generate utterances"""
+        while self.state != "STOPPED":
+            try:
+                logger.info("RECEIVING phase started")
+                await self._wait_receive_window()
+                logger.info(f"Buffer size: {len(self.input_buffer)}")
+
+                if not self.input_buffer or self.state == "STOPPED":
+                    continue
+
+                # Hand the received inputs to generation and start a fresh buffer
+                inputs = self.input_buffer.swap()
+
+                logger.info("GENERATING phase started")
+                utterance = await self._generate_utterance(inputs)
+                if utterance is not None:
+                    await self.ready_queue.put(utterance)
+                    logger.debug(f"Queued utterance (ready: {self.ready_queue.qsize()})")
+            except Exception as e:
+                logger.error(f"Error in BI intake stage: {e}")
+                await asyncio.sleep(1)
+
+        # Wake the output stage so it can finish
+        await self.ready_queue.put(None)
+
+    async def _output_stage(self):
+        """Pipelined stage 2: play queued utterances and rest between them"""
+        while True:
+            self.output_state = "IDLE"
+            utterance = await self.ready_queue.get()
+            if utterance is None:
+                break
+
+            try:
+                logger.info("OUTPUT phase started")
+                self.output_state = "OUTPUT"
+                await self._output_utterance(utterance)
+
+                logger.info("RESTING phase started")
+                self.output_state = "RESTING"
+                await asyncio.sleep(self.config.get("cycle", {}).get("rest_duration", 1.0))
+            except Exception as e:
+                logger.error(f"Error in BI output stage: {e}")
+                await asyncio.sleep(1)
+
+        self.output_state = "IDLE"
+
     async def _receiving_phase(self):
         """Phase 1: Receive input data for specified duration"""
         logger.info("RECEIVING phase started")
-        receive_duration = self.config.get("cycle", {}).get("receive_duration", 3.0)
-        await asyncio.sleep(receive_duration)
+        await self._wait_receive_window()
 
-        # No longer need _filter_old_data() here - filtering is done in add_input()
+        # Stale data is evicted by the input buffer (cycle.max_data_age)
         logger.info(f"Buffer size: {len(self.input_buffer)}")
 
         self.state = "GENERATING"
 
+    async def _wait_receive_window(self):
+        """
+        Wait while inputs are accepted into the buffer.
+
+        The window normally lasts receive_duration. It closes early once the
+        buffer reaches receive_target_inputs / receive_target_chars, and while
+        inputs are still trickling in at the deadline it is extended by the
+        expected inter-arrival gap, up to receive_max_duration. A device that
+        receives nothing waits exactly receive_duration.
+        """
+        cycle_config = self.config.get("cycle", {})
+        receive_duration = cycle_config.get("receive_duration", 3.0)
+        max_duration = max(receive_duration, cycle_config.get("receive_max_duration", receive_duration))
+
+        start = time.monotonic()
+        deadline = start + receive_duration
+        ceiling = start + max_duration
+
+        while self.state != "STOPPED":
+            self._input_event.clear()
+            if self._receive_target_reached():
+                logger.debug(f"Receive window closed early after {time.monotonic() - start:.2f}s")
+                return
+
+            now = time.monotonic()
+            if now >= deadline:
+                # Keep listening while inputs are still arriving at the measured rate
+                gap = self._expected_input_gap()
+                if gap is None or self._last_input_at < start or now - self._last_input_at > gap:
+                    return
+                new_deadline = min(ceiling, self._last_input_at + gap)
+                if new_deadline <= now:
+                    return
+                logger.debug(f"Receive window extended by {new_deadline - deadline:.2f}s")
+                deadline = new_deadline
+                continue
+
+            try:
+                await asyncio.wait_for(self._input_event.wait(), timeout=deadline - now)
+            except asyncio.TimeoutError:
+                pass
+
+    def _receive_target_reached(self) -> bool:
+        """Check whether the buffer holds enough input to close the window"""
+        cycle_config = self.config.get("cycle", {})
+        target_inputs = cycle_config.get("receive_target_inputs", 0)
+        target_chars = cycle_config.get("receive_target_chars", 0)
+
+        if target_inputs and len(self.input_buffer) >= target_inputs:
+            return True
+        if target_chars and self.input_buffer.total_text_length() >= target_chars:
+            return True
+        return False
+
+    def _expected_input_gap(self) -> Optional[float]:
+        """Window extension derived from the smoothed inter-arrival time"""
+        if self._interarrival_ewma is None:
+            return None
+        factor = self.config.get("cycle", {}).get("receive_extend_factor", 2.0)
+        return self._interarrival_ewma * factor
+
+    def _note_input_arrival(self):
+        """Update the inter-arrival estimate and wake the receive window"""
+        now = time.monotonic()
+        if self._last_input_at is not None:
+            gap = now - self._last_input_at
+            # Gaps longer than the longest window span idle periods, not a burst
+            cycle_config = self.config.get("cycle", {})
+            max_gap = max(
+                cycle_config.get("receive_duration", 3.0),
+                cycle_config.get("receive_max_duration", 0.0),
+            )
+            if gap <= max_gap:
+                if self._interarrival_ewma is None:
+                    self._interarrival_ewma = gap
+                else:
+                    self._interarrival_ewma += INTERARRIVAL_ALPHA * (gap - self._interarrival_ewma)
+        self._last_input_at = now
+        self._input_event.set()
+
     async def _generating_phase(self):
         """Phase 2: Generate text using LLM"""
         logger.info("GENERATING phase started")
@@ -75,44 +338,96 @@ class BIController:
             self.state = "RESTING"
             return
 
+        # Freeze this cycle's inputs; new arrivals go to the intake buffer
+        self.cycle_inputs = self.input_buffer.swap()
+        utterance = await self._generate_utterance(self.cycle_inputs)
+        if utterance is None:
+            self.cycle_inputs = ()
+            self.state = "RESTING"
+            return
+
+        self.current_utterance = utterance
+        self.state = "OUTPUT"
+
+    async def _generate_utterance(self, inputs: Sequence[BIInputData]) -> Optional[BIUtterance]:
+        """Concatenate inputs and generate the continuation, None on failure"""
         # Concatenate inputs in chronological order
-        concatenated_text = self._concatenate_inputs()
+        concatenated_text = self._concatenate_inputs(inputs)
         logger.info(f"Concatenated text: {concatenated_text}")
 
         # Generate 2-3 tokens with LLM
         try:
             # Use soft_prefix_b64 from the latest input data
-            sp_b64 = self.input_buffer[-1].soft_prefix_b64
+            sp_b64 = inputs[-1].soft_prefix_b64
             generated_text = await self.llm_client.generate_text(
                 query=concatenated_text,
                 lang=self.config.get("common", {}).get("lang", "ja"),
                 soft_prefix_b64=sp_b64,
                 soft_prefix_len=P,
             )
-            self.generated_text = generated_text
-            self.tts_text = concatenated_text + generated_text
-            logger.info(f"Generated text: {generated_text}")
-            self.state = "OUTPUT"
         except Exception as e:
             logger.error(f"Error in generation: {e}")
-            self.state = "RESTING"
+            return None
+
+        self.generated_text = generated_text
+        self.tts_text = concatenated_text + generated_text
+        logger.info(f"Generated text: {generated_text}")
+
+        # Use the lowest relay_count from the inputs; the output continues
+        # that input's relay chain and keeps its message ID
+        primary = min(inputs, key=lambda data: data.relay_count)
+        logger.debug(f"Using lowest relay_count from buffer: {primary.relay_count}")
+        origin_id, seq, origin_time = self._relay_chain_for(primary)
+
+        return BIUtterance(
+            generated_text=generated_text,
+            tts_text=self.tts_text,
+            soft_prefix_b64=sp_b64,
+            relay_count=primary.relay_count,
+            origin_id=origin_id,
+            seq=seq,
+            origin_time=origin_time,
+        )
+
+    def _relay_chain_for(self, primary: BIInputData) -> Tuple[int, int, float]:
+        """Message ID and origin time for an output: inherited from the input, or new ones"""
+        # Inputs without an origin time entered the network here
+        origin_time = primary.origin_time if primary.origin_time is not None else primary.received_at
+        if primary.origin_id is not None and primary.seq is not None:
+            return primary.origin_id, primary.seq, origin_time
+
+        # Input without ID (e.g. human input): this device starts the chain
+        seq = self._next_seq
+        self._next_seq = (self._next_seq + 1) & 0x7FFFFFFF
+        # Our own message must not be processed again when it loops back
+        self.seen_cache.check_and_add((self.device_id, seq))
+        return self.device_id, seq, origin_time
 
     async def _output_phase(self):
         """Phase 3: Send output and play TTS"""
         logger.info("OUTPUT phase started")
 
-        # Skip output if buffer is empty
-        if not self.input_buffer:
+        # Skip output if this cycle has no inputs
+        if not self.cycle_inputs or self.current_utterance is None:
             logger.warning("Empty buffer in output phase, skipping output")
             self.state = "RESTING"
             return
 
+        await self._output_utterance(self.current_utterance)
+
+        # Release this cycle's snapshot; the intake buffer keeps new arrivals
+        self.cycle_inputs = ()
+        self.current_utterance = None
+        self.state = "RESTING"
+
+    async def _output_utterance(self, utterance: BIUtterance):
+        """Play TTS with LED fades, then relay the generated text"""
         # LED fade up before TTS
         await self._led_fade_up()
 
         # Play TTS (all inputs + generated)
         try:
-            await self.tts_client.speak_to_file(self.tts_text)
+            await self.tts_client.speak_to_file(utterance.tts_text)
         except Exception as e:
             logger.error(f"Error in TTS: {e}")
         finally:
@@ -122,14 +437,16 @@ class BIController:
         # Send generated text to target devices
         targets = self.config.get("targets", [])
 
-        # Use the lowest relay_count and soft_prefix_b64 from buffer
-        lowest_relay_count = min(data.relay_count for data in self.input_buffer)
-        soft_prefix_b64 = self.input_buffer[-1].soft_prefix_b64  # Use latest soft prefix
-        logger.debug(f"Using lowest relay_count from buffer: {lowest_relay_count}")
-
         try:
             self.osc_client.send_to_all_targets(
-                targets, "/bi/input", self.generated_text, soft_prefix_b64, lowest_relay_count
+                targets,
+                "/bi/input",
+                utterance.generated_text,
+                utterance.soft_prefix_b64,
+                utterance.relay_count,
+                utterance.origin_id,
+                utterance.seq,
+                int(utterance.origin_time * 1000),
             )
         except Exception as e:
             logger.error(f"Error sending to targets: {e}")
@@ -142,15 +459,11 @@ class BIController:
                     "host": mixer_config.get("host"),
                     "port": mixer_config.get("port"),
                 }
-                self.osc_client.send_to_target(mixer_target, "/mixer", self.generated_text)
-                logger.info(f"Sent to Mixer PC: {self.generated_text}")
+                self.osc_client.send_to_target(mixer_target, "/mixer", utterance.generated_text)
+                logger.info(f"Sent to Mixer PC: {utterance.generated_text}")
             except Exception as e:
                 logger.error(f"Error sending to Mixer PC: {e}")
 
-        # Clear buffer
-        self.input_buffer.clear()
-        self.state = "RESTING"
-
     async def _resting_phase(self):
         """Phase 4: Rest period"""
         logger.info("RESTING phase started")
@@ -158,12 +471,43 @@ class BIController:
         await asyncio.sleep(rest_duration)
         self.state = "RECEIVING"
 
-    def _concatenate_inputs(self) -> str:
-        """Concatenate input texts in received order"""
-        return "".join([data.text for data in self.input_buffer])
-
-    def add_input(self, text: str, soft_prefix_b64: str, relay_count: int):
-        """Add input data to buffer with relay count filtering"""
+    def _concatenate_inputs(self, inputs: Sequence[BIInputData]) -> str:
+        """Concatenate input texts in chronological order within the prefill budget"""
+        fragments = self.prompt_budget.fit([data.text for data in inputs], self._prompt_reserved_tokens)
+        return "".join(fragments)
+
+    def submit_input(self, source: str, **kwargs) -> bool:
+        """
+        Queue a /bi/input message from the OSC dispatcher without blocking.
+
+        The message is rate limited per source and passed to add_input()
+        by the ingress loop. Returns False if it was throttled or dropped.
+        """
+        accepted = self.ingress.put(source, dict(kwargs, source=source))
+        if not accepted:
+            logger.debug(f"Ingress rejected message from {source}: {self.ingress.stats()}")
+        return accepted
+
+    async def _ingress_loop(self):
+        """Feed queued messages to add_input in per-source round-robin order"""
+        while True:
+            item = await self.ingress.get()
+            try:
+                self.add_input(**item)
+            except Exception as e:
+                logger.error(f"Error adding input from {item.get('source')}: {e}")
+
+    def add_input(
+        self,
+        text: str,
+        soft_prefix_b64: str,
+        relay_count: int,
+        source: str = "",
+        origin_id: Optional[int] = None,
+        seq: Optional[int] = None,
+        origin_time_ms: Optional[int] = None,
+    ):
+        """Add input data to buffer with relay count, duplicate and freshness filtering"""
         max_relay_count = self.config.get("cycle", {}).get("max_relay_count", 6)
 
         # Enhanced logging for debugging relay count
@@ -175,13 +519,38 @@ class BIController:
                 f"Rejected data exceeding relay limit: relay_count={relay_count}, "
                 f"max_relay_count={max_relay_count}, text='{text[:20]}...'"
             )
+            self.rejected_relay_limit += 1
             return
 
+        # Drop messages already received via another path (or our own, looped back)
+        if origin_id is not None and seq is not None:
+            if self.seen_cache.check_and_add((origin_id, seq)):
+                logger.info(f"Rejected duplicate message: origin_id={origin_id} seq={seq} text='{text[:20]}...'")
+                self.rejected_duplicate += 1
+                return
+
         # Increment relay count for next transmission
         next_relay_count = relay_count + 1
 
-        data = BIInputData(soft_prefix_b64=soft_prefix_b64, relay_count=next_relay_count, text=text)
-        self.input_buffer.append(data)
+        data = BIInputData(
+            soft_prefix_b64=soft_prefix_b64,
+            relay_count=next_relay_count,
+            text=text,
+            source=source,
+            origin_id=origin_id,
+            seq=seq,
+            origin_time=origin_time_ms / 1000.0 if origin_time_ms is not None else None,
+        )
+        dropped = self.input_buffer.append(data)
+        if dropped is not None:
+            logger.warning(
+                f"Dropped input ({self.input_buffer.policy}, max_age={self.input_buffer.max_age}s): "
+                f"'{dropped.text[:20]}...' relay_count={dropped.relay_count} source={dropped.source}"
+            )
+            if dropped is data:
+                return
+        # Only inputs that made it into the buffer count as arrivals for the receive window
+        self._note_input_arrival()
         logger.info(
             f"Added input: '{text[:20]}...' relay_count={relay_count}->{next_relay_count} "
             f"soft_prefix_b64={soft_prefix_b64[:30]}... (buffer size: {len(self.input_buffer)})"
@@ -257,8 +626,20 @@ class BIController:
 
     def get_status(self) -> dict:
         """Get current status"""
-        return {
+        status = {
             "state": self.state,
             "buffer_size": len(self.input_buffer),
+            "cycle_inputs": len(self.cycle_inputs),
+            "buffer": self.input_buffer.stats(),
+            "rejected_relay_limit": self.rejected_relay_limit,
+            "rejected_duplicate": self.rejected_duplicate,
+            "ingress": self.ingress.stats(),
+            "stackflow": self.connection.stats(),
+            "startup_timings": self.startup_timings,
+            "startup_memory": self.startup_memory,
             "generated_text": self.generated_text,
         }
+        if self.ready_queue is not None:
+            status["output_state"] = self.output_state
+            status["ready_utterances"] = self.ready_queue.qsize()
+        return status
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict
+
+# Idle token buckets are pruned once this many sources have been seen
+MAX_TRACKED_SOURCES = 256
+
+
+class TokenBucket:
+    """Token bucket rate limiter: `rate` tokens per second, up to `burst`"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+
+    def consume(self) -> bool:
+        """Take one token, False if the bucket is empty"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+    def is_idle(self) -> bool:
+        """True if the bucket has refilled completely"""
+        return self.tokens + (time.monotonic() - self.updated_at) * self.rate >= self.burst
+
+
+class IngressQueue:
+    """
+    Bounded, per-source fair queue between the OSC dispatcher and BIController.
+
+    put() is called from the datagram callback and never blocks: each source
+    address has its own token bucket, and messages over the rate are counted
+    as throttled and dropped. Accepted messages are queued per source and
+    get() hands them out round-robin, so one flooding sender only delays its
+    own messages. When the queue is full, the oldest message of the source
+    with the longest backlog is dropped.
+    """
+
+    def __init__(self, capacity: int = 64, rate: float = 5.0, burst: float = 10.0):
+        self.capacity = max(1, int(capacity))
+        self.rate = rate
+        self.burst = burst
+
+        self._queues: "OrderedDict[str, Deque[dict]]" = OrderedDict()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._size = 0
+        self._event = asyncio.Event()
+
+        self.accepted = 0
+        self.throttled = 0
+        self.dropped_full = 0
+
+    def put(self, source: str, item: dict) -> bool:
+        """
+        Enqueue a message from `source` without blocking
+
+        Returns:
+            True if the message was accepted
+        """
+        bucket = self._buckets.get(source)
+        if bucket is None:
+            self._prune_buckets()
+            bucket = self._buckets[source] = TokenBucket(self.rate, self.burst)
+        if not bucket.consume():
+            self.throttled += 1
+            return False
+
+        if self._size >= self.capacity:
+            busiest = max(self._queues, key=lambda s: len(self._queues[s]))
+            if busiest == source or len(self._queues[busiest]) <= len(self._queues.get(source, ())):
+                # The sender is already the largest backlog: drop its new message
+                self.dropped_full += 1
+                return False
+            self._pop_from(busiest)
+            self.dropped_full += 1
+
+        self._queues.setdefault(source, deque()).append(item)
+        self._size += 1
+        self.accepted += 1
+        self._event.set()
+        return True
+
+    async def get(self) -> dict:
+        """Wait for the next message, taking sources in round-robin order"""
+        while not self._size:
+            self._event.clear()
+            await self._event.wait()
+
+        source = next(iter(self._queues))
+        return self._pop_from(source)
+
+    def stats(self) -> dict:
+        """Queue size and counters for status reporting"""
+        return {
+            "queued": self._size,
+            "sources": len(self._queues),
+            "accepted": self.accepted,
+            "throttled": self.throttled,
+            "dropped_full": self.dropped_full,
+        }
+
+    def _pop_from(self, source: str) -> dict:
+        """Pop the oldest message of a source and rotate it to the back"""
+        queue = self._queues[source]
+        item = queue.popleft()
+        self._size -= 1
+        if queue:
+            self._queues.move_to_end(source)
+        else:
+            del self._queues[source]
+        return item
+
+    def _prune_buckets(self):
+        """Forget sources whose buckets have fully refilled"""
+        if len(self._buckets) < MAX_TRACKED_SOURCES:
+            return
+        for source in [s for s, b in self._buckets.items() if b.is_idle() and s not in self._queues]:
+            del self._buckets[source]
+
+    def __len__(self) -> int:
+        return self._size
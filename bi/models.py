@@ -1,4 +1,6 @@
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
+from typing import Optional
 
 
 @dataclass
@@ -8,3 +10,21 @@ class BIInputData:
     soft_prefix_b64: str
     relay_count: int
     text: str
+    source: str = ""  # sender host address, empty if unknown
+    origin_id: Optional[int] = None  # device ID that started this relay chain
+    seq: Optional[int] = None  # sequence number assigned by the origin device
+    origin_time: Optional[float] = None  # UNIX time the relay chain started at the origin
+    received_at: float = field(default_factory=time.time)  # local UNIX time of receipt
+
+
+@dataclass
+class BIUtterance:
+    """Generated output of one cycle, ready for TTS/LED output and relay"""
+
+    generated_text: str
+    tts_text: str
+    soft_prefix_b64: str
+    relay_count: int
+    origin_id: int
+    seq: int
+    origin_time: float
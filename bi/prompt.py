@@ -0,0 +1,118 @@
+import unicodedata
+from typing import Callable, List, Optional, Sequence
+
+from loguru import logger
+
+# Characters per token for space-separated scripts, by language
+LATIN_CHARS_PER_TOKEN = {"en": 4.0, "fr": 3.5}
+DEFAULT_LATIN_CHARS_PER_TOKEN = 3.5
+
+# Tokens of the newest input kept when the fixed prompt parts use up the whole budget
+MIN_QUERY_TOKENS = 16
+
+
+def load_tokenizer(path: Optional[str]) -> Optional[Callable[[str], int]]:
+    """
+    Load a HuggingFace tokenizer.json as a token counting function.
+
+    Returns None (heuristic counting) if no path is configured or the
+    optional `tokenizers` package is not installed.
+    """
+    if not path:
+        return None
+    try:
+        from tokenizers import Tokenizer
+
+        tokenizer = Tokenizer.from_file(path)
+    except Exception as e:
+        logger.warning(f"Tokenizer unavailable ({e}), using character heuristics")
+        return None
+
+    logger.info(f"Loaded tokenizer: {path}")
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+class PromptBudget:
+    """
+    Keeps the LLM query within a prefill token budget.
+
+    Token counts come from the model tokenizer when one is configured
+    (stack_flow_llm.tokenizer_path), otherwise from character heuristics:
+    one token per CJK/kana character and ~3.5-4 characters per token for
+    Latin text. When the concatenated inputs exceed the budget, the oldest
+    fragments are dropped first, and a single oversized fragment keeps its
+    most recent end. If the fixed prompt parts use up the whole budget,
+    the query still gets MIN_QUERY_TOKENS, over the budget.
+    """
+
+    def __init__(self, config: dict):
+        llm_config = config.get("stack_flow_llm", {})
+        self.max_tokens = int(llm_config.get("prefill_token_budget", 0))
+        self.lang = config.get("common", {}).get("lang", "ja")
+        self._count = load_tokenizer(llm_config.get("tokenizer_path"))
+
+    def count_tokens(self, text: str) -> int:
+        """Estimate the number of tokens in text"""
+        if self._count is not None:
+            return self._count(text)
+
+        chars_per_token = LATIN_CHARS_PER_TOKEN.get(self.lang, DEFAULT_LATIN_CHARS_PER_TOKEN)
+        wide = 0
+        narrow = 0
+        for ch in text:
+            if unicodedata.east_asian_width(ch) in ("W", "F"):
+                wide += 1
+            else:
+                narrow += 1
+        return wide + int(narrow / chars_per_token + 0.999)
+
+    def fit(self, fragments: Sequence[str], reserved_tokens: int = 0) -> List[str]:
+        """
+        Trim fragments (oldest first) to fit the budget
+
+        Args:
+            fragments: Input texts in chronological order
+            reserved_tokens: Tokens already used by the fixed prompt parts
+
+        Returns:
+            The most recent fragments that fit, oldest first
+        """
+        if self.max_tokens <= 0:
+            return list(fragments)
+
+        available = self.max_tokens - reserved_tokens
+        if available <= 0:
+            logger.warning(
+                f"Fixed prompt parts use {reserved_tokens} of {self.max_tokens} prefill tokens, "
+                f"keeping {MIN_QUERY_TOKENS} tokens of input over the budget"
+            )
+            available = MIN_QUERY_TOKENS
+        kept: List[str] = []
+        used = 0
+        for text in reversed(fragments):
+            tokens = self.count_tokens(text)
+            if used + tokens > available:
+                if not kept:
+                    # Even the newest fragment is too long: keep its tail
+                    kept.append(self._tail(text, available))
+                logger.info(f"Prompt trimmed to {len(kept)}/{len(fragments)} fragments (budget {available} tokens)")
+                break
+            kept.append(text)
+            used += tokens
+
+        kept.reverse()
+        return kept
+
+    def _tail(self, text: str, max_tokens: int) -> str:
+        """Longest suffix of text within max_tokens"""
+        if max_tokens <= 0:
+            return ""
+        lo, hi = 0, len(text)
+        # Binary search for the smallest start index that fits
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.count_tokens(text[mid:]) <= max_tokens:
+                hi = mid
+            else:
+                lo = mid + 1
+        return text[lo:]
@@ -0,0 +1,47 @@
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class SeenCache:
+    """
+    Time-bounded LRU set of message IDs that have already been received.
+
+    Entries expire after `ttl` seconds and the oldest entries are evicted
+    once `max_size` is reached, so memory stays constant however long the
+    network runs.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 120.0):
+        self.max_size = max(1, int(max_size))
+        self.ttl = float(ttl)
+        self._entries: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def check_and_add(self, key: Hashable) -> bool:
+        """
+        Record a message ID
+
+        Returns:
+            True if the ID was already seen within the TTL (a duplicate)
+        """
+        now = time.monotonic()
+        self._expire(now)
+
+        if key in self._entries:
+            return True
+
+        self._entries[key] = now
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return False
+
+    def _expire(self, now: float):
+        """Drop entries older than the TTL (oldest first)"""
+        while self._entries:
+            key, seen_at = next(iter(self._entries.items()))
+            if now - seen_at <= self.ttl:
+                break
+            del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -49,11 +49,24 @@ async def async_main():
     logger.info("Starting BI system")
     app = AppController(config)
     bi = BIController(config)
+    await bi.init()
 
     # Register BI-specific handlers
-    def handle_bi_input(_, *args):
-        # OSC message format: /bi/input text soft_prefix_b64 relay_count
-        bi.add_input(text=args[0], soft_prefix_b64=args[1], relay_count=args[2])
+    def handle_bi_input(client_address, _, *args):
+        # OSC message format: /bi/input text soft_prefix_b64 relay_count [origin_id seq [origin_time_ms]]
+        # Rate limit per host: OscClient sends each message from a new UDP port
+        source = client_address[0]
+        origin_id, seq = (args[3], args[4]) if len(args) >= 5 else (None, None)
+        origin_time_ms = args[5] if len(args) >= 6 else None
+        bi.submit_input(
+            source,
+            text=args[0],
+            soft_prefix_b64=args[1],
+            relay_count=args[2],
+            origin_id=origin_id,
+            seq=seq,
+            origin_time_ms=origin_time_ms,
+        )
 
     def handle_bi_stop(_, *__):
         bi.stop_cycle()
@@ -61,7 +74,7 @@ async def async_main():
     def handle_bi_status(_, *__):
         logger.info(f"BI Status: {bi.get_status()}")
 
-    app.osc_server.register_handler("/bi/input", handle_bi_input)
+    app.osc_server.register_handler("/bi/input", handle_bi_input, needs_reply_address=True)
     app.osc_server.register_handler("/bi/stop", handle_bi_stop)
     app.osc_server.register_handler("/bi/status", handle_bi_status)
 
@@ -70,7 +83,11 @@ async def async_main():
     asyncio.create_task(bi.start_cycle())
 
     # Run app
-    await app.run()
+    try:
+        await app.run()
+    finally:
+        bi.stop_cycle()
+        await bi.close()
 
 
 def main():
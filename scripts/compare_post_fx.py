@@ -0,0 +1,103 @@
+"""
+Compare the in-process post-FX chain with the FFmpeg render.
+
+Renders the same 16kHz mono signal through post_fx() and through
+POST_FX_FILTER (aecho, equalizer, acompressor, alimiter) in FFmpeg, and
+reports loudness (RMS, peak) and spectral (third-octave band energy)
+differences. Exits with status 1 if they are outside the tolerances.
+
+Usage:
+    python scripts/compare_post_fx.py [input.wav]
+
+Without an input file, a speech-like test signal run through
+rumble_layered_array() is used. Requires ffmpeg on PATH.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from loguru import logger
+
+from api.audio_effects import (
+    POST_FX_FILTER,
+    ffmpeg_filter_array,
+    load16k,
+    post_fx,
+    rumble_layered_array,
+    speech_like,
+)
+
+SR = 16000
+
+# Allowed differences between the renders
+MAX_RMS_DIFF_DB = 1.5
+MAX_PEAK_DIFF_DB = 1.5
+MAX_BAND_DIFF_DB = 3.0
+
+
+def db(value: float) -> float:
+    return 20.0 * np.log10(max(value, 1e-12))
+
+
+def band_energies_db(y: np.ndarray) -> tuple:
+    """Energy per third-octave band from 50Hz to 6.3kHz (dB)"""
+    spectrum = np.abs(np.fft.rfft(y * np.hanning(len(y)))) ** 2
+    freqs = np.fft.rfftfreq(len(y), 1 / SR)
+    centers = 1000.0 * 2.0 ** (np.arange(-13, 9) / 3.0)
+    energies = []
+    for fc in centers:
+        band = (freqs >= fc / 2 ** (1 / 6)) & (freqs < fc * 2 ** (1 / 6))
+        energies.append(10.0 * np.log10(spectrum[band].sum() + 1e-20))
+    return centers, np.array(energies)
+
+
+def compare(native: np.ndarray, reference: np.ndarray) -> bool:
+    """Log loudness and spectral differences, True if within tolerance"""
+    n = min(len(native), len(reference))
+    if abs(len(native) - len(reference)) > SR // 100:
+        logger.warning(f"Length differs: native {len(native)}, ffmpeg {len(reference)}")
+    native, reference = native[:n], reference[:n]
+
+    rms_diff = db(float(np.sqrt(np.mean(native**2)))) - db(float(np.sqrt(np.mean(reference**2))))
+    peak_diff = db(float(np.max(np.abs(native)))) - db(float(np.max(np.abs(reference))))
+    logger.info(f"RMS difference: {rms_diff:+.2f} dB, peak difference: {peak_diff:+.2f} dB")
+
+    centers, native_bands = band_energies_db(native)
+    _, reference_bands = band_energies_db(reference)
+    # Only bands with meaningful energy in the reference
+    audible = reference_bands > reference_bands.max() - 50.0
+    band_diff = native_bands - reference_bands
+    for fc, diff, used in zip(centers, band_diff, audible):
+        logger.debug(f"{fc:7.0f} Hz: {diff:+.2f} dB{'' if used else ' (ignored)'}")
+    worst = float(np.max(np.abs(band_diff[audible])))
+    logger.info(f"Largest third-octave band difference: {worst:.2f} dB")
+
+    return abs(rms_diff) <= MAX_RMS_DIFF_DB and abs(peak_diff) <= MAX_PEAK_DIFF_DB and worst <= MAX_BAND_DIFF_DB
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input", nargs="?", help="Input WAV (default: synthetic rumble signal)")
+    args = parser.parse_args()
+
+    if args.input:
+        base = load16k(args.input)
+    else:
+        base = rumble_layered_array(speech_like(3.0, SR), pitch_steps=-8.0)
+
+    native = post_fx(base, sr=SR)
+    reference = ffmpeg_filter_array(base, POST_FX_FILTER, sr=SR)
+    if compare(native, reference):
+        logger.success("Native post-FX matches the FFmpeg render")
+        return 0
+    logger.error("Native post-FX differs from the FFmpeg render beyond tolerance")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
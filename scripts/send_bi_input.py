@@ -6,12 +6,14 @@ Usage:
     python scripts/send_bi_input.py --host 192.168.1.100 --text "こんにちは"
     python scripts/send_bi_input.py -H 192.168.1.100 -t "Hello world" -r 2
     python scripts/send_bi_input.py -H 192.168.1.100 -t "Hello" -s <base64_soft_prefix>
+    python scripts/send_bi_input.py -H 192.168.1.100 -t "Hello" --origin-id 1 --seq 42
 """
 
 import argparse
 import base64
 import random
 import struct
+import time
 
 from pythonosc import udp_client
 
@@ -46,6 +48,9 @@ def send_bi_input(
     text: str,
     soft_prefix_b64: str | None = None,
     relay_count: int = 0,
+    origin_id: int | None = None,
+    seq: int | None = None,
+    origin_time_ms: int | None = None,
 ):
     """Send /bi/input OSC message to target device."""
     client = udp_client.SimpleUDPClient(host, port)
@@ -60,7 +65,14 @@ def send_bi_input(
     print(f"  Soft Prefix (b64): {soft_prefix_b64[:30]}...")
     print(f"  Relay Count: {relay_count}")
 
-    client.send_message("/bi/input", [text, soft_prefix_b64, relay_count])
+    args = [text, soft_prefix_b64, relay_count]
+    if origin_id is not None and seq is not None:
+        if origin_time_ms is None:
+            origin_time_ms = int(time.time() * 1000)
+        print(f"  Message ID: origin_id={origin_id} seq={seq} origin_time_ms={origin_time_ms}")
+        args += [origin_id, seq, origin_time_ms]
+
+    client.send_message("/bi/input", args)
     print("✓ Message sent successfully")
 
 
@@ -79,6 +91,9 @@ Examples:
   # Send with custom soft prefix
   python scripts/send_bi_input.py -H 192.168.1.100 -t "World" -s "<base64_string>"
 
+  # Send with a message ID (a second send with the same ID is dropped as duplicate)
+  python scripts/send_bi_input.py -H 192.168.1.100 -t "Hello" --origin-id 1 --seq 42
+
   # Send to custom port
   python scripts/send_bi_input.py -H 192.168.1.100 -p 9000 -t "世界"
         """,
@@ -124,6 +139,27 @@ Examples:
         help="Base64-encoded soft prefix (if not provided, random one will be generated)",
     )
 
+    parser.add_argument(
+        "--origin-id",
+        type=int,
+        default=None,
+        help="Origin device ID of the message ID (sent together with --seq)",
+    )
+
+    parser.add_argument(
+        "--seq",
+        type=int,
+        default=None,
+        help="Sequence number of the message ID (sent together with --origin-id)",
+    )
+
+    parser.add_argument(
+        "--origin-time-ms",
+        type=int,
+        default=None,
+        help="Origin UNIX time in milliseconds (default: now, only sent with a message ID)",
+    )
+
     args = parser.parse_args()
 
     try:
@@ -133,6 +169,9 @@ Examples:
             text=args.text,
             soft_prefix_b64=args.soft_prefix,
             relay_count=args.relay_count,
+            origin_id=args.origin_id,
+            seq=args.seq,
+            origin_time_ms=args.origin_time_ms,
         )
     except Exception as e:
         print(f"✗ Error: {e}")
@@ -0,0 +1,323 @@
+import asyncio
+import itertools
+import json
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
+
+from loguru import logger
+
+from .utils import LineFramer
+
+# Bytes requested per socket read; frames are split out by LineFramer
+READ_CHUNK = 64 * 1024
+
+# A message, or a function building it (called again with fresh IDs on retry)
+Message = Union[dict, Callable[[], dict]]
+
+
+class StackFlowConnection:
+    """
+    Multiplexed asyncio connection to the StackFlow llm-sys TCP API.
+
+    StackFlow speaks newline-delimited JSON. A single background reader
+    task parses incoming messages and routes each one to the exchange that
+    is waiting for it, by request_id (or by work_id for messages without
+    one), so several clients can share one connection and an LLM inference
+    stream can run while TTS requests are answered.
+
+    Every exchange needs a request_id that is unique among the exchanges
+    in flight; new_request_id() hands them out. Messages nobody is waiting
+    for (e.g. trailing frames of an abandoned stream) are logged and
+    dropped.
+
+    When the socket drops, the connection reconnects in the background
+    with exponential backoff and then runs the reconnect hooks (clients
+    reattach to their units or set them up again there, since a restarted
+    service has forgotten them). Requests wait for the recovery and are retried;
+    pass the message as a builder function so the retry picks up the new
+    work_id and a fresh request_id.
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 10001,
+        reconnect_delay: float = 0.5,
+        max_reconnect_delay: float = 10.0,
+    ):
+        self.host = host
+        self.port = port
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.framer = LineFramer()
+
+        self._ids = itertools.count(1)
+        # request_id / work_id -> queue of routed messages (or the reader's fatal error)
+        self._routes: Dict[str, asyncio.Queue] = {}
+        self._work_routes: Dict[str, asyncio.Queue] = {}
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+
+        # Health tracking and recovery
+        self._hooks: List[Callable[[], Awaitable[None]]] = []
+        self._ready = asyncio.Event()
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+        self.connected_at: Optional[float] = None
+
+    @property
+    def connected(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing()
+
+    @property
+    def healthy(self) -> bool:
+        """Connected and all units set up (no recovery in progress)"""
+        return self.connected and self._ready.is_set()
+
+    def add_reconnect_hook(self, hook: Callable[[], Awaitable[None]]):
+        """Register a coroutine function to run after every reconnect (e.g. unit re-setup)"""
+        self._hooks.append(hook)
+
+    def stats(self) -> dict:
+        """Connection health for status reporting"""
+        return {
+            "connected": self.connected,
+            "healthy": self.healthy,
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+            "uptime": round(time.time() - self.connected_at, 1) if self.healthy and self.connected_at else 0.0,
+        }
+
+    def new_request_id(self, prefix: str) -> str:
+        """Unique request_id for this connection, e.g. "llm_inference_12" """
+        return f"{prefix}_{next(self._ids)}"
+
+    async def connect(self, timeout: Optional[float] = 10.0):
+        """Open the TCP connection and start the reader (no-op if already connected)"""
+        async with self._connect_lock:
+            if self.connected:
+                return
+            self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), timeout)
+            self.framer.clear()
+            self._closing = False
+            self._reader_task = asyncio.create_task(self._read_loop())
+            self.connected_at = time.time()
+            self._ready.set()
+            logger.debug(f"Connected to StackFlow at {self.host}:{self.port}")
+
+    async def ensure_connected(self, timeout: Optional[float] = None):
+        """Wait until the connection is healthy, starting a reconnect if needed"""
+        if self.healthy:
+            return
+        if self._closing:
+            raise ConnectionError("StackFlow connection is closed")
+        if asyncio.current_task() is self._reconnect_task:
+            # Reconnect hooks talk over the connection before it is marked ready
+            return
+        self._start_reconnect()
+        await asyncio.wait_for(asyncio.shield(self._reconnect_task), timeout)
+
+    async def close(self):
+        """Stop the reader and close the TCP connection"""
+        self._closing = True
+        self._ready.clear()
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            try:
+                await self._reconnect_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._reconnect_task = None
+        await self._close_transport()
+
+    async def _close_transport(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+        if self.writer is None:
+            return
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except Exception as e:
+            logger.debug(f"Error closing StackFlow connection: {e}")
+        self.reader = None
+        self.writer = None
+
+    async def send(self, data: dict):
+        """Send one JSON message without waiting for a reply"""
+        if not self.connected:
+            raise ConnectionError("StackFlow connection is not open")
+        async with self._write_lock:
+            self.writer.write((json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8"))
+            await self.writer.drain()
+
+    async def request(self, data: Message, timeout: Optional[float] = None, retries: int = 1) -> dict:
+        """
+        Send a message and return its reply
+
+        A connection failure is retried up to `retries` times once the
+        connection has recovered. Timeouts are not retried.
+        """
+        for attempt in range(retries + 1):
+            await self.ensure_connected(timeout)
+            message = data() if callable(data) else data
+            request_id = message["request_id"]
+            queue = self._register(request_id)
+            try:
+                await self.send(message)
+                return await self._get(queue, timeout)
+            except ConnectionError as e:
+                if attempt == retries:
+                    raise
+                logger.warning(f"Retrying StackFlow request {request_id} after connection failure: {e}")
+            finally:
+                self._unregister(request_id)
+
+    async def stream(self, data: Message, timeout: Optional[float] = None, retries: int = 1) -> AsyncIterator[dict]:
+        """
+        Send a message and yield its stream frames until one reports finish
+        or an error. `timeout` applies to each frame.
+
+        A connection failure before the first frame is retried like in
+        request(); a stream that already produced frames is not replayed.
+        A consumer that stops early should close the iterator (e.g. with
+        contextlib.aclosing) so its route is released at once.
+        """
+        for attempt in range(retries + 1):
+            await self.ensure_connected(timeout)
+            message = data() if callable(data) else data
+            request_id = message["request_id"]
+            work_id = message.get("work_id")
+            queue = self._register(request_id)
+            if work_id:
+                self._work_routes[work_id] = queue
+            received = False
+            try:
+                await self.send(message)
+                while True:
+                    response_data = await self._get(queue, timeout)
+                    received = True
+                    yield response_data
+
+                    error = response_data.get("error")
+                    payload = response_data.get("data")
+                    if error and error.get("code") != 0:
+                        return
+                    if not isinstance(payload, dict) or payload.get("finish"):
+                        return
+            except ConnectionError as e:
+                if received or attempt == retries:
+                    raise
+                logger.warning(f"Retrying StackFlow stream {request_id} after connection failure: {e}")
+            finally:
+                self._unregister(request_id)
+                if work_id and self._work_routes.get(work_id) is queue:
+                    del self._work_routes[work_id]
+
+    def _register(self, request_id: str) -> asyncio.Queue:
+        if request_id in self._routes:
+            raise ValueError(f"request_id already in flight: {request_id}")
+        queue = self._routes[request_id] = asyncio.Queue()
+        return queue
+
+    def _unregister(self, request_id: str):
+        self._routes.pop(request_id, None)
+
+    async def _get(self, queue: asyncio.Queue, timeout: Optional[float]) -> dict:
+        """Wait for the next routed message, re-raising a reader failure"""
+        item: Union[dict, Exception] = await asyncio.wait_for(queue.get(), timeout)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    async def _read_loop(self):
+        """Read, frame and route incoming messages until the connection ends"""
+        error: Exception = ConnectionError("StackFlow connection closed by peer")
+        try:
+            while True:
+                data = await self.reader.read(READ_CHUNK)
+                if not data:
+                    break
+                self.framer.feed(data)
+                for message in self.framer.messages():
+                    self._route(message)
+        except asyncio.CancelledError:
+            error = ConnectionError("StackFlow connection closed")
+            raise
+        except Exception as e:
+            logger.error(f"StackFlow reader failed: {e}")
+            error = ConnectionError(f"StackFlow reader failed: {e}")
+        finally:
+            self._ready.clear()
+            self.last_error = str(error)
+            # Wake every waiting exchange with the failure
+            for queue in set(self._routes.values()) | set(self._work_routes.values()):
+                queue.put_nowait(error)
+            if self.writer is not None:
+                self.writer.close()
+
+        # Dropped by the peer: recover in the background
+        if not self._closing:
+            logger.warning(f"StackFlow connection lost: {error}")
+            self._start_reconnect()
+
+    def _start_reconnect(self):
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        """Reconnect with exponential backoff and run the reconnect hooks"""
+        delay = self.reconnect_delay
+        pending_hooks = list(self._hooks)
+        while not self._closing:
+            try:
+                if not self.connected:
+                    await self._close_transport()
+                    async with self._connect_lock:
+                        self.reader, self.writer = await asyncio.wait_for(
+                            asyncio.open_connection(self.host, self.port), timeout=10.0
+                        )
+                        self.framer.clear()
+                        self._reader_task = asyncio.create_task(self._read_loop())
+                    # The units of the old connection are gone: set them up again
+                    pending_hooks = list(self._hooks)
+                    logger.info(f"Reconnected to StackFlow at {self.host}:{self.port}")
+
+                # Hooks that succeeded are not repeated if a later one fails
+                while pending_hooks:
+                    await pending_hooks[0]()
+                    pending_hooks.pop(0)
+
+                self.reconnects += 1
+                self.connected_at = time.time()
+                self._ready.set()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"StackFlow reconnect failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+        raise ConnectionError("StackFlow connection is closed")
+
+    def _route(self, message: dict):
+        request_id = message.get("request_id")
+        if request_id:
+            queue = self._routes.get(request_id)
+        else:
+            queue = self._work_routes.get(message.get("work_id"))
+        if queue is None:
+            logger.debug(f"Dropping unrouted StackFlow message: {str(message)[:100]}")
+            return
+        queue.put_nowait(message)
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from .client import StackFlowConnection
+
+DEFAULT_SESSION_STATE_PATH = "./tmp/stackflow_session.json"
+
+
+def setup_fingerprint(setup_data: dict) -> str:
+    """Hash of a setup message without its request_id (the unit's configuration)"""
+    params = {key: value for key, value in setup_data.items() if key != "request_id"}
+    return hashlib.sha1(json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class UnitSession:
+    """
+    Persisted work_ids of set-up StackFlow units.
+
+    With `system.reattach_units` enabled, the clients record every unit
+    they set up together with a fingerprint of its setup parameters, and
+    leave the units loaded on exit. After a restart, attach() checks with
+    `taskinfo` that the recorded unit is still running and reuses it
+    instead of loading the model again; a unit whose configuration changed
+    is released and set up anew.
+
+    Each record/forget re-reads the state file, so clients sharing it do
+    not overwrite each other's entries.
+
+    Independently of the setting, the units set up by this process are
+    kept in memory, so that after a reconnect reclaim() reuses (or
+    releases) a unit StackFlow kept loaded when only the socket dropped.
+    """
+
+    def __init__(self, path: str = DEFAULT_SESSION_STATE_PATH, enabled: bool = False):
+        self.path = Path(path)
+        self.enabled = enabled
+        # Units set up by this process: name -> {"work_id", "fingerprint"}
+        self._units = {}
+
+    @classmethod
+    def from_config(cls, config: dict) -> "UnitSession":
+        system_config = config.get("system", {})
+        return cls(
+            path=system_config.get("session_state_path", DEFAULT_SESSION_STATE_PATH),
+            enabled=bool(system_config.get("reattach_units", False)),
+        )
+
+    async def attach(
+        self, connection: StackFlowConnection, name: str, setup_data: dict, timeout: float = 10.0
+    ) -> Optional[str]:
+        """
+        Work_id of a still-running unit set up with the same parameters, or None
+
+        A recorded unit that is still running but was set up with other
+        parameters is released, so its NPU memory is free for the new setup.
+        """
+        if not self.enabled:
+            return None
+        entry = self._load().get(name)
+        if not entry:
+            return None
+        work_id = await self._reuse(connection, name, entry, setup_data, timeout)
+        if work_id is not None:
+            logger.info(f"Reattached to {name} unit {work_id}")
+            self._units[name] = entry
+        return work_id
+
+    async def reclaim(
+        self, connection: StackFlowConnection, name: str, setup_data: dict, timeout: float = 10.0
+    ) -> Optional[str]:
+        """
+        Work_id of the unit this process set up before a reconnect, or None
+
+        StackFlow keeps a unit loaded when only the client's socket drops,
+        so setting up again without checking would load a second model
+        next to the orphaned one. The unit is reused if it is still running
+        with the same parameters and released if its configuration changed.
+        """
+        entry = self._units.get(name)
+        if not entry:
+            return None
+        work_id = await self._reuse(connection, name, entry, setup_data, timeout)
+        if work_id is not None:
+            logger.info(f"Reusing {name} unit {work_id} after reconnecting")
+        return work_id
+
+    async def release(self, connection: StackFlowConnection, name: str, timeout: float = 10.0):
+        """Exit a recorded unit that is no longer wanted and forget it"""
+        if not self.enabled:
+            return
+        entry = self._load().get(name)
+        if not entry:
+            return
+        logger.info(f"Releasing recorded {name} unit {entry.get('work_id')}")
+        await self._exit(connection, entry.get("work_id"), timeout)
+        self.forget(name)
+
+    def record(self, name: str, setup_data: dict, work_id: str):
+        """Remember a unit that was just set up"""
+        if work_id is None:
+            return
+        entry = {"work_id": work_id, "fingerprint": setup_fingerprint(setup_data)}
+        self._units[name] = entry
+        if not self.enabled:
+            return
+        state = self._load()
+        state[name] = entry
+        self._save(state)
+
+    def forget(self, name: str):
+        """Drop a unit from the state (released or gone)"""
+        self._units.pop(name, None)
+        if not self.enabled:
+            return
+        state = self._load()
+        if state.pop(name, None) is not None:
+            self._save(state)
+
+    async def _reuse(
+        self, connection: StackFlowConnection, name: str, entry: dict, setup_data: dict, timeout: float
+    ) -> Optional[str]:
+        """Work_id of the entry's unit if it is running with setup_data's parameters, otherwise forget it"""
+        work_id = entry.get("work_id")
+        if not await self._is_running(connection, work_id, timeout):
+            logger.info(f"{name} unit {work_id} is gone, setting up again")
+            self.forget(name)
+            return None
+
+        if entry.get("fingerprint") != setup_fingerprint(setup_data):
+            logger.info(f"{name} configuration changed, releasing unit {work_id}")
+            await self._exit(connection, work_id, timeout)
+            self.forget(name)
+            return None
+
+        return work_id
+
+    async def _is_running(self, connection: StackFlowConnection, work_id: str, timeout: float) -> bool:
+        request_data = {"request_id": connection.new_request_id("taskinfo"), "work_id": work_id, "action": "taskinfo"}
+        try:
+            response_data = await connection.request(request_data, timeout=timeout, retries=0)
+        except Exception as e:
+            logger.warning(f"taskinfo for {work_id} failed: {e}")
+            return False
+        error = response_data.get("error")
+        return not (error and error.get("code") != 0)
+
+    async def _exit(self, connection: StackFlowConnection, work_id: str, timeout: float):
+        request_data = {"request_id": connection.new_request_id("exit"), "work_id": work_id, "action": "exit"}
+        try:
+            await connection.request(request_data, timeout=timeout, retries=0)
+        except Exception as e:
+            logger.warning(f"Releasing {work_id} failed: {e}")
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, mode="r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable session state {self.path}: {e}")
+            return {}
+
+    def _save(self, state: dict):
+        # Write-then-rename so a crash never leaves a truncated file
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, mode="w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
@@ -1,8 +1,75 @@
 import json
 import socket
+import weakref
+from typing import Iterator, Optional
 
 from loguru import logger
 
+# Upper bound for one NDJSON line (setup replies and audio frames can be large)
+MAX_LINE_LENGTH = 1 << 20
+RECV_SIZE = 4096
+
+
+class LineFramer:
+    """
+    Incremental newline-delimited JSON decoder.
+
+    Bytes are appended to a single bytearray as they arrive. Complete lines
+    are cut off the front and decoded once, so a multi-byte UTF-8 character
+    split across reads is never decoded in halves, and bytes after the
+    first newline (the next pipelined frame) stay buffered for the next
+    call instead of being lost.
+    """
+
+    def __init__(self, max_line_length: int = MAX_LINE_LENGTH):
+        self.max_line_length = max_line_length
+        self._buffer = bytearray()
+        # Where the next newline search starts, so a partial line is scanned only once
+        self._scan_from = 0
+
+    def feed(self, data: bytes):
+        """Append received bytes"""
+        self._buffer += data
+
+    def next_line(self) -> Optional[bytes]:
+        """Pop the next complete line (without the newline), or None"""
+        index = self._buffer.find(b"\n", self._scan_from)
+        if index < 0:
+            self._scan_from = len(self._buffer)
+            if self._scan_from > self.max_line_length:
+                raise ValueError(f"NDJSON line exceeds {self.max_line_length} bytes")
+            return None
+        line = bytes(self._buffer[:index])
+        del self._buffer[: index + 1]
+        self._scan_from = 0
+        return line
+
+    def messages(self) -> Iterator[dict]:
+        """Yield every complete JSON message currently buffered"""
+        while True:
+            line = self.next_line()
+            if line is None:
+                return
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                logger.warning(f"Skipping malformed StackFlow message ({e}): {line[:100]!r}")
+
+    def clear(self):
+        """Discard buffered bytes (e.g. after reconnecting)"""
+        self._buffer.clear()
+        self._scan_from = 0
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+
+# Leftover bytes of blocking sockets, kept between receive_response() calls
+_socket_framers: "weakref.WeakKeyDictionary[socket.socket, LineFramer]" = weakref.WeakKeyDictionary()
+
 
 def create_tcp_connection(host: str, port: int):
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -28,18 +95,41 @@ def receive_response(sock, timeout=None):
         if timeout:
             sock.settimeout(timeout)
 
-        response = ""
+        framer = _socket_framers.get(sock)
+        if framer is None:
+            framer = _socket_framers[sock] = LineFramer()
         while True:
-            part = sock.recv(4096).decode("utf-8")
-            response += part
-            if "\n" in response:
-                break
-        return response.strip()
+            line = framer.next_line()
+            if line is not None:
+                if line.strip():
+                    return line.decode("utf-8").strip()
+                continue
+            part = sock.recv(RECV_SIZE)
+            if not part:
+                raise ConnectionError("connection closed by peer")
+            framer.feed(part)
     except Exception as e:
         logger.error(f"Error at receive_response: {e}")
         return None
 
 
+# Error codes meaning the work_id no longer refers to a running unit, e.g.
+# after the unit's service restarted (-5: unit does not exist,
+# -8: unit call failed, -11: module not started)
+UNIT_LOST_ERROR_CODES = (-5, -8, -11)
+
+
+class UnitLostError(ConnectionError):
+    """StackFlow no longer knows the unit (work_id) a request was sent to"""
+
+
+def check_unit_lost(response_data: dict):
+    """Raise UnitLostError if the reply says the unit is gone"""
+    error = response_data.get("error")
+    if error and error.get("code") in UNIT_LOST_ERROR_CODES:
+        raise UnitLostError(f"{response_data.get('work_id')}: {error.get('message')} ({error.get('code')})")
+
+
 def parse_setup_response(response_data: dict, sent_request_id: str) -> str:
     error = response_data.get("error")
     request_id = response_data.get("request_id")
@@ -0,0 +1,65 @@
+"""Shared fakes for the StackFlow client tests"""
+
+import copy
+import itertools
+import json
+from pathlib import Path
+
+CONFIG_PATH = Path(__file__).parent.parent / "config" / "config.json"
+
+
+def load_config() -> dict:
+    """Fresh copy of the repo config, safe to modify"""
+    with open(CONFIG_PATH, encoding="utf-8") as f:
+        return copy.deepcopy(json.load(f))
+
+
+class FakeConnection:
+    """
+    StackFlowConnection stand-in without a socket.
+
+    Every message sent is recorded in `sent`. request() answers with
+    replies[action] (a reply dict, a function of the message, or an
+    exception to raise) and succeeds by default; stream() yields `frames`.
+    """
+
+    def __init__(self, frames=(), replies: dict | None = None):
+        self.frames = list(frames)
+        self.replies = replies or {}
+        self.sent = []
+        self.reconnect_hooks = []
+        self.healthy = True
+        self._ids = itertools.count(1)
+
+    def new_request_id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids)}"
+
+    def add_reconnect_hook(self, hook):
+        self.reconnect_hooks.append(hook)
+
+    def sent_actions(self, action: str) -> list:
+        """Messages sent with the given action"""
+        return [message for message in self.sent if message.get("action") == action]
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def request(self, data, timeout=None, retries=1):
+        message = data() if callable(data) else data
+        self.sent.append(message)
+        reply = self.replies.get(message.get("action"))
+        if isinstance(reply, Exception):
+            raise reply
+        if callable(reply):
+            return reply(message)
+        if reply is not None:
+            return dict(reply, request_id=message["request_id"])
+        return {"request_id": message["request_id"], "work_id": message.get("work_id"), "error": {"code": 0}}
+
+    async def stream(self, data, timeout=None, retries=1):
+        self.sent.append(data() if callable(data) else data)
+        for frame in self.frames:
+            yield frame
@@ -0,0 +1,228 @@
+"""Test script for the numpy parts of the audio effects chain"""
+
+import io
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import pytest
+import soundfile as sf
+from loguru import logger
+
+from api.audio_effects import (
+    _attack_release,
+    _attack_release_loop,
+    _pitch_shift_filters,
+    _smooth_envelope,
+    _smooth_envelope_loop,
+    compressor,
+    echo,
+    envelope_follower,
+    limiter,
+    peaking_eq,
+    pitch_shift_vocoder,
+    rms,
+    rumble_filter_complex,
+    rumble_layered_with_fx_array,
+    rumble_layered_with_fx_ffmpeg,
+    speech_like,
+)
+
+
+def test_envelope_matches_loop():
+    """Vectorized smoothing matches the per-sample loop"""
+    logger.info("Test: vectorized envelope matches loop")
+
+    x = np.abs(speech_like())
+    for attack_ms, release_ms in ((5.0, 120.0), (6.0, 180.0), (8.0, 220.0), (1.0, 1.0), (50.0, 10.0)):
+        expected = _smooth_envelope_loop(x, 16000, attack_ms, release_ms)
+        actual = _smooth_envelope(x, 16000, attack_ms, release_ms)
+        assert actual.dtype == np.float32
+        assert np.allclose(actual, expected, atol=1e-6), (attack_ms, release_ms)
+
+    # Silence and a single sample
+    assert not np.any(_smooth_envelope(np.zeros(100, dtype=np.float32), 16000, 5.0, 120.0))
+    assert len(_smooth_envelope(np.zeros(0, dtype=np.float32), 16000, 5.0, 120.0)) == 0
+    assert np.allclose(_smooth_envelope(np.ones(1, dtype=np.float32), 16000, 5.0, 120.0), 1 - np.exp(-1 / 80))
+
+
+def test_envelope_follower():
+    """The follower normalizes the smoothed envelope to 0..1 and applies the power curve"""
+    logger.info("Test: envelope follower")
+
+    x = speech_like(0.5)
+    env = envelope_follower(x, sr=16000, attack_ms=6, release_ms=180, power=1.05)
+    assert env.dtype == np.float32 and len(env) == len(x)
+    assert 0.0 <= float(env.min()) and abs(float(env.max()) - 1.0) < 1e-5
+
+    smoothed = _smooth_envelope(np.abs(x), 16000, 6, 180)
+    assert np.allclose(env, (smoothed / smoothed.max()) ** 1.05, atol=1e-5)
+
+
+def test_pitch_shift_vocoder():
+    """Each requested shift moves a tone to the expected pitch and keeps its length"""
+    logger.info("Test: phase vocoder pitch shift")
+
+    sr = 16000
+    t = np.arange(2 * sr) / sr
+    tone = (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    shifts = [-12.0, -6.0, -18.5, 0.0]
+    for steps, shifted in zip(shifts, pitch_shift_vocoder(tone, shifts, sr=sr)):
+        assert len(shifted) == len(tone)
+        spectrum = np.abs(np.fft.rfft(shifted * np.hanning(len(shifted))))
+        peak_hz = np.fft.rfftfreq(len(shifted), 1 / sr)[np.argmax(spectrum)]
+        assert abs(peak_hz - 440 * 2 ** (steps / 12)) < 2.0, (steps, peak_hz)
+        # Level is preserved away from the edges
+        assert abs(float(np.sqrt(np.mean(shifted[2000:-2000] ** 2))) - 0.354) < 0.05
+
+    # Shorter than one analysis window
+    assert len(pitch_shift_vocoder(tone[:100], [-6.0], sr=sr)[0]) == 100
+
+
+def test_post_fx_stages():
+    """Echo taps, EQ boost and limiter ceiling of the native post-FX chain"""
+    logger.info("Test: native post-FX stages")
+
+    sr = 16000
+    impulse = np.zeros(4000, dtype=np.float32)
+    impulse[0] = 1.0
+    echoed = echo(impulse, sr)
+    assert len(echoed) == 4000 + 3840
+    assert np.allclose(echoed[[0, 1920, 3840]], [0.85 * 0.8, 0.85 * 0.25, 0.85 * 0.18])
+
+    response = np.abs(np.fft.rfft(peaking_eq(impulse, sr, freq=140.0, q=1.1, gain_db=3.0)))
+    freqs = np.fft.rfftfreq(len(impulse), 1 / sr)
+    assert abs(20 * np.log10(response[np.argmin(np.abs(freqs - 140))]) - 3.0) < 0.1
+    assert abs(20 * np.log10(response[np.argmin(np.abs(freqs - 4000))])) < 0.1
+
+    loud = (2.0 * np.random.default_rng(0).standard_normal(sr)).astype(np.float32)
+    assert float(np.max(np.abs(limiter(loud, sr, limit=0.97, auto_level=False)))) <= 0.97 + 1e-6
+    quiet = 0.1 * loud
+    assert np.allclose(limiter(quiet, sr, limit=0.97, auto_level=False), quiet)
+
+
+def test_instant_attack_release():
+    """Zero attack/release coefficients match the per-sample loop; short compressor attacks do not fail"""
+    logger.info("Test: instant attack/release")
+
+    x = speech_like(0.5)
+    for a_a, a_r in ((0.0, 0.999), (0.0, 0.5), (0.995, 0.0), (0.0, 0.0)):
+        for signal in (np.square(x), x):
+            expected = _attack_release_loop(signal, a_a, a_r)
+            actual = _attack_release(signal, a_a, a_r)
+            assert np.allclose(actual, expected, rtol=1e-5, atol=1e-6), (a_a, a_r)
+
+    # attack_ms <= 0.25 at 16kHz gives an attack coefficient of exactly 0
+    for attack_ms, release_ms in ((0.1, 260.0), (0.25, 0.2)):
+        out = compressor(x, 16000, attack_ms=attack_ms, release_ms=release_ms)
+        assert len(out) == len(x) and np.all(np.isfinite(out))
+
+
+def test_rumble_filter_complex():
+    """The fused graph has one labelled output, the post-FX chain and the output rate"""
+    logger.info("Test: fused rumble filter graph")
+
+    graph = rumble_filter_complex("asetrate=9600,aresample=16000", "asetrate=8000,aresample=16000", 0.5, 0.1)
+    assert graph.count("[out]") == 1 and graph.endswith("[out]")
+    for name in ("sidechaingate", "asoftclip", "aecho", "acompressor", "alimiter", "aresample=48000"):
+        assert name in graph, name
+
+    # No drive: the soft clipper is left out
+    assert "asoftclip" not in rumble_filter_complex("anull", "anull", 0.5, 0.1, drive=0.0)
+
+
+def test_rumble_filter_complex_runs():
+    """FFmpeg builds and runs the fused graph with real pitch-shift filters"""
+    logger.info("Test: fused rumble filter graph in FFmpeg")
+
+    if shutil.which("ffmpeg") is None:
+        pytest.skip("ffmpeg not found")
+
+    main_pitch = _pitch_shift_filters(-8.0, "asetrate")[0][1]
+    sub_pitch = _pitch_shift_filters(-20.0, "asetrate")[0][1]
+    for drive in (0.55, 0.0):
+        graph = rumble_filter_complex(main_pitch, sub_pitch, 0.5, 0.1, drive=drive)
+        cmd = [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            "sine=frequency=140:sample_rate=16000:duration=0.5",
+            "-filter_complex",
+            graph,
+            "-map",
+            "[out]",
+            "-f",
+            "wav",
+            "pipe:1",
+        ]
+        result = subprocess.run(cmd, capture_output=True)
+        assert result.returncode == 0, result.stderr.decode("utf-8", "replace")
+        y, sr = sf.read(io.BytesIO(result.stdout), dtype="float32")
+        assert sr == 48000 and len(y) >= sr // 2
+        assert np.all(np.isfinite(y)) and float(np.max(np.abs(y))) > 0.0
+
+
+def third_octave_db(y: np.ndarray, sr: int = 16000) -> np.ndarray:
+    """Power per third-octave band from 63Hz to 6.3kHz (dB)"""
+    spec = np.abs(np.fft.rfft(y * np.hanning(len(y)))) ** 2
+    freqs = np.fft.rfftfreq(len(y), 1.0 / sr)
+    centers = 1000.0 * 2.0 ** (np.arange(-12, 9) / 3.0)
+    return np.array(
+        [10.0 * np.log10(spec[(freqs >= c / 2 ** (1 / 6)) & (freqs < c * 2 ** (1 / 6))].sum() + 1e-20) for c in centers]
+    )
+
+
+def test_rumble_fused_matches_array():
+    """The fused graph's RMS and spectral envelope stay close to the numpy chain's"""
+    logger.info("Test: fused rumble output vs numpy chain")
+
+    if shutil.which("ffmpeg") is None:
+        pytest.skip("ffmpeg not found")
+
+    # Same pitch shift on both sides: rubberband and the vocoder differ on their own
+    dry = speech_like(3.0)
+    wav = io.BytesIO()
+    sf.write(wav, dry, 16000, format="WAV", subtype="PCM_16")
+    pcm = rumble_layered_with_fx_ffmpeg(wav.getvalue(), sample_rate=16000, channels=1, pitch_method="asetrate")
+    fused = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+    native = rumble_layered_with_fx_array(dry, pitch_method="asetrate")
+    n = min(len(fused), len(native))
+    fused, native = fused[:n], native[:n]
+
+    # RMS within 1.5dB (measured: under 0.5dB)
+    assert abs(20.0 * np.log10(rms(fused) / rms(native))) < 1.5
+
+    # Each audible band (within 40dB of the loudest) within 6dB (measured: under 4.5dB;
+    # the noise realizations and gating differ, so the rumble bands never match exactly)
+    fused_bands, native_bands = third_octave_db(fused), third_octave_db(native)
+    audible = native_bands > native_bands.max() - 40.0
+    assert np.max(np.abs(fused_bands - native_bands)[audible]) < 6.0
+
+
+if __name__ == "__main__":
+    logger.info("Starting audio effects tests\n")
+
+    try:
+        test_envelope_matches_loop()
+        test_envelope_follower()
+        test_pitch_shift_vocoder()
+        test_post_fx_stages()
+        test_instant_attack_release()
+        test_rumble_filter_complex()
+        test_rumble_filter_complex_runs()
+        test_rumble_fused_matches_array()
+        logger.success("All tests completed!")
+    except Exception as e:
+        logger.error(f"Test failed: {e}")
+        import traceback
+
+        traceback.print_exc()
@@ -0,0 +1,276 @@
+"""Test script for the BI controller cycle, with stub LLM/TTS/OSC clients"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from bi import BIController
+from fakes import load_config
+
+
+class StubLLM:
+    """Answers every query with "!" and records the queries"""
+
+    def __init__(self):
+        self.queries = []
+
+    async def generate_text(self, query, lang, soft_prefix_b64=None, soft_prefix_len=0):
+        self.queries.append(query)
+        return "!"
+
+
+class StubTTS:
+    """Records the texts and "plays" each one until the gate is open"""
+
+    def __init__(self, gate: asyncio.Event):
+        self.gate = gate
+        self.texts = []
+
+    async def speak_to_file(self, text, on_start_callback=None, on_end_callback=None):
+        self.texts.append(text)
+        await self.gate.wait()
+
+
+class StubOSC:
+    def __init__(self):
+        self.sent = []
+
+    def send_to_all_targets(self, targets, address, *args):
+        self.sent.append(args[0])
+
+    def send_to_target(self, target, address, *args):
+        pass
+
+
+def make_controller(**cycle) -> BIController:
+    """Controller on the repo config with cycle overrides, LEDs off and no targets"""
+    config = load_config()
+    config["cycle"].update(cycle)
+    config["led_control"]["enabled"] = False
+    config["targets"] = []
+    config.pop("mixer", None)
+    controller = BIController(config)
+    controller.llm_client = StubLLM()
+    controller.osc_client = StubOSC()
+    return controller
+
+
+async def wait_until(predicate, timeout: float = 2.0):
+    """Poll until predicate() is true"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        assert loop.time() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.01)
+
+
+def add(controller: BIController, text: str):
+    controller.add_input(text=text, soft_prefix_b64="AAAA", relay_count=0)
+
+
+PIPELINED = dict(
+    pipelined=True,
+    pipeline_depth=1,
+    receive_duration=0.05,
+    receive_max_duration=0.05,
+    receive_target_inputs=1,
+    rest_duration=0.0,
+)
+
+
+def test_pipelined_backpressure():
+    """Generation runs ahead of playback by pipeline_depth utterances, then waits"""
+    logger.info("Test: pipelined backpressure")
+
+    async def scenario():
+        controller = make_controller(**PIPELINED)
+        gate = asyncio.Event()
+        controller.tts_client = tts = StubTTS(gate)
+        llm = controller.llm_client
+        task = asyncio.create_task(controller._run_pipelined())
+
+        # #0 is playing, #1 waits in the queue, #2 waits for a free slot
+        for i in range(3):
+            add(controller, f"in{i}")
+            await wait_until(lambda: len(llm.queries) == i + 1)
+        await wait_until(lambda: tts.texts == ["in0!"] and controller.output_state == "OUTPUT")
+        assert controller.ready_queue.qsize() == 1
+
+        # The intake stage is blocked: a new input is not generated
+        add(controller, "in3")
+        await asyncio.sleep(0.2)
+        assert len(llm.queries) == 3
+        assert len(controller.input_buffer) == 1
+        assert controller.get_status()["ready_utterances"] == 1
+
+        gate.set()
+        await wait_until(lambda: len(tts.texts) == 4)
+        assert tts.texts == ["in0!", "in1!", "in2!", "in3!"]
+        assert controller.osc_client.sent == ["!"] * 4
+
+        controller.stop_cycle()
+        await asyncio.wait_for(task, timeout=2.0)
+        assert controller.ready_queue is None
+        assert controller.output_state == "IDLE"
+
+    asyncio.run(scenario())
+
+
+def test_pipelined_shutdown_drains_queue():
+    """stop_cycle() ends both stages through the None sentinel after the queued utterances"""
+    logger.info("Test: pipelined shutdown")
+
+    async def scenario():
+        controller = make_controller(**PIPELINED)
+        gate = asyncio.Event()
+        controller.tts_client = tts = StubTTS(gate)
+        task = asyncio.create_task(controller._run_pipelined())
+
+        for i in range(2):
+            add(controller, f"in{i}")
+            await wait_until(lambda: len(controller.llm_client.queries) == i + 1)
+        await wait_until(lambda: controller.ready_queue.qsize() == 1)
+
+        controller.stop_cycle()
+        await asyncio.sleep(0.2)
+        assert not task.done()
+
+        gate.set()
+        await asyncio.wait_for(task, timeout=2.0)
+        assert tts.texts == ["in0!", "in1!"]
+
+        # Idle stages stop at once
+        controller = make_controller(**PIPELINED)
+        controller.tts_client = StubTTS(gate)
+        task = asyncio.create_task(controller._run_pipelined())
+        await asyncio.sleep(0.1)
+        controller.stop_cycle()
+        await asyncio.wait_for(task, timeout=1.0)
+        assert controller.llm_client.queries == []
+
+    asyncio.run(scenario())
+
+
+def _timed_window(controller: BIController, inputs=(), interval: float = 0.1, start_delay: float = 0.05) -> float:
+    """Seconds the receive window stays open while `inputs` arrive every `interval` seconds"""
+
+    async def feed():
+        await asyncio.sleep(start_delay)
+        for text in inputs:
+            add(controller, text)
+            await asyncio.sleep(interval)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        controller.state = "RECEIVING"
+        feeder = asyncio.create_task(feed())
+        started_at = loop.time()
+        await controller._wait_receive_window()
+        elapsed = loop.time() - started_at
+        feeder.cancel()
+        return elapsed
+
+    return asyncio.run(scenario())
+
+
+WINDOW = dict(
+    receive_duration=0.3,
+    receive_max_duration=0.3,
+    receive_target_inputs=0,
+    receive_target_chars=0,
+    receive_extend_factor=2.0,
+    buffer_capacity=64,
+)
+
+
+def test_receive_window_without_inputs():
+    """A device that receives nothing waits exactly receive_duration"""
+    logger.info("Test: receive window without inputs")
+
+    elapsed = _timed_window(make_controller(**dict(WINDOW, receive_max_duration=1.0)))
+    assert 0.3 <= elapsed < 0.4, elapsed
+
+
+def test_receive_window_closes_at_target():
+    """The window closes as soon as receive_target_inputs / receive_target_chars is reached"""
+    logger.info("Test: receive window targets")
+
+    controller = make_controller(**dict(WINDOW, receive_duration=1.0, receive_target_inputs=2))
+    elapsed = _timed_window(controller, ["a", "b", "c"], interval=0.05)
+    assert 0.1 <= elapsed < 0.25, elapsed
+    assert len(controller.input_buffer) == 2
+
+    controller = make_controller(**dict(WINDOW, receive_duration=1.0, receive_target_chars=5))
+    elapsed = _timed_window(controller, ["abc", "def"], interval=0.05)
+    assert 0.1 <= elapsed < 0.25, elapsed
+
+    # Already satisfied: no wait at all
+    controller = make_controller(**dict(WINDOW, receive_duration=1.0, receive_target_inputs=1))
+    add(controller, "a")
+    assert _timed_window(controller) < 0.05
+
+
+def test_receive_window_extends_while_arriving():
+    """Inputs still arriving at the deadline extend the window by the expected gap"""
+    logger.info("Test: receive window extension")
+
+    # Inputs at 0.05 ... 0.55s, 0.1s apart: open until ~0.2s (2x the gap) after the last
+    controller = make_controller(**dict(WINDOW, receive_max_duration=2.0))
+    elapsed = _timed_window(controller, [f"in{i}" for i in range(6)], interval=0.1)
+    assert 0.65 <= elapsed < 0.95, elapsed
+    assert len(controller.input_buffer) == 6
+
+    # A single input has no inter-arrival estimate: no extension
+    controller = make_controller(**dict(WINDOW, receive_max_duration=2.0))
+    elapsed = _timed_window(controller, ["once"], start_delay=0.25)
+    assert 0.3 <= elapsed < 0.4, elapsed
+
+
+def test_receive_window_capped():
+    """A steady stream of inputs cannot keep the window open past receive_max_duration"""
+    logger.info("Test: receive window cap")
+
+    controller = make_controller(**dict(WINDOW, receive_max_duration=0.6))
+    elapsed = _timed_window(controller, [f"in{i}" for i in range(30)], interval=0.05)
+    assert 0.6 <= elapsed < 0.75, elapsed
+
+
+def test_rejected_inputs_are_not_arrivals():
+    """Inputs the buffer drops on arrival neither extend nor wake the receive window"""
+    logger.info("Test: rejected inputs are not arrivals")
+
+    # A full buffer under "relay_count" drops newcomers relayed further than what it holds
+    controller = make_controller(**dict(WINDOW, receive_max_duration=2.0, buffer_capacity=1))
+    add(controller, "kept")
+    arrived_at = controller._last_input_at
+    controller._input_event.clear()
+
+    controller.add_input(text="far", soft_prefix_b64="AAAA", relay_count=4)
+    assert [data.text for data in controller.input_buffer] == ["kept"]
+    assert controller._last_input_at == arrived_at
+    assert controller._interarrival_ewma is None
+    assert not controller._input_event.is_set()
+
+
+if __name__ == "__main__":
+    logger.info("Starting BI controller tests\n")
+
+    try:
+        test_pipelined_backpressure()
+        test_pipelined_shutdown_drains_queue()
+        test_receive_window_without_inputs()
+        test_receive_window_closes_at_target()
+        test_receive_window_extends_while_arriving()
+        test_receive_window_capped()
+        test_rejected_inputs_are_not_arrivals()
+        logger.success("All tests completed!")
+    except Exception as e:
+        logger.error(f"Test failed: {e}")
+        import traceback
+
+        traceback.print_exc()
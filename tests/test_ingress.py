@@ -0,0 +1,56 @@
+"""Test script for the /bi/input ingress queue"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from bi import IngressQueue
+
+
+def test_rate_limit_per_source():
+    """A flooding source is throttled without affecting others"""
+    logger.info("Test: rate limit per source")
+
+    ingress = IngressQueue(capacity=64, rate=0.0, burst=3)
+    accepted = [ingress.put("10.0.0.9", {"text": str(i)}) for i in range(10)]
+    assert accepted.count(True) == 3
+    assert ingress.put("10.0.0.2", {"text": "neighbour"})
+
+    stats = ingress.stats()
+    assert stats["throttled"] == 7
+    assert stats["accepted"] == 4
+
+
+def test_fair_dequeue_and_overflow():
+    """Sources are served round-robin and overflow hits the longest backlog"""
+    logger.info("Test: fair dequeue and overflow")
+
+    ingress = IngressQueue(capacity=4, rate=100.0, burst=100)
+    for i in range(4):
+        ingress.put("flood", {"text": f"f{i}"})
+    assert ingress.put("neighbour", {"text": "n0"})
+    assert ingress.stats()["dropped_full"] == 1
+
+    async def drain():
+        return [(await ingress.get())["text"] for _ in range(len(ingress))]
+
+    assert asyncio.run(drain()) == ["f1", "n0", "f2", "f3"]
+
+
+if __name__ == "__main__":
+    logger.info("Starting ingress queue tests\n")
+
+    try:
+        test_rate_limit_per_source()
+        test_fair_dequeue_and_overflow()
+        logger.success("All tests completed!")
+    except Exception as e:
+        logger.error(f"Test failed: {e}")
+        import traceback
+
+        traceback.print_exc()
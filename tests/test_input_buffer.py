@@ -0,0 +1,175 @@
+"""Test script for the BI input buffer"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from bi import BIInputData, InputBuffer
+
+
+def make_input(
+    text: str,
+    relay_count: int = 1,
+    source: str = "",
+    origin_time: float | None = None,
+    received_at: float | None = None,
+) -> BIInputData:
+    data = BIInputData(
+        soft_prefix_b64="AAAA", relay_count=relay_count, text=text, source=source, origin_time=origin_time
+    )
+    if received_at is not None:
+        data.received_at = received_at
+    return data
+
+
+def test_swap_keeps_new_arrivals():
+    """Inputs added after swap() belong to the next cycle"""
+    logger.info("Test: swap keeps new arrivals")
+
+    buffer = InputBuffer()
+    buffer.append(make_input("こんにちは"))
+    buffer.append(make_input("世界"))
+
+    snapshot = buffer.swap()
+    assert [data.text for data in snapshot] == ["こんにちは", "世界"]
+    assert len(buffer) == 0
+
+    # Arrives while the snapshot is being generated/played
+    buffer.append(make_input("夜"))
+    assert [data.text for data in snapshot] == ["こんにちは", "世界"]
+    assert [data.text for data in buffer.swap()] == ["夜"]
+
+
+def test_total_text_length():
+    """Text length counts only the intake side"""
+    logger.info("Test: total text length")
+
+    buffer = InputBuffer()
+    buffer.append(make_input("abc"))
+    buffer.append(make_input("de"))
+    assert buffer.total_text_length() == 5
+
+    buffer.swap()
+    assert buffer.total_text_length() == 0
+    assert not buffer
+
+
+def test_overflow_relay_count():
+    """relay_count policy drops the most relayed entry"""
+    logger.info("Test: overflow policy relay_count")
+
+    buffer = InputBuffer(capacity=2, policy="relay_count")
+    buffer.append(make_input("a", relay_count=3))
+    buffer.append(make_input("b", relay_count=1))
+    dropped = buffer.append(make_input("c", relay_count=2))
+
+    assert dropped.text == "a"
+    assert [data.text for data in buffer.swap()] == ["b", "c"]
+    buffer.append(make_input("b", relay_count=1))
+    buffer.append(make_input("c", relay_count=2))
+
+    # A new entry with the highest relay_count is dropped itself
+    dropped = buffer.append(make_input("d", relay_count=5))
+    assert dropped.text == "d"
+    assert buffer.stats()["dropped_overflow"] == 2
+
+
+def test_overflow_freshest():
+    """freshest policy drops the oldest entry"""
+    logger.info("Test: overflow policy freshest")
+
+    buffer = InputBuffer(capacity=2, policy="freshest")
+    for text in ["a", "b", "c"]:
+        buffer.append(make_input(text))
+
+    assert [data.text for data in buffer.swap()] == ["b", "c"]
+
+
+def test_overflow_round_robin():
+    """round_robin policy drops from the busiest sender"""
+    logger.info("Test: overflow policy round_robin")
+
+    buffer = InputBuffer(capacity=3, policy="round_robin")
+    buffer.append(make_input("a1", source="10.0.0.1"))
+    buffer.append(make_input("b1", source="10.0.0.2"))
+    buffer.append(make_input("a2", source="10.0.0.1"))
+    buffer.append(make_input("a3", source="10.0.0.1"))
+
+    assert [data.text for data in buffer.swap()] == ["b1", "a2", "a3"]
+
+
+def test_origin_time_order():
+    """Snapshots are ordered by origin time, not by arrival"""
+    logger.info("Test: origin time order")
+
+    now = time.time()
+    buffer = InputBuffer()
+    buffer.append(make_input("late", origin_time=now - 1.0))
+    buffer.append(make_input("early", origin_time=now - 5.0))
+    buffer.append(make_input("local"))
+
+    assert [data.text for data in buffer.swap()] == ["early", "late", "local"]
+
+
+def test_max_age_eviction():
+    """Entries received more than max_age ago are dropped on append and swap"""
+    logger.info("Test: max age eviction")
+
+    now = time.time()
+    buffer = InputBuffer(max_age=10.0)
+    dropped = buffer.append(make_input("stale", received_at=now - 30.0))
+    assert dropped.text == "stale"
+
+    buffer.append(make_input("fresh", received_at=now - 1.0))
+    buffer.append(make_input("aging", origin_time=now - 9.99, received_at=now - 9.99))
+    time.sleep(0.05)
+
+    assert [data.text for data in buffer.swap()] == ["fresh"]
+    assert buffer.stats()["dropped_expired"] == 2
+
+
+def test_clock_skew():
+    """A sender clock far off ours neither drops its inputs nor pins them to either end of the order"""
+    logger.info("Test: clock skew")
+
+    now = time.time()
+    buffer = InputBuffer(max_age=10.0)
+    assert buffer.append(make_input("behind", source="10.0.0.1", origin_time=now - 300.0)) is None
+    assert buffer.append(make_input("ahead", source="10.0.0.2", origin_time=now + 300.0)) is None
+    buffer.append(make_input("local"))
+    buffer.append(make_input("synced", source="10.0.0.3", origin_time=now - 5.0))
+    buffer.append(make_input("behind again", source="10.0.0.1", origin_time=now - 300.0))
+
+    # "behind" is ordered max_age before its receipt, "ahead" at its receipt
+    assert [data.text for data in buffer.swap()] == ["behind", "behind again", "synced", "ahead", "local"]
+    stats = buffer.stats()
+    assert stats["clock_skewed"] == 3 and stats["dropped_expired"] == 0
+
+    # The skewed entries still age on the local clock
+    buffer.append(make_input("behind", origin_time=now - 300.0, received_at=now - 11.0))
+    assert len(buffer) == 0
+
+
+if __name__ == "__main__":
+    logger.info("Starting input buffer tests\n")
+
+    try:
+        test_swap_keeps_new_arrivals()
+        test_total_text_length()
+        test_overflow_relay_count()
+        test_overflow_freshest()
+        test_overflow_round_robin()
+        test_origin_time_order()
+        test_max_age_eviction()
+        test_clock_skew()
+        logger.success("All tests completed!")
+    except Exception as e:
+        logger.error(f"Test failed: {e}")
+        import traceback
+
+        traceback.print_exc()
@@ -0,0 +1,67 @@
+"""Test script for the LLM prompt budget"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from bi.prompt import MIN_QUERY_TOKENS, PromptBudget
+
+
+def make_budget(max_tokens: int, lang: str = "ja") -> PromptBudget:
+    return PromptBudget({"common": {"lang": lang}, "stack_flow_llm": {"prefill_token_budget": max_tokens}})
+
+
+def test_token_estimate():
+    """CJK characters count as one token, Latin text as ~4 characters"""
+    logger.info("Test: token estimate")
+
+    assert make_budget(0).count_tokens("こんにちは世界") == 7
+    assert make_budget(0, lang="en").count_tokens("hello world!") == 3
+
+
+def test_drop_oldest_fragments():
+    """Oldest fragments are dropped first"""
+    logger.info("Test: drop oldest fragments")
+
+    budget = make_budget(10)
+    fragments = ["古い入力です", "新しい", "入力"]
+    assert budget.fit(fragments, reserved_tokens=4) == ["新しい", "入力"]
+    assert make_budget(0).fit(fragments) == fragments
+
+
+def test_oversized_fragment_keeps_tail():
+    """A single oversized fragment keeps its most recent end"""
+    logger.info("Test: oversized fragment keeps tail")
+
+    budget = make_budget(3)
+    assert budget.fit(["あいうえお"]) == ["うえお"]
+
+
+def test_reserved_over_budget_keeps_query():
+    """Fixed prompt parts over the budget still leave the newest input's tail"""
+    logger.info("Test: reserved tokens over budget")
+
+    budget = make_budget(10)
+    newest = "あ" * 10 + "い" * MIN_QUERY_TOKENS
+    assert budget.fit(["古い入力", newest], reserved_tokens=12) == ["い" * MIN_QUERY_TOKENS]
+    assert budget.fit(["古い", "短い"], reserved_tokens=10) == ["古い", "短い"]
+
+
+if __name__ == "__main__":
+    logger.info("Starting prompt budget tests\n")
+
+    try:
+        test_token_estimate()
+        test_drop_oldest_fragments()
+        test_oversized_fragment_keeps_tail()
+        test_reserved_over_budget_keeps_query()
+        logger.success("All tests completed!")
+    except Exception as e:
+        logger.error(f"Test failed: {e}")
+        import traceback
+
+        traceback.print_exc()
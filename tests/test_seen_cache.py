@@ -0,0 +1,53 @@
+"""Test script for the message ID seen-cache"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from bi import SeenCache
+
+
+def test_duplicate_detection():
+    """Second arrival of the same ID is a duplicate"""
+    logger.info("Test: duplicate detection")
+
+    cache = SeenCache(max_size=16, ttl=60.0)
+    assert not cache.check_and_add((1, 100))
+    assert cache.check_and_add((1, 100))
+    assert not cache.check_and_add((2, 100))
+
+
+def test_size_and_ttl_bounds():
+    """Oldest IDs are forgotten by size and by age"""
+    logger.info("Test: size and TTL bounds")
+
+    cache = SeenCache(max_size=2, ttl=60.0)
+    cache.check_and_add((1, 1))
+    cache.check_and_add((1, 2))
+    cache.check_and_add((1, 3))
+    assert len(cache) == 2
+    assert not cache.check_and_add((1, 1))
+
+    cache = SeenCache(max_size=16, ttl=0.05)
+    cache.check_and_add((1, 1))
+    time.sleep(0.1)
+    assert not cache.check_and_add((1, 1))
+
+
+if __name__ == "__main__":
+    logger.info("Starting seen-cache tests\n")
+
+    try:
+        test_duplicate_detection()
+        test_size_and_ttl_bounds()
+        logger.success("All tests completed!")
+    except Exception as e:
+        logger.error(f"Test failed: {e}")
+        import traceback
+
+        traceback.print_exc()
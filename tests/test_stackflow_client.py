@@ -0,0 +1,258 @@
+"""Test script for the multiplexed StackFlow connection, against a local fake server"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from stackflow.client import StackFlowConnection
+
+
+class FakeStackFlow:
+    """
+    NDJSON server whose replies are driven by the test: every received
+    message is queued together with the writer of its connection.
+    """
+
+    def __init__(self):
+        self.received: asyncio.Queue = asyncio.Queue()
+        self.writers = []
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for writer in self.writers:
+            writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def next_message(self, timeout: float = 2.0):
+        """(writer, message) of the next message sent by the client"""
+        return await asyncio.wait_for(self.received.get(), timeout)
+
+    async def send(self, writer: asyncio.StreamWriter, *messages: dict):
+        writer.write(b"".join((json.dumps(m, ensure_ascii=False) + "\n").encode("utf-8") for m in messages))
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.writers.append(writer)
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            await self.received.put((writer, json.loads(line)))
+
+
+def run(scenario):
+    """Run scenario(server, connection) against a fresh server and connected client"""
+
+    async def main():
+        server = FakeStackFlow()
+        await server.start()
+        connection = StackFlowConnection("127.0.0.1", server.port, reconnect_delay=0.01)
+        await connection.connect()
+        try:
+            await scenario(server, connection)
+        finally:
+            await connection.close()
+            await server.stop()
+
+    asyncio.run(main())
+
+
+def test_replies_routed_by_request_id():
+    """Concurrent requests each get their own reply, whatever order they come back in"""
+    logger.info("Test: routing by request_id")
+
+    async def scenario(server: FakeStackFlow, connection: StackFlowConnection):
+        first = asyncio.create_task(connection.request({"request_id": "a_1", "action": "taskinfo"}, timeout=2.0))
+        second = asyncio.create_task(connection.request({"request_id": "b_2", "action": "taskinfo"}, timeout=2.0))
+        writer, message_a = await server.next_message()
+        _, message_b = await server.next_message()
+        assert {message_a["request_id"], message_b["request_id"]} == {"a_1", "b_2"}
+
+        # A frame nobody waits for is dropped, and replies arrive in reverse order
+        await server.send(writer, {"request_id": "nobody_9", "data": "lost"})
+        await server.send(writer, {"request_id": "b_2", "data": "for b"}, {"request_id": "a_1", "data": "for a"})
+        assert (await first)["data"] == "for a"
+        assert (await second)["data"] == "for b"
+        assert connection._routes == {}
+        assert connection.healthy
+
+        # request_ids must be unique among the exchanges in flight
+        pending = asyncio.create_task(connection.request({"request_id": "c_3"}, timeout=2.0))
+        await server.next_message()
+        try:
+            await connection.request({"request_id": "c_3"}, timeout=2.0)
+            raise AssertionError("duplicate request_id accepted")
+        except ValueError:
+            pass
+        await server.send(writer, {"request_id": "c_3", "data": "ok"})
+        assert (await pending)["data"] == "ok"
+
+    run(scenario)
+
+
+def test_stream_routed_by_work_id():
+    """Stream frames without a request_id reach the stream of their work_id, next to other requests"""
+    logger.info("Test: stream routing by work_id")
+
+    async def scenario(server: FakeStackFlow, connection: StackFlowConnection):
+        message = {"request_id": "llm_inference_1", "work_id": "llm.1000", "action": "inference"}
+        frames = []
+
+        async def consume():
+            async for frame in connection.stream(message, timeout=2.0):
+                frames.append(frame["data"])
+
+        stream_task = asyncio.create_task(consume())
+        writer, _ = await server.next_message()
+        request_task = asyncio.create_task(connection.request({"request_id": "tts_2"}, timeout=2.0))
+        await server.next_message()
+
+        await server.send(
+            writer,
+            {"request_id": "llm_inference_1", "work_id": "llm.1000", "data": {"delta": "風", "finish": False}},
+            {"work_id": "llm.1000", "data": {"delta": "が", "finish": False}},
+            {"request_id": "tts_2", "data": "tts reply"},
+            {"work_id": "melotts.1001", "data": {"delta": "other unit"}},
+            {"request_id": "llm_inference_1", "work_id": "llm.1000", "data": {"delta": "", "finish": True}},
+        )
+        await asyncio.wait_for(stream_task, 2.0)
+        assert [frame["delta"] for frame in frames] == ["風", "が", ""]
+        assert (await request_task)["data"] == "tts reply"
+        assert connection._routes == {} and connection._work_routes == {}
+
+    run(scenario)
+
+
+def test_timeout_and_cancellation():
+    """A timed-out or cancelled exchange releases its route; late replies are dropped"""
+    logger.info("Test: timeout and cancellation")
+
+    async def scenario(server: FakeStackFlow, connection: StackFlowConnection):
+        try:
+            await connection.request({"request_id": "slow_1"}, timeout=0.1)
+            raise AssertionError("request did not time out")
+        except asyncio.TimeoutError:
+            pass
+        writer, _ = await server.next_message()
+        assert connection._routes == {}
+
+        waiting = asyncio.create_task(connection.request({"request_id": "cancel_2"}, timeout=5.0))
+        await server.next_message()
+        waiting.cancel()
+        try:
+            await waiting
+        except asyncio.CancelledError:
+            pass
+        assert connection._routes == {}
+
+        # Replies to both arrive late and go nowhere; the connection keeps working
+        await server.send(writer, {"request_id": "slow_1", "data": "late"}, {"request_id": "cancel_2", "data": "late"})
+        await asyncio.sleep(0.05)
+        request_id = connection.new_request_id("fresh")
+        fresh = asyncio.create_task(connection.request({"request_id": request_id}, timeout=2.0))
+        await server.next_message()
+        await server.send(writer, {"request_id": request_id, "data": "fresh"})
+        assert (await fresh)["data"] == "fresh"
+        assert connection.healthy
+
+    run(scenario)
+
+
+def test_reconnect_retries_request_after_hooks():
+    """
+    When the server drops the connection, the client reconnects, runs the
+    hooks in registration order (a failed hook is retried after a backoff
+    without repeating the earlier ones) and then retries the in-flight
+    request once with a fresh request_id.
+    """
+    logger.info("Test: reconnect, hooks and retry")
+
+    async def scenario(server: FakeStackFlow, connection: StackFlowConnection):
+        calls = []
+
+        async def llm_hook():
+            calls.append("llm")
+            await connection.request({"request_id": connection.new_request_id("llm_setup")}, timeout=2.0)
+
+        async def tts_hook():
+            calls.append("tts")
+            if calls.count("tts") == 1:
+                raise ConnectionError("melotts setup failed")
+
+        connection.add_reconnect_hook(llm_hook)
+        connection.add_reconnect_hook(tts_hook)
+
+        def build_request():
+            return {"request_id": connection.new_request_id("taskinfo"), "action": "taskinfo"}
+
+        request_task = asyncio.create_task(connection.request(build_request, timeout=5.0))
+        old_writer, first = await server.next_message()
+        old_writer.close()
+
+        # The LLM hook sets its unit up again over the new connection first
+        writer, setup = await server.next_message()
+        assert writer is not old_writer
+        assert setup["request_id"].startswith("llm_setup")
+        assert not connection.healthy
+        await server.send(writer, {"request_id": setup["request_id"], "data": "llm.1002"})
+
+        _, retried = await server.next_message()
+        assert retried["request_id"].startswith("taskinfo") and retried["request_id"] != first["request_id"]
+        assert calls == ["llm", "tts", "tts"]
+        await server.send(writer, {"request_id": retried["request_id"], "data": "ok"})
+        assert (await request_task)["data"] == "ok"
+        assert connection.healthy
+        assert connection.reconnects == 1
+
+    run(scenario)
+
+
+def test_retry_only_once():
+    """A request whose retry is also cut off fails with ConnectionError"""
+    logger.info("Test: single retry")
+
+    async def scenario(server: FakeStackFlow, connection: StackFlowConnection):
+        request_task = asyncio.create_task(connection.request({"request_id": "taskinfo_1"}, timeout=5.0))
+        for _ in range(2):
+            writer, _ = await server.next_message()
+            writer.close()
+        try:
+            await request_task
+            raise AssertionError("request survived two dropped connections")
+        except ConnectionError:
+            pass
+
+        # The connection itself recovers
+        await connection.ensure_connected(timeout=2.0)
+        assert connection.reconnects == 2
+
+    run(scenario)
+
+
+if __name__ == "__main__":
+    logger.info("Starting StackFlow connection tests\n")
+
+    try:
+        test_replies_routed_by_request_id()
+        test_stream_routed_by_work_id()
+        test_timeout_and_cancellation()
+        test_reconnect_retries_request_after_hooks()
+        test_retry_only_once()
+        logger.success("All tests completed!")
+    except Exception as e:
+        logger.error(f"Test failed: {e}")
+        import traceback
+
+        traceback.print_exc()
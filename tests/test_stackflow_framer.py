@@ -0,0 +1,71 @@
+"""Test script for the StackFlow NDJSON line framer"""
+
+import json
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from stackflow.utils import LineFramer
+
+
+def test_split_multibyte_character():
+    """A UTF-8 character split across reads is decoded intact"""
+    logger.info("Test: split multi-byte character")
+
+    raw = (json.dumps({"data": {"delta": "こんにちは"}}, ensure_ascii=False) + "\n").encode("utf-8")
+    split_at = raw.index("に".encode("utf-8")) + 1
+
+    framer = LineFramer()
+    framer.feed(raw[:split_at])
+    assert list(framer.messages()) == []
+    framer.feed(raw[split_at:])
+    assert list(framer.messages()) == [{"data": {"delta": "こんにちは"}}]
+    assert len(framer) == 0
+
+
+def test_pipelined_frames_are_kept():
+    """Bytes after the first newline stay buffered for the next message"""
+    logger.info("Test: pipelined frames")
+
+    framer = LineFramer()
+    framer.feed(b'{"seq": 1}\n{"seq": 2}\n\n{"se')
+    assert [m["seq"] for m in framer.messages()] == [1, 2]
+    framer.feed(b'q": 3}\n')
+    assert [m["seq"] for m in framer.messages()] == [3]
+
+
+def test_malformed_line_and_limit():
+    """Malformed lines are skipped, overlong lines raise"""
+    logger.info("Test: malformed line and length limit")
+
+    framer = LineFramer()
+    framer.feed(b'not json\n{"ok": true}\n')
+    assert list(framer.messages()) == [{"ok": True}]
+
+    framer = LineFramer(max_line_length=8)
+    framer.feed(b"0123456789")
+    try:
+        framer.next_line()
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError for an overlong line")
+
+
+if __name__ == "__main__":
+    logger.info("Starting StackFlow framer tests\n")
+
+    try:
+        test_split_multibyte_character()
+        test_pipelined_frames_are_kept()
+        test_malformed_line_and_limit()
+        logger.success("All tests completed!")
+    except Exception as e:
+        logger.error(f"Test failed: {e}")
+        import traceback
+
+        traceback.print_exc()
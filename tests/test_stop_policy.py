@@ -0,0 +1,130 @@
+"""Test script for the client-side LLM stop conditions"""
+
+import asyncio
+import functools
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from api.llm import StackFlowLLMClient, StopPolicy
+from fakes import FakeConnection, load_config
+
+
+def inference_frames(deltas) -> list:
+    """Inference stream frames carrying the given deltas, the last one finishing"""
+    return [
+        {"request_id": "llm_inference_1", "data": {"delta": delta, "finish": i == len(deltas) - 1}}
+        for i, delta in enumerate(deltas)
+    ]
+
+
+def make_client(connection: FakeConnection) -> StackFlowLLMClient:
+    client = StackFlowLLMClient(load_config(), connection=connection)
+    client.llm_work_id = "llm.1000"
+    return client
+
+
+def run_inference(client: StackFlowLLMClient, stop_policy: StopPolicy) -> str:
+    return asyncio.run(client._run_inference(functools.partial(client._create_send_data, "prompt"), stop_policy))
+
+
+def test_stop_strings():
+    """Text is cut before the first stop string"""
+    logger.info("Test: stop strings")
+
+    policy = StopPolicy(stop_strings=["\n\n", "END"])
+    assert policy.cut("風が吹く", 2) is None
+    assert policy.cut("風が吹くEND夜", 3) == "風が吹く"
+    assert policy.cut("一行\n\n二行", 3) == "一行"
+
+
+def test_stop_at_punctuation():
+    """Generation stops after the first phrase-ending punctuation with text before it"""
+    logger.info("Test: stop at punctuation")
+
+    policy = StopPolicy(stop_at_punctuation=True)
+    assert policy.cut("風が吹く", 2) is None
+    assert policy.cut("風が吹く。夜", 3) == "風が吹く。"
+    assert policy.cut("Wind blows! Night", 3) == "Wind blows!"
+    # Leading punctuation does not end an empty phrase; the text is cut, not stripped
+    assert policy.cut("。 風", 2) is None
+    assert policy.cut("  風。", 2) == "  風。"
+    assert StopPolicy().cut("風が吹く。夜", 3) is None
+
+
+def test_period_and_line_break():
+    """A "." ends a phrase only before whitespace; a line break ends it and is dropped"""
+    logger.info("Test: period and line break boundaries")
+
+    policy = StopPolicy(stop_at_punctuation=True)
+    assert policy.cut("Pi is 3.14 and", 4) is None
+    assert policy.cut("e.g.x", 3) is None
+    assert policy.cut("Wind blows. Night", 4) == "Wind blows."
+    # A trailing "." waits for the next delta
+    assert policy.cut("Version 3.", 3) is None
+    assert policy.cut("Version 3.5 ", 4) is None
+    assert policy.cut("風が吹く\n夜", 3) == "風が吹く"
+    assert policy.cut("\n風が吹く", 3) is None
+
+
+def test_max_chars_and_tokens():
+    """max_chars truncates the text, max_tokens stops after that many deltas; 0 disables both"""
+    logger.info("Test: max_chars and max_tokens")
+
+    policy = StopPolicy(max_chars=4)
+    assert policy.cut("風が吹", 3) is None
+    assert policy.cut("風が吹く夜", 5) == "風が吹く"
+
+    policy = StopPolicy(max_tokens=3)
+    assert policy.cut("風が", 2) is None
+    assert policy.cut("風が吹", 3) == "風が吹"
+
+    assert StopPolicy().cut("x" * 1000, 1000) is None
+
+
+def test_last_frame_is_limited():
+    """Text arriving in the finishing frame is held to the limits, and needs no pause"""
+    logger.info("Test: limits on the last frame")
+
+    connection = FakeConnection(inference_frames(["風が", "吹く夜の森"]))
+    client = make_client(connection)
+    assert run_inference(client, StopPolicy(max_chars=4)) == "風が吹く"
+    assert connection.sent_actions("pause") == []
+
+    connection = FakeConnection(inference_frames(["風が", "吹く。夜"]))
+    client = make_client(connection)
+    assert run_inference(client, StopPolicy(stop_at_punctuation=True)) == "風が吹く。"
+
+
+def test_pause_failure_keeps_text():
+    """A connection failure while pausing an early-stopped inference still returns the text"""
+    logger.info("Test: pause failure")
+
+    connection = FakeConnection(
+        inference_frames(["風が", "吹く", "夜"]), replies={"pause": ConnectionError("StackFlow connection closed")}
+    )
+    client = make_client(connection)
+    assert run_inference(client, StopPolicy(max_tokens=2)) == "風が吹く"
+    assert len(connection.sent_actions("pause")) == 1
+
+
+if __name__ == "__main__":
+    logger.info("Starting stop policy tests\n")
+
+    try:
+        test_stop_strings()
+        test_stop_at_punctuation()
+        test_period_and_line_break()
+        test_max_chars_and_tokens()
+        test_last_frame_is_limited()
+        test_pause_failure_keeps_text()
+        logger.success("All tests completed!")
+    except Exception as e:
+        logger.error(f"Test failed: {e}")
+        import traceback
+
+        traceback.print_exc()
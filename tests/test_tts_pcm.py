@@ -0,0 +1,182 @@
+"""Test script for decoding MeloTTS PCM stream chunks"""
+
+import asyncio
+import base64
+import io
+import os
+import stat
+import sys
+import tempfile
+import wave
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from loguru import logger
+
+from api.tts import StackFlowTTSClient, convert_wav, pcm_from_chunk, pcm_to_wav
+from fakes import FakeConnection, load_config
+
+def make_pcm_client(frames) -> StackFlowTTSClient:
+    config = load_config()
+    config["stack_flow_tts"]["mode"] = "pcm"
+    client = StackFlowTTSClient(config, connection=FakeConnection(frames))
+    client.tts_work_id = "melotts.1001"
+    return client
+
+
+async def _collect(client: StackFlowTTSClient) -> bytes:
+    return b"".join([chunk async for chunk in client._stream_pcm("テスト")])
+
+
+def _wav_bytes(pcm: bytes, sample_rate: int = 44100) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def test_raw_and_wav_chunks():
+    """Raw chunks pass through, WAV chunks lose their header"""
+    logger.info("Test: raw and WAV chunks")
+
+    pcm = bytes(range(256)) * 4
+    assert pcm_from_chunk(base64.b64encode(pcm).decode()) == pcm
+    assert pcm_from_chunk(base64.b64encode(_wav_bytes(pcm)).decode()) == pcm
+
+
+def test_pcm_to_wav():
+    """Collected PCM is wrapped as a playable in-memory WAV"""
+    logger.info("Test: PCM to WAV")
+
+    pcm = b"\x01\x00" * 441
+    wav = pcm_to_wav(pcm, 44100)
+    with wave.open(io.BytesIO(wav), "rb") as wav_file:
+        assert wav_file.getframerate() == 44100
+        assert wav_file.getnchannels() == 1
+        assert wav_file.readframes(wav_file.getnframes()) == pcm
+    # Only the fmt and data chunks: readable front to back from a pipe
+    assert wav[36:40] == b"data"
+
+
+def test_convert_wav_native():
+    """In-process conversion resamples, upmixes at -3dB and rounds like FFmpeg"""
+    logger.info("Test: native WAV conversion")
+
+    t = np.arange(22050) / 22050
+    tone = np.round(0.5 * 32767 * np.sin(2 * np.pi * 440 * t)).astype("<i2")
+    wav = convert_wav(pcm_to_wav(tone.tobytes(), 22050), 32000, 2, "s16")
+    with wave.open(io.BytesIO(wav), "rb") as wav_file:
+        assert wav_file.getframerate() == 32000
+        assert wav_file.getnchannels() == 2
+        assert wav_file.getsampwidth() == 2
+        frames = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype="<i2").reshape(-1, 2)
+    assert len(frames) == 32000
+    assert np.array_equal(frames[:, 0], frames[:, 1])
+    level = np.sqrt(np.mean((frames[2000:-2000, 0] / 32768.0) ** 2))
+    assert abs(level - 0.5 * np.sqrt(0.5) / np.sqrt(2)) < 0.005
+
+    # Full scale clips instead of wrapping around; s32 keeps the sample rate
+    loud = pcm_to_wav(np.array([32767, -32768] * 100, dtype="<i2").tobytes(), 32000)
+    samples = np.frombuffer(convert_wav(loud, 32000, 1, "s32")[44:], dtype="<i4")
+    assert samples.max() == 2147418112 and samples.min() == -2147483648
+
+
+def test_stream_pcm_frame_shapes():
+    """Both {"delta": ...} stream frames and a single base64 payload yield the PCM"""
+    logger.info("Test: PCM stream frame shapes")
+
+    first, second = b"\x01\x00" * 100, b"\x02\x00" * 50
+
+    def b64(data: bytes) -> str:
+        return base64.b64encode(data).decode()
+
+    frames = [
+        {"request_id": "tts_inference_1", "work_id": "melotts.1001", "data": {"delta": b64(first), "finish": False}},
+        {"request_id": "tts_inference_1", "work_id": "melotts.1001", "data": {"delta": b64(second), "finish": True}},
+    ]
+    client = make_pcm_client(frames)
+    assert client._create_tts_setup_data()["data"]["response_format"] == "tts.base64.wav.stream"
+    assert asyncio.run(_collect(client)) == first + second
+    assert client.connection.sent[0]["work_id"] == "melotts.1001"
+
+    # Non-stream format: one base64 WAV string
+    client = make_pcm_client([{"request_id": "tts_inference_1", "data": b64(_wav_bytes(first + second))}])
+    assert asyncio.run(_collect(client)) == first + second
+
+    # No audio at all is an error, not a silent utterance
+    client = make_pcm_client([{"request_id": "tts_inference_1", "data": {"delta": "", "finish": True}}])
+    try:
+        asyncio.run(_collect(client))
+        raise AssertionError("empty TTS stream accepted")
+    except RuntimeError:
+        pass
+
+
+# Stand-in for tinyplay: records its arguments and copies the file it is given
+FAKE_TINYPLAY = """#!/bin/sh
+echo "$@" > "$FAKE_TINYPLAY_OUT.args"
+for arg; do last="$arg"; done
+cat "$last" > "$FAKE_TINYPLAY_OUT"
+"""
+
+
+def test_play_wav_paths():
+    """Both playback paths hand tinyplay the complete WAV, typed explicitly on stdin"""
+    logger.info("Test: tinyplay playback paths")
+
+    pcm = (b"\x10\x00\xf0\xff" * 8000)[:32000]
+    wav = pcm_to_wav(pcm, 32000, channels=2)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tinyplay = Path(tmp_dir) / "tinyplay"
+        tinyplay.write_text(FAKE_TINYPLAY)
+        tinyplay.chmod(tinyplay.stat().st_mode | stat.S_IEXEC)
+        played = Path(tmp_dir) / "played.wav"
+        saved_env = dict(os.environ)
+        os.environ["PATH"] = f"{tmp_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+        os.environ["FAKE_TINYPLAY_OUT"] = str(played)
+        try:
+            for stdin in (False, True):
+                client = make_pcm_client([])
+                client.config["audio"].update(tinyplay_stdin=stdin, temp_wav_dir=str(Path(tmp_dir) / "wav"))
+                asyncio.run(client._play(wav, 0, 1))
+
+                data = played.read_bytes()
+                assert len(data) == len(wav) == 44 + len(pcm)
+                with wave.open(io.BytesIO(data), "rb") as wav_file:
+                    assert (wav_file.getframerate(), wav_file.getnchannels(), wav_file.getsampwidth()) == (32000, 2, 2)
+                    assert wav_file.readframes(wav_file.getnframes()) == pcm
+
+                args = (Path(str(played) + ".args")).read_text().split()
+                if stdin:
+                    assert args == ["-D0", "-d1", "-i", "wav", "/dev/stdin"]
+                else:
+                    assert args[-1].endswith(".wav") and "-i" not in args
+                    # The temporary file is removed after playback
+                    assert os.listdir(Path(tmp_dir) / "wav") == []
+        finally:
+            os.environ.clear()
+            os.environ.update(saved_env)
+
+
+if __name__ == "__main__":
+    logger.info("Starting TTS PCM tests\n")
+
+    try:
+        test_raw_and_wav_chunks()
+        test_pcm_to_wav()
+        test_convert_wav_native()
+        test_stream_pcm_frame_shapes()
+        test_play_wav_paths()
+        logger.success("All tests completed!")
+    except Exception as e:
+        logger.error(f"Test failed: {e}")
+        import traceback
+
+        traceback.print_exc()
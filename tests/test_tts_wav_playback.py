@@ -49,6 +49,7 @@ async def test_wav_generation_and_playback():
         # Initialize TTS client
         logger.info("Initializing StackFlowTTSClient...")
         tts_client = StackFlowTTSClient(config)
+        await tts_client.init()
 
         # Test speak_to_file method
         logger.info("Calling speak_to_file()...")
@@ -80,6 +81,7 @@ async def test_wav_generation_without_ffmpeg():
     try:
         logger.info("Initializing TTS client (FFmpeg disabled)...")
         tts_client = StackFlowTTSClient(config)
+        await tts_client.init()
 
         logger.info("Calling speak_to_file() without FFmpeg...")
         await tts_client.speak_to_file(test_text)
@@ -111,6 +113,7 @@ async def test_wav_generation_with_rumble():
     try:
         logger.info("Initializing TTS client (rumble enabled)...")
         tts_client = StackFlowTTSClient(config)
+        await tts_client.init()
 
         logger.info("Calling speak_to_file() with rumble effect...")
         await tts_client.speak_to_file(test_text)
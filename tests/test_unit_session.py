@@ -0,0 +1,166 @@
+"""Test script for the persisted StackFlow unit session"""
+
+import asyncio
+import itertools
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from api.llm import StackFlowLLMClient
+from api.tts import StackFlowTTSClient
+from fakes import FakeConnection, load_config
+from stackflow.session import UnitSession, setup_fingerprint
+
+
+class FakeUnitServer:
+    """Setup/taskinfo/exit replies of a StackFlow whose units stay loaded until they exit"""
+
+    def __init__(self):
+        self.units = {}
+        self._work_ids = itertools.count(1000)
+
+    def connection(self) -> FakeConnection:
+        return FakeConnection(replies={"setup": self.setup, "taskinfo": self.taskinfo, "exit": self.exit})
+
+    def setup(self, message: dict) -> dict:
+        work_id = f"{message['work_id']}.{next(self._work_ids)}"
+        self.units[work_id] = message["data"]
+        return {"request_id": message["request_id"], "work_id": work_id, "error": {"code": 0}}
+
+    def taskinfo(self, message: dict) -> dict:
+        if message["work_id"] not in self.units:
+            return {"request_id": message["request_id"], "error": {"code": -5, "message": "unit does not exist"}}
+        return {"request_id": message["request_id"], "data": self.units[message["work_id"]], "error": {"code": 0}}
+
+    def exit(self, message: dict) -> dict:
+        self.units.pop(message["work_id"], None)
+        return {"request_id": message["request_id"], "error": {"code": 0}}
+
+
+def test_fingerprint_ignores_request_id():
+    """Setup messages differing only in request_id have the same fingerprint"""
+    logger.info("Test: fingerprint ignores request_id")
+
+    setup_data = {"request_id": "llm_setup_1", "work_id": "llm", "action": "setup", "data": {"model": "m"}}
+    same = dict(setup_data, request_id="llm_setup_7")
+    changed = dict(setup_data, data={"model": "other"})
+    assert setup_fingerprint(setup_data) == setup_fingerprint(same)
+    assert setup_fingerprint(setup_data) != setup_fingerprint(changed)
+
+
+def test_record_and_forget():
+    """Units are persisted per name and shared between instances"""
+    logger.info("Test: record and forget")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = str(Path(tmp_dir) / "state" / "session.json")
+        llm_session = UnitSession(path, enabled=True)
+        tts_session = UnitSession(path, enabled=True)
+
+        llm_session.record("llm", {"work_id": "llm"}, "llm.1000")
+        tts_session.record("melotts", {"work_id": "melotts"}, "melotts.1001")
+        state = UnitSession(path, enabled=True)._load()
+        assert state["llm"]["work_id"] == "llm.1000"
+        assert state["melotts"]["work_id"] == "melotts.1001"
+
+        llm_session.forget("llm")
+        assert set(UnitSession(path, enabled=True)._load()) == {"melotts"}
+
+        # Disabled sessions never touch the file
+        disabled_path = Path(tmp_dir) / "disabled.json"
+        UnitSession(str(disabled_path), enabled=False).record("llm", {}, "llm.1")
+        assert not disabled_path.exists()
+
+
+def test_lazy_init_keeps_units_in_use():
+    """A lazy TTS client releases only the recorded units its mode does not use"""
+    logger.info("Test: lazy init releases unused units")
+
+    for mode, released in (("pcm", ["audio.1000"]), ("http", ["melotts.1001", "audio.1000"])):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config = load_config()
+            config["system"]["reattach_units"] = True
+            config["system"]["session_state_path"] = str(Path(tmp_dir) / "session.json")
+            config["stack_flow_tts"].update(mode=mode, unit_setup="lazy")
+            session = UnitSession.from_config(config)
+            session.record("audio", {"work_id": "audio"}, "audio.1000")
+            session.record("melotts", {"work_id": "melotts"}, "melotts.1001")
+
+            connection = FakeConnection()
+            client = StackFlowTTSClient(config, connection=connection)
+            asyncio.run(client.init())
+            exited = [message["work_id"] for message in connection.sent_actions("exit")]
+            assert exited == released, (mode, exited)
+            if mode == "pcm":
+                assert set(session._load()) == {"melotts"}
+
+
+def test_reconnect_reuses_loaded_units():
+    """
+    After a reconnect the clients reuse the units StackFlow kept loaded,
+    without reattach_units: no second model is loaded next to the old one
+    """
+    logger.info("Test: reconnect reuses loaded units")
+
+    config = load_config()
+    config["system"]["reattach_units"] = False
+    config["stack_flow_tts"].update(mode="http", unit_setup="eager")
+    server = FakeUnitServer()
+    connection = server.connection()
+    llm = StackFlowLLMClient(config, connection=connection)
+    tts = StackFlowTTSClient(config, connection=connection)
+
+    async def reconnect():
+        for hook in connection.reconnect_hooks:
+            await hook()
+
+    async def scenario():
+        await llm.init()
+        await tts.init()
+        loaded = dict(server.units)
+        assert set(loaded) == {llm.llm_work_id, tts.tts_work_id, tts.audio_work_id}
+
+        # Only the socket dropped: the old units are probed and kept
+        await reconnect()
+        assert server.units == loaded
+        assert {llm.llm_work_id, tts.tts_work_id, tts.audio_work_id} == set(loaded)
+        assert len(connection.sent_actions("setup")) == 3
+        assert len(connection.sent_actions("taskinfo")) == 3
+
+        # llm-sys restarted: the units are gone and set up again
+        server.units.clear()
+        await reconnect()
+        assert len(server.units) == 3 and not set(server.units) & set(loaded)
+        assert len(connection.sent_actions("setup")) == 6
+        assert connection.sent_actions("exit") == []
+
+        # The LLM setup changed: the old unit is released before the new one is loaded
+        old_work_id = llm.llm_work_id
+        llm.model = "other-model"
+        await reconnect()
+        assert [message["work_id"] for message in connection.sent_actions("exit")] == [old_work_id]
+        assert old_work_id not in server.units and llm.llm_work_id in server.units
+        assert len(server.units) == 3
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    logger.info("Starting unit session tests\n")
+
+    try:
+        test_fingerprint_ignores_request_id()
+        test_record_and_forget()
+        test_lazy_init_keeps_units_in_use()
+        test_reconnect_reuses_loaded_units()
+        logger.success("All tests completed!")
+    except Exception as e:
+        logger.error(f"Test failed: {e}")
+        import traceback
+
+        traceback.print_exc()
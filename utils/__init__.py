@@ -1,5 +1,6 @@
 """Utility modules for the BI system"""
 
+from .memory import mem_available_mb, read_meminfo
 from .network_config import NetworkConfig, load_network_config
 
-__all__ = ["NetworkConfig", "load_network_config"]
+__all__ = ["NetworkConfig", "load_network_config", "mem_available_mb", "read_meminfo"]
@@ -0,0 +1,35 @@
+"""System memory readings from /proc/meminfo"""
+
+from typing import Dict, Optional
+
+from loguru import logger
+
+
+def read_meminfo(path: str = "/proc/meminfo") -> Dict[str, int]:
+    """
+    Parse /proc/meminfo
+
+    Returns:
+        Field name -> value in kB (empty if the file is not available)
+    """
+    info = {}
+    try:
+        with open(path, mode="r", encoding="utf-8") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                fields = rest.split()
+                if fields and fields[0].isdigit():
+                    info[name] = int(fields[0])
+    except OSError as e:
+        logger.debug(f"Cannot read {path}: {e}")
+    return info
+
+
+def mem_available_mb() -> Optional[float]:
+    """System-wide MemAvailable in MB, None if unknown
+
+    StackFlow models are loaded by separate unit services, so their cost
+    shows up here rather than in this process's RSS.
+    """
+    kb = read_meminfo().get("MemAvailable")
+    return round(kb / 1024, 1) if kb is not None else None